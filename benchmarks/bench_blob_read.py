@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Per-blob read latency of blob reads in show_content and show_content_many.
+
+Compares opening the .bin shard for every blob, pread on a pooled descriptor
+and coalesced reads of show_content_many.
+
+Run it against a profile on NFS to see the cost of opening files.
+
+Usage: python3 -m benchmarks.bench_blob_read [--profile tests/test_profile.json]
+"""
+
+import argparse
+import time
+
+from woc.local import _BIN_POOL, WocMapsLocal
+
+
+def _read_open(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _latency(read, positions) -> float:
+    start = time.perf_counter_ns()
+    for path, offset, length in positions:
+        read(path, offset, length)
+    return (time.perf_counter_ns() - start) / len(positions) / 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark blob reads from .bin shards")
+    parser.add_argument("--profile", type=str, default="tests/test_profile.json")
+    parser.add_argument("--blobs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    woc = WocMapsLocal(args.profile)
+    _keys = []
+    for key in woc.all_keys("blob"):
+        _keys.append(key)
+        if len(_keys) >= args.blobs:
+            break
+    _positions = [(woc._blob_path(k), *woc._get_pos("blob", k)) for k in _keys]
+    positions = (_positions * (args.blobs // len(_positions) + 1))[: args.blobs]
+    keys = (_keys * (args.blobs // len(_keys) + 1))[: args.blobs]
+    _latency(_read_open, positions[:1000])  # warm up the page cache
+
+    print(f"open+seek+read    {_latency(_read_open, positions):8.2f}us/blob")
+    print(f"pooled pread      {_latency(_BIN_POOL.pread, positions):8.2f}us/blob")
+    _start = time.perf_counter_ns()
+    for k in keys:
+        woc.show_content("blob", k)
+    print(
+        f"show_content      {(time.perf_counter_ns() - _start) / len(keys) / 1e3:8.2f}us/blob"
+    )
+    _start = time.perf_counter_ns()
+    woc.show_content_many("blob", keys)
+    print(
+        f"show_content_many {(time.perf_counter_ns() - _start) / len(keys) / 1e3:8.2f}us/blob"
+    )
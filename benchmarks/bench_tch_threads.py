@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Lookup throughput of TCHashDB.get_many as a function of thread count.
+
+Usage: python3 -m benchmarks.bench_tch_threads [--path tests/fixtures/commit_0.tch]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from woc.tch import TCHashDB
+
+
+def _run(db: TCHashDB, keys, threads: int, batch: int) -> float:
+    chunks = [keys[i : i + batch] for i in range(0, len(keys), batch)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in pool.map(db.get_many, chunks):
+            pass
+    return len(keys) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark threaded TCH lookups")
+    parser.add_argument("--path", type=str, default="tests/fixtures/commit_0.tch")
+    parser.add_argument("--lookups", type=int, default=2_000_000)
+    parser.add_argument("--batch", type=int, default=4096)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    for thread_safe in (False, True):
+        db = TCHashDB(args.path, ro=True, thread_safe=thread_safe)
+        _keys = list(db)
+        keys = (_keys * (args.lookups // len(_keys) + 1))[: args.lookups]
+        _run(db, keys[: args.batch], 1, args.batch)  # warm up the page cache
+        for t in args.threads:
+            print(
+                f"thread_safe={thread_safe!s:5} threads={t:2d} "
+                f"{_run(db, keys, t, args.batch) / 1e6:.2f}M lookups/s"
+            )
+        db.close()
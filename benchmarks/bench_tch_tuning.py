@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Cold and warm lookup latency of a TCH shard under different xmsiz / rcnum settings.
+
+Cold runs evict the file from the page cache with posix_fadvise first.
+
+Usage: python3 -m benchmarks.bench_tch_tuning [--path tests/fixtures/commit_0.tch]
+"""
+
+import argparse
+import os
+import random
+import time
+
+from woc.tch import TCHashDB
+
+
+def _evict(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def _latency(db: TCHashDB, keys) -> float:
+    start = time.perf_counter_ns()
+    for key in keys:
+        db.get(key)
+    return (time.perf_counter_ns() - start) / len(keys) / 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TCH tuning parameters")
+    parser.add_argument("--path", type=str, default="tests/fixtures/commit_0.tch")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    fsize = os.path.getsize(args.path)
+    settings = [
+        ("xmsiz=0", 0, 0),
+        ("default", -1, 0),
+        (f"xmsiz={fsize}", fsize, 0),
+        ("rcnum=100k", -1, 100_000),
+        (f"xmsiz={fsize},rcnum=100k", fsize, 100_000),
+    ]
+    db = TCHashDB(args.path, ro=True)
+    all_keys = list(db)
+    db.close()
+    keys = random.choices(all_keys, k=args.lookups)
+
+    for name, xmsiz, rcnum in settings:
+        _evict(args.path)
+        db = TCHashDB(args.path, ro=True, xmsiz=xmsiz, rcnum=rcnum)
+        cold = _latency(db, keys[:1000])
+        warm = _latency(db, keys)
+        db.close()
+        print(f"{name:32} cold {cold:8.2f}us/lookup  warm {warm:8.2f}us/lookup")
@@ -0,0 +1,40 @@
+from woc.cache import _MISSING, LRUCache, WocCache, estimate_size
+
+
+def test_lru_eviction():
+    cache = LRUCache(10)
+    cache.put("a", b"aaaa", 4)
+    cache.put("b", b"bbbb", 4)
+    assert cache.get("a") == b"aaaa"  # a is now the most recently used
+    cache.put("c", b"cccc", 4)
+    assert cache.get("b") is _MISSING
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    cache.put("d", b"d" * 11, 11)  # larger than the budget
+    assert cache.get("d") is _MISSING
+    cache.put("a", b"aa", 2)  # replace
+    assert cache.bytes == 6
+    assert cache.stats() == {
+        "hits": 3,
+        "misses": 2,
+        "evictions": 1,
+        "entries": 2,
+        "bytes": 6,
+        "max_bytes": 10,
+    }
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_woc_cache_budgets():
+    cache = WocCache(max_bytes=100, raw_ratio=0.5, budgets={"c2p": 0})
+    cache.put_raw("commit.tch", b"key", b"x" * 40)
+    assert cache.get_raw("commit.tch", b"key") == b"x" * 40
+    cache.put_raw("commit.tch", b"key2", b"x" * 40)  # evicts the first one
+    assert cache.get_raw("commit.tch", b"key") is _MISSING
+    cache.put_decoded("c2p", "key", ["p1"])  # disabled
+    assert cache.get_decoded("c2p", "key") is _MISSING
+    stats = cache.stats()
+    assert stats["commit.tch"]["raw"]["evictions"] == 1
+    assert stats["c2p"]["decoded"]["max_bytes"] == 0
+    assert estimate_size(["ab", ("c",)]) > estimate_size("ab")
@@ -195,3 +195,24 @@ def test_cli_b2tac():
     )
     actual_output = run_get_values(input_str, "b2tac")
     assert actual_output[1].endswith(expected_output_end), actual_output
+
+
+def test_cli_worker(tmp_path):
+    from woc.utils import merge_outputs
+
+    input_str = "05fe634ca4c8386349ac519f899145c75fff4169\n3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    expected_output = run_get_values(input_str, "b2c")[1]
+    outputs = [
+        run_get_values(input_str, "b2c", "--worker", f"{k}/2")[1] for k in range(2)
+    ]
+    for k, out in enumerate(outputs):
+        (tmp_path / f"out.{k}").write_text(out + "\n" if out else "")
+    assert sorted(outputs[0].splitlines() + outputs[1].splitlines()) == sorted(
+        expected_output.splitlines()
+    )
+    merge_outputs(
+        [tmp_path / "out.0", tmp_path / "out.1"], tmp_path / "merged", sort=True
+    )
+    assert (tmp_path / "merged").read_text().splitlines() == sorted(
+        expected_output.splitlines()
+    )
@@ -0,0 +1,73 @@
+import gzip
+import os
+
+from rapidgzip import RapidgzipFile
+
+from woc.base import WocFile
+from woc.gzip_index import GzipIndexManager, is_gzip
+
+
+def _write_large(path, n=20000):
+    body = ";".join(f"file{i}.py" for i in range(n)).encode()
+    path.write_bytes(gzip.compress(b"header\n" + body))
+    return body
+
+
+def test_build_and_load(tmp_path):
+    _large = tmp_path / "b2fFullR.1.tch.large.abc"
+    body = _write_large(_large)
+    assert is_gzip(str(_large))
+    indexes = GzipIndexManager(str(tmp_path / "idx"))
+    assert indexes.find(str(_large)) is None
+    _path = indexes.build(str(_large))
+    assert os.path.exists(_path) and indexes.find(str(_large)) == _path
+    assert indexes.build(str(_large)) == _path  # not rebuilt
+    assert [p for p in os.listdir(tmp_path / "idx") if p.endswith(".tmp")] == []
+    with RapidgzipFile(str(_large)) as f:
+        assert indexes.load(f, str(_large))
+        f.seek(7 + 100)
+        assert f.read(50) == body[100:150]
+
+    # the digest of the profile keys the index, a replaced file misses it
+    assert indexes.index_name(WocFile(str(_large), digest="a")) != indexes.index_name(
+        WocFile(str(_large), digest="b")
+    )
+    _write_large(_large, 30000)
+    assert indexes.find(str(_large)) is None
+
+
+def test_shared_dirs(tmp_path):
+    _large = tmp_path / "b2fFullR.1.tch.large.abc"
+    _write_large(_large)
+    shared = GzipIndexManager(str(tmp_path / "shared"))
+    _path = shared.build(str(_large))
+    # read-only consumers find it before their own cache
+    indexes = GzipIndexManager(
+        str(tmp_path / "own"), shared_dirs=[str(tmp_path / "shared")]
+    )
+    assert indexes.find(str(_large)) == _path
+    assert indexes.build(str(_large)) == _path
+    assert not os.path.exists(tmp_path / "own")
+    # missing indexes are built on open only if asked to
+    lazy = GzipIndexManager(str(tmp_path / "lazy"), build_on_open=True)
+    with RapidgzipFile(str(_large)) as f:
+        assert lazy.load(f, str(_large))
+    assert lazy.find(str(_large)).startswith(str(tmp_path / "lazy"))
+
+
+def test_prebuild(tmp_path):
+    _gz = tmp_path / "b2fFullR.1.tch.large.abc"
+    _write_large(_gz)
+    _plain = tmp_path / "b2cFullR.1.tch.large.def"
+    _plain.write_bytes(b"\0" * 60)
+    profile = {
+        "maps": {
+            "b2f": [
+                {"larges": {"abc": {"path": str(_gz), "size": None, "digest": None}}}
+            ],
+            "b2c": [{"larges": {"def": str(_plain)}}],
+        }
+    }
+    indexes = GzipIndexManager(str(tmp_path / "idx"))
+    paths = indexes.prebuild(profile)
+    assert paths == [indexes.find(str(_gz))]
@@ -1,10 +1,36 @@
+import gzip
+import json
+import mmap
 import multiprocessing
 import os
+import pickle
 
 import pytest
 
 # Import the TCHashDB class
-from woc.local import WocMapsLocal, decode_str
+from woc.local import (
+    DecompArena,
+    LargeFileReader,
+    ShaList,
+    WocMapsLocal,
+    _BinPool,
+    _coalesce_ranges,
+    _split_columns,
+    decode_commit,
+    decode_str,
+    decode_tree,
+    decomp,
+    decomp_many,
+    decomp_or_raw,
+    get_tch,
+    parse_worker,
+    scan_idx_bin,
+    split_items,
+    split_triples,
+    worker_shards,
+)
+from woc.tch import TCHashDB
+from woc.utils import tch_stats
 
 
 @pytest.fixture
@@ -14,6 +40,28 @@ def woc():
     yield woc
 
 
+@pytest.fixture
+def tmp_profile(tmp_path):
+    """Write a copy of the test profile changed by mutator(profile), return its path"""
+
+    def _write(mutator):
+        _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+        with open(_test_pr) as f:
+            profile = json.load(f)
+        mutator(profile)
+        _pr = tmp_path / "profile.json"
+        _pr.write_text(json.dumps(profile))
+        return str(_pr)
+
+    return _write
+
+
+def _b2c_fixture_shard(profile):
+    # only b2cFullR.1.tch is in fixtures, read it as the single shard of b2c
+    profile["maps"]["b2c"][0]["sharding_bits"] = 0
+    profile["maps"]["b2c"][0]["shards"] = ["./tests/fixtures/b2cFullR.1.tch"]
+
+
 def test_c2p(woc):
     res = woc.get_values("c2p", "e4af89166a17785c1d741b8b1d5775f3223f510f")
     assert res[0] == "W4D3_news"
@@ -149,6 +197,405 @@ def test_tree_tch(woc):
     )
 
 
+def test_group_by_shard(woc):
+    keys = [
+        "e4af89166a17785c1d741b8b1d5775f3223f510f",
+        "zz",
+        "3f2eca18f1bc0f3117748e2cea9251e5182db2f7",
+        bytes.fromhex("e4af89166a17785c1d741b8b1d5775f3223f510f"),
+    ]
+    _map = woc._lookup["b2c"]
+    groups, larges, errors = woc._group_by_shard(_map, keys)
+    assert list(errors) == [1] and larges == [2]
+    assert [pos for pos, _ in groups.values()] == [[0, 3]]
+    assert [k for _, k in groups.values()] == [[keys[3], keys[3]]]
+
+
+def test_exists_many(woc):
+    keys = [
+        "e4af89166a17785c1d741b8b1d5775f3223f510f",
+        "0000000000000000000000000000000000000000",
+        bytes.fromhex("e4af89166a17785c1d741b8b1d5775f3223f510f"),
+    ]
+    assert woc.exists_many("c2p", keys) == [True, False, True]
+    assert woc.exists_many("c2p", []) == []
+    assert woc.exists_many("c2p", ["zz", keys[0], "e4af8916"]) == [False, True, False]
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    assert woc.exists_many(
+        "b2c", [_large, "05fe634ca4c8386349ac519f899145c75fff4169"]
+    ) == [True, True]
+    _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+    assert WocMapsLocal(_test_pr, on_large="ignore").exists_many("b2c", [_large]) == [
+        False
+    ]
+    woc_err = WocMapsLocal(_test_pr, on_bad="error")
+    assert woc_err.exists_many("c2p", ["3f631f976149d8702d0b1496df7b98f16a9357ed"]) == [
+        False
+    ]
+
+
+def test_get_values_many(woc):
+    keys = [
+        "e4af89166a17785c1d741b8b1d5775f3223f510f",
+        "0000000000000000000000000000000000000000",
+        "3f2eca18f1bc0f3117748e2cea9251e5182db2f7",
+        "zz",
+    ]
+    res, errors = woc.get_values_many("c2p", keys[:2] + keys[3:])
+    assert res == {keys[0]: woc.get_values("c2p", keys[0])}
+    assert list(errors) == [keys[1], keys[3]]
+    res, errors = woc.get_values_many("b2c", iter(keys[2:3]), order="shard")
+    assert res == {keys[2]: woc.get_values("b2c", keys[2])}
+    assert errors == {}
+    with pytest.raises(ValueError):
+        woc.get_values_many("c2p", keys, order="random")
+
+
+def test_show_content_many(woc):
+    for obj_name in ("tree", "commit", "blob"):
+        keys = [k.hex() for k in woc.all_keys(obj_name)]
+        keys.insert(1, "0000000000000000000000000000000000000000")
+        res, errors = woc.show_content_many(obj_name, keys)
+        assert list(res) == keys[:1] + keys[2:]
+        assert all(v == woc.show_content(obj_name, k) for k, v in res.items())
+        assert list(errors) == keys[1:2]
+        res, errors = woc.show_content_many(obj_name, keys, order="shard")
+        assert set(res) == set(keys[:1] + keys[2:])
+
+
+def test_bin_pool(woc):
+    _blobs = [
+        "05fe634ca4c8386349ac519f899145c75fff4169",
+        "46aaf071f1b859c5bf452733c2583c70d92cd0c8",
+    ]
+    paths = [woc._blob_path(bytes.fromhex(b)) for b in _blobs]
+    assert len(set(paths)) == 2
+    pool = _BinPool(max_open=1)
+    for b, _path in zip(_blobs, paths):
+        offset, length = woc._get_pos("blob", b)
+        with open(_path, "rb") as f:
+            f.seek(offset)
+            assert pool.pread(_path, offset, length) == f.read(length)
+        assert len(pool) == 1
+    # evicted while being read, closed by the reader
+    fd = pool._acquire(paths[0])
+    pool._acquire(paths[1])
+    assert fd in pool._retired
+    pool._release(fd)
+    assert not pool._retired
+    pool.reset()
+    assert len(pool) == 0
+    assert (
+        woc.show_content("blob", _blobs[1])
+        == woc.show_content_many("blob", _blobs)[0][_blobs[1]]
+    )
+
+
+def test_coalesce_ranges():
+    assert _coalesce_ranges([]) == []
+    spans = _coalesce_ranges([(0, 10, 0), (10, 5, 1), (20, 5, 2), (100, 5, 3)], gap=5)
+    assert spans == [
+        (0, 25, [(0, 10, 0), (10, 5, 1), (20, 5, 2)]),
+        (100, 5, [(100, 5, 3)]),
+    ]
+    # duplicates share a span, spans stop growing at max_span
+    assert _coalesce_ranges([(0, 10, 0), (0, 10, 1)]) == [
+        (0, 10, [(0, 10, 0), (0, 10, 1)])
+    ]
+    assert len(_coalesce_ranges([(0, 10, 0), (10, 10, 1)], max_span=15)) == 2
+
+
+def test_blob_many(woc):
+    _blobs = [
+        "05fe634ca4c8386349ac519f899145c75fff4169",
+        "46aaf071f1b859c5bf452733c2583c70d92cd0c8",
+    ]
+    _keys = [b for b, _ in woc.all_items("blob")][:50] + _blobs * 2
+    res, errors = woc.show_content_many("blob", _keys)
+    assert not errors
+    assert all(res[k] == woc.show_content("blob", k) for k in _keys)
+
+
+def test_blob_many_worker(tmp_path, tmp_profile):
+    # blob positions sharded by one bit, so workers get different keys
+    def _shard_blobs(profile):
+        _shards = [
+            TCHashDB(path=str(tmp_path / f"sha1.blob_{j}.tch"), ro=False)
+            for j in range(2)
+        ]
+        for k, v in get_tch(profile["objects"]["sha1.blob.tch"]["shards"][0]).items():
+            _shards[k[0] & 1][k] = v
+        for db in _shards:
+            db.close()
+        profile["objects"]["sha1.blob.tch"] = {
+            "sharding_bits": 1,
+            "shards": [str(tmp_path / f"sha1.blob_{j}.tch") for j in range(2)],
+        }
+
+    woc = WocMapsLocal(tmp_profile(_shard_blobs))
+    _blobs = [
+        "05fe634ca4c8386349ac519f899145c75fff4169",
+        "46aaf071f1b859c5bf452733c2583c70d92cd0c8",
+    ]
+    for k in range(2):
+        res, errors = woc.show_content_many("blob", _blobs, worker=(k, 2))
+        assert not errors and list(res) == [
+            b for b in _blobs if woc.key_worker("blob", b, 2) == k
+        ]
+        assert all(v == woc.show_content("blob", b) for b, v in res.items())
+
+
+def test_get_values_numpy(woc):
+    np = pytest.importorskip("numpy")
+    _blob = "05fe634ca4c8386349ac519f899145c75fff4169"
+    _commit = "e4af89166a17785c1d741b8b1d5775f3223f510f"
+    res = woc.get_values("b2c", _blob, format="numpy")
+    assert res.dtype == np.dtype("S20")
+    assert [v.hex() for v in res.view("V20").tolist()] == woc.get_values("b2c", _blob)
+    # large files are read in chunks and concatenated
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    res = woc.get_values("b2c", _large, format="numpy")
+    assert len(res) == len(woc.get_values("b2c", _large))
+    res = woc.get_values("b2fa", _blob, format="numpy")
+    _time, _author, _sha = woc.get_values("b2fa", _blob)
+    assert res["time"][0] == int(_time)
+    assert res["author"][0].decode() == _author
+    assert res["sha"][0].hex() == _sha
+    res = woc.get_values("c2r", _commit, format="numpy")
+    assert (res["sha"][0].hex(), int(res["length"][0])) == tuple(
+        woc.get_values("c2r", _commit)
+    )
+    cols = woc.get_values("b2tac", _blob, format="numpy")
+    assert [tuple(v.decode() for v in row) for row in zip(*cols)] == woc.get_values(
+        "b2tac", _blob
+    )
+    with pytest.raises(ValueError):
+        woc.get_values("c2p", _commit, format="numpy")
+    res, errors = woc.get_values_many("b2c", [_blob, "f" * 40], format="numpy")
+    assert list(res) == [_blob] and list(errors) == ["f" * 40]
+    with pytest.raises(ValueError):
+        woc.get_values_many("c2p", [_commit], format="numpy")
+
+
+def test_shalist(woc):
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    _commit = "e4af89166a17785c1d741b8b1d5775f3223f510f"
+    res = woc.get_values("b2c", _large, format="shalist")
+    expected = woc.get_values("b2c", _large)
+    assert isinstance(res, ShaList)
+    assert res == expected and list(res) == expected and len(res) == len(expected)
+    assert (
+        res[-1] == expected[-1]
+        and res[2:5] == expected[2:5]
+        and res[::3] == expected[::3]
+    )
+    assert res[2:5].raw is res.raw  # no copy
+    assert expected[1] in res and bytes.fromhex(expected[1]) in res
+    assert "f" * 40 not in res and "xyz" not in res and 1 not in res
+    assert res.index(expected[0]) == 0 and res.count(expected[0]) == expected.count(
+        expected[0]
+    )
+    assert pickle.loads(pickle.dumps(res[1:3])) == expected[1:3]
+    with pytest.raises(IndexError):
+        res[len(res)]
+    with pytest.raises(TypeError):
+        hash(res)
+    # accepted as keys of batch lookups
+    shas = ShaList(bytes.fromhex(_commit) * 2)
+    values, errors = woc.get_values_many("c2p", shas)
+    assert values == {_commit: woc.get_values("c2p", _commit)} and errors == {}
+    values, _ = woc.get_values_many("b2c", [_large], format="shalist")
+    assert values[_large] == expected
+    with pytest.raises(ValueError):
+        woc.get_values("c2p", _commit, format="shalist")
+    # objects have no dtypes, their values are compressed content
+    for obj_name in ("commit", "tree"):
+        with pytest.raises(ValueError):
+            woc.get_values(obj_name, _commit, format="shalist")
+        with pytest.raises(ValueError):
+            woc.get_values_many(obj_name, [_commit], format="shalist")
+
+
+def test_split_items():
+    assert split_items(b"") == []
+    assert split_items(b"a;;EMPTY;b;") == ["a", "b"]
+    assert split_items(b"EMPTYa;\xc3\xa9") == ["EMPTYa", "\xe9"]
+    # only the badly encoded field is decoded with a detected encoding
+    res = split_items(b"ok;caf\xe9")
+    assert res[0] == "ok" and len(res) == 2
+    assert split_triples(b"") == []
+    assert split_triples(b"a;b;c;d;e") == [("a", "b", "c")]
+    assert split_triples(b"a;;c;;;") == [("a", "", "c"), ("", "", "")]
+    assert split_triples(memoryview(b"\xc3\xa9;b;c")) == [("\xe9", "b", "c")]
+
+
+def test_split_columns():
+    assert _split_columns(b"a;bb;c;dddd;e;f;g", 3) == (
+        [b"a\x00\x00\x00dddd", b"bbe\x00", b"cf"],
+        [4, 2, 1],
+        2,
+    )
+    assert _split_columns(b"", 3)[2] == 0
+    assert _split_columns(b"a;b;c;", 3) == ([b"a", b"b", b"c"], [1, 1, 1], 1)
+
+
+def test_decode_buffers(woc):
+    for obj, decoder in (("tree", decode_tree), ("commit", decode_commit)):
+        for key in woc.all_keys(obj):
+            raw = woc._get_tch_bytes(obj, key)[0]
+            expected = decoder(decomp(raw))
+            assert decoder(decomp(memoryview(raw))) == expected
+            assert decoder(memoryview(decomp(raw))) == expected
+            assert decoder(bytearray(decomp(raw))) == expected
+            assert woc.show_content(obj, key) == expected
+
+
+def test_decomp_many(woc):
+    raws = [woc._get_tch_bytes("tree", k)[0] for k in woc.all_keys("tree")]
+    raws += [woc._get_tch_bytes("commit", k)[0] for k in woc.all_keys("commit")]
+    arena = DecompArena(16)
+    res = decomp_many(raws, arena)
+    assert [bytes(v) for v in res] == [bytes(decomp(r)) for r in raws]
+    assert decode_tree(res[0]) == decode_tree(decomp(raws[0]))
+    # views of the last call are alive, so the arena moves to a new buffer to grow
+    res2 = decomp_many(raws * 2, arena)
+    assert [bytes(v) for v in res] == [bytes(decomp(r)) for r in raws]
+    assert [bytes(v) for v in res2] == [bytes(decomp(r)) for r in raws * 2]
+    # uncompressed, empty and corrupted values
+    odd = [b"", b"\x00raw", raws[0][:5], b"\xff\xff"]
+    assert decomp_many(odd, or_raw=True) == [decomp_or_raw(r) for r in odd]
+    with pytest.raises(ValueError):
+        decomp_many(odd)
+    assert decomp_many([]) == []
+
+
+def test_cache():
+    _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+    woc_cached = WocMapsLocal(_test_pr, cache=True)
+    woc = WocMapsLocal(_test_pr)
+    _commit = "e4af89166a17785c1d741b8b1d5775f3223f510f"
+    for _ in range(3):
+        assert woc_cached.get_values("c2p", _commit) == woc.get_values("c2p", _commit)
+        for obj_name, key in (
+            ("commit", _commit),
+            ("tree", "f1b66dcca490b5c4455af319bc961a34f69c72c2"),
+            ("blob", "05fe634ca4c8386349ac519f899145c75fff4169"),
+        ):
+            assert woc_cached.show_content(obj_name, key) == woc.show_content(
+                obj_name, key
+            )
+    # cached values can't be modified through returned lists
+    woc_cached.get_values("c2p", _commit).clear()
+    assert woc_cached.get_values("c2p", _commit) == woc.get_values("c2p", _commit)
+    stats = woc_cached.cache.stats()
+    assert stats["c2p"]["decoded"]["hits"] == 4
+    assert stats["c2p"]["decoded"]["misses"] == 1
+    assert stats["commit.tch"]["decoded"]["hits"] == 2
+    assert stats["commit.tch"]["raw"]["misses"] == 1
+    # values are cached by key, in any form
+    woc_cached.show_content("commit", bytes.fromhex(_commit))
+    woc_cached.get_values("c2p", bytes.fromhex(_commit))
+    stats = woc_cached.cache.stats()
+    assert stats["commit.tch"]["decoded"]["hits"] == 3
+    assert stats["commit.tch"]["decoded"]["misses"] == 1
+    assert stats["c2p"]["decoded"]["hits"] == 5
+    assert (
+        stats["c2p"]["decoded"]["entries"]
+        == stats["commit.tch"]["decoded"]["entries"]
+        == 1
+    )
+    with pytest.raises(KeyError):
+        woc_cached.show_content("commit", "0" * 40)
+
+
+def test_tch_tuning():
+    _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+    woc_tuned = WocMapsLocal(
+        _test_pr, tch_tuning={"commit": {"xmsiz": 0}, "c2p": {"rcnum": 100}}
+    )
+    assert woc_tuned._tch_tuning == {
+        "commit.tch": {"xmsiz": 0},
+        "c2p": {"rcnum": 100},
+    }
+    res = woc_tuned.get_values("c2p", "e4af89166a17785c1d741b8b1d5775f3223f510f")
+    assert res[0] == "W4D3_news"
+
+
+@pytest.mark.parametrize("dtype", ["s", "cs3"])
+def test_large_file_reader(tmp_path, dtype):
+    n = 3 if dtype == "cs3" else 1
+    fields = [
+        f"{i};Author {i} <a{i}@x.org>" if i % n else f"field{i}" * (i % 7)
+        for i in range(6000)
+    ]
+    body = ";".join(fields).encode()
+    _path = str(tmp_path / f"{dtype}.large.gz")
+    with open(_path, "wb") as f:
+        f.write(gzip.compress(b"header\n" + body))
+    expected = split_triples(body) if dtype == "cs3" else split_items(body)
+    assert list(LargeFileReader(_path, dtype)) == expected
+    for block_size in (1, 10, 4096):
+        _reader = LargeFileReader(
+            _path, dtype, block_size=block_size, max_block_size=3 * block_size
+        )
+        assert list(_reader) == expected
+        assert _reader.read() is None
+    with LargeFileReader(_path, dtype, block_size=64, readahead=2, threads=1) as _reader:
+        assert list(_reader) == expected
+    # stopped in the middle
+    _reader = LargeFileReader(_path, dtype, block_size=64, readahead=1)
+    first = _reader.read()
+    assert first == expected[: len(first)]
+    _reader.close()
+    assert _reader.read() is None
+    raw = b"".join(LargeFileReader(_path, dtype).chunks())
+    assert body.startswith(raw.rstrip(b";"))
+    assert (split_triples(raw) if dtype == "cs3" else split_items(raw)) == expected
+
+
+def test_large_readahead(tmp_path, tmp_profile):
+    _key = "a11777cc471a4344702741ab1c8a588998b1311a"
+    body = ";".join(f"{i};Author {i};{i:040x}" for i in range(20000)).encode()
+    _large = tmp_path / f"b2tacFullU.1.tch.large.{_key}"
+    _large.write_bytes(gzip.compress(f"{_key};20000\n".encode() + body))
+
+    def _with_large(profile):
+        profile["maps"]["b2tac"][0]["larges"] = {_key: str(_large)}
+        profile["maps"]["b2tac"][0]["sharding_bits"] = 0
+        profile["maps"]["b2tac"][0]["shards"] = ["./tests/fixtures/b2tacFullU.1.tch"]
+
+    _pr = tmp_profile(_with_large)
+    expected = split_triples(body)
+    woc = WocMapsLocal(_pr, large_readahead=2, gzip_threads=1)
+    assert woc.get_values("b2tac", _key) == expected
+    assert dict(woc.all_items("b2tac"))[bytes.fromhex(_key)] == expected
+    # only the first chunk, without a background thread
+    head = WocMapsLocal(_pr, on_large="head", large_readahead=2).get_values("b2tac", _key)
+    assert 0 < len(head) < len(expected) and head == expected[: len(head)]
+
+
+def test_large_file_reader_sha(woc):
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    _path = woc.config["maps"]["b2c"][0]["larges"][_large]
+    expected = woc.get_values("b2c", _large)
+    assert list(LargeFileReader(_path, "h")) == expected
+    assert list(LargeFileReader(_path, "h", block_size=30)) == expected
+    assert b"".join(LargeFileReader(_path, "h").chunks()).hex() == "".join(expected)
+
+
+def test_large_zero_copy(woc):
+    np = pytest.importorskip("numpy")
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    expected = woc.get_values("b2c", _large)
+    res = woc.get_values("b2c", _large, format="shalist")
+    assert isinstance(res.raw, memoryview) and isinstance(res.raw.obj, mmap.mmap)
+    assert res == expected and pickle.loads(pickle.dumps(res)) == expected
+    arr = woc.get_values("b2c", _large, format="numpy")
+    assert isinstance(arr.base.obj, mmap.mmap)
+    assert [v.hex() for v in arr.view("V20").tolist()] == expected
+    assert np.shares_memory(arr, np.frombuffer(res.raw, "S20"))
+
+
 def test_count(woc):
     res = woc.count("blob")
     assert res == 2
@@ -158,6 +605,31 @@ def test_count(woc):
     assert res == 7
 
 
+def test_count_stored(tmp_profile):
+    def _with_stats(profile):
+        _shards = profile["objects"]["commit.tch"]["shards"]
+        profile["objects"]["commit.tch"]["shards"] = [
+            {"path": _shards[0], "size": os.path.getsize(_shards[0]), "records": 100},
+            {"path": _shards[1], "size": 1, "records": 100},  # changed since detected
+        ]
+
+    woc = WocMapsLocal(tmp_profile(_with_stats))
+    _stale = woc._lookup["commit"].shards[1].path
+    assert woc.count("commit") == 100 + len(get_tch(_stale))
+    assert woc._lookup["commit"].shards[0].records == 100
+
+
+def test_detect_stats():
+    from woc.detect import detect_profile
+
+    profile = detect_profile([os.path.join(os.path.dirname(__file__), "fixtures")])
+    for shard in profile["objects"]["commit.tch"]["shards"]:
+        # the fixtures are open under their relative paths already
+        _tch = get_tch(f"./tests/fixtures/{os.path.basename(shard['path'])}")
+        assert shard["records"] == len(_tch) and shard["buckets"] > 0
+        assert tch_stats(shard["path"])["size"] == shard["size"]
+
+
 def test_all_keys(woc):
     res = list(woc.all_keys("blob"))
     assert len(res) == 2
@@ -170,6 +642,155 @@ def test_all_keys(woc):
     assert all(isinstance(r, bytes) for r in res)
 
 
+def test_all_items(woc):
+    res = dict(woc.all_items("tree"))
+    assert len(res) == 12
+    assert res[bytes.fromhex("f1b66dcca490b5c4455af319bc961a34f69c72c2")] == (
+        woc.show_content("tree", "f1b66dcca490b5c4455af319bc961a34f69c72c2")
+    )
+    res = dict(woc.all_items("commit"))
+    assert len(res) == 7
+    assert all(v == woc.show_content("commit", k) for k, v in res.items())
+    res = dict(woc.all_items("blob"))
+    assert all(v == woc._get_pos("blob", k) for k, v in res.items())
+
+
+def test_all_items_large(tmp_profile):
+    _pr = tmp_profile(_b2c_fixture_shard)
+    res = dict(WocMapsLocal(_pr).all_items("b2c"))
+    _large = bytes.fromhex("3f2eca18f1bc0f3117748e2cea9251e5182db2f7")
+    assert res[_large][0] == "00003a69db53b45a67f76632f33a93691da77197"
+    _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+    assert res[_large] == WocMapsLocal(_test_pr).get_values("b2c", _large)
+    assert _large not in dict(WocMapsLocal(_pr, on_large="ignore").all_items("b2c"))
+
+
+def test_partition(woc):
+    for map_name in ("tree", "commit", "blob"):
+        full = dict(woc.all_items(map_name))
+        for n in (1, 2, 5):
+            parts = [list(woc.all_keys(map_name, partition=(i, n))) for i in range(n)]
+            keys = [k for part in parts for k in part]
+            assert len(keys) == len(set(keys)) == len(full)
+            items = [
+                kv for i in range(n) for kv in woc.all_items(map_name, partition=(i, n))
+            ]
+            assert dict(items) == full
+    with pytest.raises(ValueError):
+        list(woc.all_keys("tree", partition=(2, 2)))
+
+
+def test_worker(woc):
+    assert (
+        parse_worker("1/3") == parse_worker((1, 3)) == (1, 3)
+        and parse_worker(None) is None
+    )
+    for spec in ("3/3", "1", "a/b", (0, 0)):
+        with pytest.raises(ValueError):
+            parse_worker(spec)
+    assert worker_shards(8, "1/3") == [1, 4, 7]
+
+    keys = list(woc.all_keys("commit"))
+    parts = [list(woc.all_keys("commit", worker=(k, 2))) for k in range(2)]
+    assert sorted(parts[0] + parts[1]) == sorted(keys)
+    for k, part in enumerate(parts):
+        assert all(woc.key_worker("commit", key, 2) == k for key in part)
+        res, errors = woc.show_content_many("commit", keys + ["xyz"], worker=f"{k}/2")
+        assert sorted(res) == sorted(part) and list(errors) == (["xyz"] if k == 0 else [])
+    assert woc.partition_keys("commit", keys, "0/1") == keys
+
+    # large files go to the worker of their key
+    _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+    k = woc.key_worker("b2c", _large, 2)
+    assert bytes.fromhex(_large) in dict(woc.all_items("b2c", worker=(k, 2)))
+    assert bytes.fromhex(_large) not in dict(
+        woc._iter_large_items(woc._lookup["b2c"], None, (1 - k, 2))
+    )
+    assert list(woc.get_values_many("b2c", [_large], worker=(1 - k, 2))[0]) == []
+
+
+def test_map_reduce(woc):
+    for workers in (1, 3):
+        for obj_name in ("tree", "commit", "blob"):
+            assert woc.map_reduce(
+                obj_name, lambda k, v: 1, lambda a, b: a + b, workers=workers
+            ) == len(list(woc.all_keys(obj_name)))
+        res = woc.map_reduce(
+            "tree", lambda k, v: {k: v}, lambda a, b: {**a, **b}, workers=workers
+        )
+        assert res == dict(woc.all_items("tree"))
+    assert (
+        woc.map_reduce("tree", lambda k, v: None, lambda a, b: a + b, workers=2) is None
+    )
+    with pytest.raises(KeyError):
+        woc.map_reduce("nope", lambda k, v: 1, lambda a, b: a + b)
+    # a mapper may run map_reduce itself, the outer one goes on with its own job
+    _inner = woc.map_reduce("commit", lambda k, v: 1, lambda a, b: a + b, workers=1)
+    for workers in (1, 2):
+        res = woc.map_reduce(
+            "tree",
+            lambda k, v: woc.map_reduce(
+                "commit", lambda k, v: 1, lambda a, b: a + b, workers=1
+            ),
+            lambda a, b: a + b,
+            workers=workers,
+        )
+        assert res == _inner * len(list(woc.all_keys("tree")))
+
+
+def test_map_reduce_large(tmp_profile):
+    woc = WocMapsLocal(tmp_profile(_b2c_fixture_shard))
+    res = woc.map_reduce(
+        "b2c", lambda k, v: {k: len(v)}, lambda a, b: {**a, **b}, workers=2
+    )
+    assert res == {k: len(v) for k, v in woc.all_items("b2c")}
+
+
+def test_scan_objects(tmp_path, tmp_profile):
+    expected = {}
+
+    def _write_idx_bin(profile):
+        for j, _tch in enumerate(profile["objects"]["commit.tch"]["shards"]):
+            _items = list(get_tch(_tch).items())
+            with open(tmp_path / f"commit_{j}.idx", "w") as idx, open(
+                tmp_path / f"commit_{j}.bin", "wb"
+            ) as out:
+                for i, (k, v) in enumerate(_items):
+                    idx.write(f"{i};{out.tell()};{len(v)};{k.hex()}\n")
+                    out.write(v)
+                    out.write(b"\0" * (i % 3))  # gaps between objects
+            expected.update((k, decode_commit(decomp_or_raw(v))) for k, v in _items)
+        for ext in ("idx", "bin"):
+            profile["objects"][f"commit.{ext}"]["shards"] = [
+                str(tmp_path / f"commit_{j}.{ext}") for j in range(2)
+            ]
+
+    woc = WocMapsLocal(tmp_profile(_write_idx_bin))
+    res = list(woc.scan_objects("commit", block_size=1024))
+    assert dict(res) == expected and len(res) == len(expected)
+    parts = [list(woc.scan_objects("commit", worker=(j, 2))) for j in range(2)]
+    assert parts[0] + parts[1] == list(woc.scan_objects("commit"))
+    assert list(woc.scan_objects("commit", worker="1/2")) == parts[1]
+    with pytest.raises(ValueError):
+        next(woc.scan_objects("commit", worker="2/2"))
+    with pytest.raises(ValueError):
+        next(woc.scan_objects("c2p"))
+    woc._lookup["commit.bin"].shards.pop()  # a shard missing from the profile
+    with pytest.raises(KeyError):
+        list(woc.scan_objects("commit"))
+
+    # blob lines have the full length before the sha
+    (tmp_path / "blob_0.idx").write_text(f"0;2;3;5;{'ab' * 20};{'cd' * 20};1\n\n")
+    (tmp_path / "blob_0.bin").write_bytes(b"\0\0abc")
+    res = [
+        (k, bytes(v))
+        for k, v in scan_idx_bin(
+            str(tmp_path / "blob_0.idx"), str(tmp_path / "blob_0.bin")
+        )
+    ]
+    assert res == [(bytes.fromhex("ab" * 20), b"abc")]
+
+
 def test_version(woc):
     _test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
     woc_u = WocMapsLocal(_test_pr, version="U")
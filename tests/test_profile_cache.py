@@ -0,0 +1,48 @@
+import json
+import os
+
+from woc.local import WocMapsLocal
+from woc.profile_cache import LazyLarges, load_profile
+
+_test_pr = os.path.join(os.path.dirname(__file__), "test_profile.json")
+
+
+def test_load_profile(tmp_path):
+    _pr = tmp_path / "wocprofile.json"
+    _pr.write_text(open(_test_pr).read())
+    with open(_test_pr) as f:
+        expected = json.load(f)
+    _cache = tmp_path / "cache"
+
+    assert load_profile(str(_pr), str(_cache)) == expected
+    assert len(os.listdir(_cache)) == 1
+    config = load_profile(str(_pr), str(_cache))
+    _larges = config["maps"]["b2c"][0]["larges"]
+    assert isinstance(_larges, LazyLarges) and "not loaded" in repr(_larges)
+    assert dict(_larges) == expected["maps"]["b2c"][0]["larges"]
+    assert config == expected
+
+    # a changed profile is compiled again
+    expected["maps"]["b2c"][0]["larges"] = {}
+    _pr.write_text(json.dumps(expected))
+    assert load_profile(str(_pr), str(_cache)) == expected
+    assert load_profile(str(_pr), str(_cache)) == expected
+
+    # a broken cache is ignored and replaced
+    (_cache / os.listdir(_cache)[0]).write_bytes(b"garbage")
+    assert load_profile(str(_pr), str(_cache)) == expected
+    assert load_profile(str(_pr), None) == expected
+
+
+def test_lazy_larges():
+    woc = WocMapsLocal(_test_pr)
+    for _ in range(2):  # compiled by the first one
+        woc = WocMapsLocal(_test_pr)
+        _large = "3f2eca18f1bc0f3117748e2cea9251e5182db2f7"
+        assert _large in woc._lookup["b2c"].larges
+        assert woc._lookup["b2c"].larges[_large].path.endswith(_large)
+        assert (
+            woc.get_values("b2c", _large)[0] == "00003a69db53b45a67f76632f33a93691da77197"
+        )
+    woc = WocMapsLocal(_test_pr, profile_cache=False)
+    assert list(woc._lookup["b2c"].larges) == [_large]
@@ -1,7 +1,7 @@
 import pytest
 
 # Import the TCHashDB class
-from woc.tch import TCHashDB
+from woc.tch import TCHashDB, TCHashDBLoader
 
 
 @pytest.fixture
@@ -92,3 +92,237 @@ def test_open(tmp_path):
     # ref: lib/tchdb.c#L370
     with pytest.raises(OSError):
         db2 = TCHashDB(path=str(path), ro=True)
+
+
+def test_get_many(db):
+    db[b"key13"] = b"value13"
+    db[b"key14"] = b"value14"
+    assert db.get_many([b"key13", b"missing", b"key14"]) == [
+        b"value13",
+        None,
+        b"value14",
+    ]
+    assert db.get_many([b"missing"], default=b"") == [b""]
+    assert db.hits == 2
+    assert db.misses == 2
+
+
+def test_get_many_into(db):
+    db[b"key15"] = b"value15"
+    out = {}
+    assert db.get_many_into([b"key15", b"missing"], out) == 1
+    assert out == {b"key15": b"value15"}
+    assert db.hits == 1
+    assert db.misses == 1
+
+
+def test_thread_safe(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = tmp_path / "test_db.tch"
+    db = TCHashDB(path=str(path))
+    keys = [f"key{i}".encode() for i in range(1000)]
+    for key in keys:
+        db[key] = key * 2
+    db.close()
+
+    db = TCHashDB(path=str(path), ro=True, thread_safe=True)
+    assert db.thread_safe
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(db.get_many, [keys] * 8))
+    assert all(r == [k * 2 for k in keys] for r in results)
+    assert db.hits == 8 * len(keys)
+    assert set(db) == set(keys)
+
+
+def test_tuning(tmp_path):
+    path = tmp_path / "test_db.tch"
+    db = TCHashDB(path=str(path))
+    db[b"key"] = b"value"
+    db.close()
+    for xmsiz, rcnum in ((0, 0), (1 << 20, 1000), (-1, 10)):
+        db = TCHashDB(path=str(path), ro=True, xmsiz=xmsiz, rcnum=rcnum)
+        assert db[b"key"] == b"value"
+        assert db[b"key"] == b"value"  # served from the record cache if enabled
+        db.close()
+
+
+def test_get_into(db):
+    db[b"key16"] = b"value16"
+    db[b"key17"] = b"x" * 100
+    buf = bytearray(8)
+    view = db.get_into(b"key16", buf)
+    assert bytes(view) == b"value16"
+    view.release()
+    # grows the buffer to fit
+    view = db.get_into(b"key17", buf)
+    assert bytes(view) == b"x" * 100
+    assert len(buf) == 100
+    # can't grow while a view is alive
+    db[b"key18"] = b"y" * 200
+    with pytest.raises(BufferError):
+        db.get_into(b"key18", buf)
+    view.release()
+    with pytest.raises(KeyError):
+        db.get_into(b"missing", buf)
+
+
+def test_items(db):
+    records = {b"key19": b"value19", b"key20": b"", b"key21": b"\x00" * 300}
+    for key, value in records.items():
+        db[key] = value
+    assert dict(db.items()) == records
+
+
+def test_contains(db):
+    db[b"key26"] = b"value26"
+    db[b"key27"] = b""
+    assert db.contains(b"key26")
+    assert b"key27" in db
+    assert b"missing" not in db
+    assert db.value_size(b"key26") == 7
+    assert db.value_size(b"key27") == 0
+    with pytest.raises(KeyError):
+        db.value_size(b"missing")
+    assert db.value_size_many([b"key26", b"missing", b"key27"]) == [7, -1, 0]
+    assert db.contains_many(iter([b"missing", b"key26"])) == [False, True]
+    assert db.hits == db.misses == 0
+
+
+def test_split(tmp_path):
+    path = str(tmp_path / "test_db.tch")
+    db = TCHashDB(path)
+    records = {f"key{i}".encode(): f"value{i}".encode() * (i % 7) for i in range(3000)}
+    for key, value in records.items():
+        db[key] = value
+    for key in list(records)[::5]:  # leave free blocks between records
+        del db[key]
+        del records[key]
+    db.close()
+    db = TCHashDB(path, ro=True, thread_safe=True)
+    for n in (1, 2, 7, 64):
+        bounds = db.split(n)
+        assert len(bounds) == n + 1
+        assert bounds == sorted(bounds) == db.split(n)
+        parts = [list(db.items_range(bounds[i], bounds[i + 1])) for i in range(n)]
+        keys = [k for part in parts for k, _ in part]
+        assert len(keys) == len(set(keys)) == len(records)
+        assert dict(kv for part in parts for kv in part) == records
+    bounds = db.split(4)
+    assert sum(
+        len(list(db.keys_range(bounds[i], bounds[i + 1]))) for i in range(4)
+    ) == len(records)
+    # ranges have their own cursors, so threads can share the handle
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        parts = list(
+            executor.map(
+                lambda i: dict(db.items_range(bounds[i], bounds[i + 1])), range(4)
+            )
+        )
+    assert {k: v for part in parts for k, v in part.items()} == records
+    with pytest.raises(ValueError):
+        db.split(0)
+    with pytest.raises(ValueError):
+        list(db.keys_range(0, bounds[-1]))
+    db.close()
+
+
+def test_split_balance(tmp_path):
+    path = str(tmp_path / "test_db.tch")
+    # far more records than buckets, so bucket heads are all near the start
+    db = TCHashDB(path, bnum=500)
+    db.put_many((f"key{i}".encode(), f"value{i}".encode()) for i in range(60000))
+    db.close()
+    db = TCHashDB(path, ro=True)
+    bounds = db.split(4)
+    sizes = [len(list(db.keys_range(bounds[i], bounds[i + 1]))) for i in range(4)]
+    assert sum(sizes) == 60000
+    assert max(sizes) < min(sizes) * 1.1
+    assert db.split(4) == bounds
+    db.close()
+
+
+def test_split_iter_concurrent(tmp_path):
+    path = str(tmp_path / "test_db.tch")
+    db = TCHashDB(path)
+    records = {f"key{i}".encode(): f"value{i}".encode() for i in range(20000)}
+    db.put_many(records.items())
+    db.close()
+    db = TCHashDB(path, ro=True, thread_safe=True)
+    bounds = db.split(4)
+    from concurrent.futures import ThreadPoolExecutor
+
+    # range scans move their own cursors, a plain iteration keeps the shared one
+    for plain in (lambda: dict.fromkeys(db), lambda: dict(db.items())):
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            scans = [
+                executor.submit(
+                    lambda i: dict(db.items_range(bounds[i], bounds[i + 1])), i
+                )
+                for i in range(4)
+            ]
+            result = executor.submit(plain).result()
+            assert {k: v for f in scans for k, v in f.result().items()} == records
+        assert result.keys() == records.keys()
+    db.close()
+
+
+def test_split_empty(db):
+    bounds = db.split(3)
+    assert list(db.keys_range(bounds[0], bounds[1])) == []
+    db[b"key"] = b"value"
+    bounds = db.split(3)
+    assert [list(db.items_range(bounds[i], bounds[i + 1])) for i in range(3)] == [
+        [(b"key", b"value")],
+        [],
+        [],
+    ]
+
+
+def test_put_many(db):
+    records = [(b"key22", b"value22"), (b"key23", b"value23")]
+    assert db.put_many(records) == 2
+    assert db.put_many(iter([(b"key22", b"-more")]), append=True) == 1
+    assert db[b"key22"] == b"value22-more"
+    assert db[b"key23"] == b"value23"
+    assert db.put_many([]) == 0
+    with pytest.raises(ValueError):
+        db.put_many(records, append=True, asynchronous=True)
+
+
+def test_transaction(db):
+    db[b"key24"] = b"value24"
+    db.begin()
+    db.put_many([(b"key24", b"changed"), (b"key25", b"value25")])
+    db.abort()
+    assert db[b"key24"] == b"value24"
+    assert b"key25" not in set(db)
+    db.begin()
+    db[b"key25"] = b"value25"
+    db.commit()
+    assert db[b"key25"] == b"value25"
+
+
+@pytest.mark.parametrize("transactional", [False, True])
+def test_loader(tmp_path, transactional):
+    path = str(tmp_path / "test_db.tch")
+    records = [(f"key{i}".encode(), f"value{i}".encode()) for i in range(1000)]
+    with TCHashDBLoader(
+        path, expected_records=1000, compression="deflate", transactional=transactional
+    ) as loader:
+        assert loader.put_many(records[:500]) == 500
+        assert loader.put_many(iter(records[500:])) == 500
+        loader.put_many([(b"key0", b"+")], append=True)
+    stats = loader.stats()
+    assert stats["records"] == 1001
+    assert stats["bytes"] == sum(len(k) + len(v) for k, v in records) + 5
+    assert stats["records_per_sec"] > 0
+    db = TCHashDB(path, ro=True)
+    assert len(db) == 1000
+    assert db[b"key0"] == b"value0+"
+    assert db[b"key999"] == b"value999"
+    db.close()
+    with pytest.raises(ValueError):
+        TCHashDBLoader(str(tmp_path / "other.tch"), compression="zstd")
@@ -22,7 +22,16 @@
 
 """  # noqa: D205
 
-__all__ = ["local", "tch", "detect", "objects", "remote"]
+__all__ = [
+    "local",
+    "tch",
+    "detect",
+    "objects",
+    "remote",
+    "cache",
+    "gzip_index",
+    "profile_cache",
+]
 
 import importlib.metadata
 
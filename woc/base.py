@@ -21,6 +21,24 @@ os.makedirs(WocCachePath, exist_ok=True)
 WocGzipChunkSize = 8 * 1024
 """Chunk size for decoding large maps."""
 
+WocLargeMaxBlockSize = 4 * 1024 * 1024
+"""Largest block read at once when streaming large maps, blocks grow from WocGzipChunkSize."""
+
+WocTchMmapLimit = 2 * 1024 * 1024 * 1024
+"""Shards up to this size are memory-mapped entirely unless tuned otherwise."""
+
+WocBinMaxOpen = 64
+"""Most blob .bin shards kept open at once for pread."""
+
+WocBinMergeGap = 64 * 1024
+"""Blobs of a .bin shard at most this far apart are fetched in one read by show_content_many."""
+
+WocBinMaxSpan = 16 * 1024 * 1024
+"""Largest read of neighbouring blobs by show_content_many."""
+
+WocBinScanBlockSize = 8 * 1024 * 1024
+"""Block read at once when scanning .bin files sequentially."""
+
 TreeEntry = Tuple[str, str, str]
 TreeContent = List[TreeEntry]
 CommitContent = Tuple[
@@ -54,6 +72,12 @@ class WocFile:
     digest: Optional[str] = None
     """16-char digest calculated by woc.utils.fast_digest."""
 
+    records: Optional[int] = None
+    """Number of records of a TCH shard (tchdbrnum), recorded by woc.detect."""
+
+    buckets: Optional[int] = None
+    """Number of hash buckets of a TCH shard (tchdbbnum), recorded by woc.detect."""
+
 
 @dataclass
 class WocObject:
@@ -0,0 +1,172 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+"""Sentinel returned on cache misses, as None may be a cached value."""
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory footprint of a decoded value in bytes.
+
+    Only follows the containers WoC values are made of (tuple, list).
+
+    >>> estimate_size(('1410029988', 'Audris Mockus <audris@utk.edu>'))
+    194
+    """
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache evicting by the total size of its values."""
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: budget of the cache, values larger than it are never cached
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get a value and mark it as recently used.
+
+        :return: the cached value, or _MISSING
+        """
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """
+        Store a value, evicting least recently used ones to stay within the budget.
+
+        :param size: size of the value in bytes
+        """
+        if size > self.max_bytes or self.max_bytes <= 0:
+            return
+        with self._lock:
+            _old = self._data.pop(key, None)
+            if _old is not None:
+                self.bytes -= _old[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _size) = self._data.popitem(last=False)
+                self.bytes -= _size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all values, statistics are kept."""
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, evictions, number of entries and bytes used."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class WocCache:
+    """
+    Two-tier cache of WocMapsLocal, keyed by (map name, key).
+
+    The raw tier holds values as stored in tch files (compressed, dense), the decoded tier
+    holds what get_values / show_content return (fast). Every map has its own LRU caches,
+    so a hot map can't evict another. WoC data is read-only, so nothing is invalidated.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        raw_ratio: float = 0.5,
+        budgets: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Create an empty cache.
+
+        :param max_bytes: default budget of a map, shared by both tiers
+        :param raw_ratio: share of a map's budget given to the raw tier, 0 disables it
+        :param budgets: per-map budgets overriding max_bytes, e.g. {'commit.tch': 1 << 30, 'c2p': 0}.
+                        Keys are canonical map names (aliases like 'commit' are resolved by WocMapsLocal).
+        """
+        if not 0 <= raw_ratio <= 1:
+            raise ValueError(f"raw_ratio must be between 0 and 1, got {raw_ratio}")
+        self.max_bytes = max_bytes
+        self.raw_ratio = raw_ratio
+        self.budgets = budgets or {}
+        self._tiers: Dict[str, Tuple[LRUCache, LRUCache]] = {}
+        self._lock = threading.Lock()
+
+    def _get_tiers(self, map_name: str) -> Tuple[LRUCache, LRUCache]:
+        try:
+            return self._tiers[map_name]
+        except KeyError:
+            pass
+        with self._lock:
+            if map_name not in self._tiers:
+                _budget = self.budgets.get(map_name, self.max_bytes)
+                _raw = int(_budget * self.raw_ratio)
+                self._tiers[map_name] = (LRUCache(_raw), LRUCache(_budget - _raw))
+            return self._tiers[map_name]
+
+    def get_raw(self, map_name: str, key: Hashable) -> Any:
+        """Get a raw value, or _MISSING"""
+        return self._get_tiers(map_name)[0].get(key)
+
+    def put_raw(self, map_name: str, key: Hashable, value: bytes) -> None:
+        """Store a raw value"""
+        self._get_tiers(map_name)[0].put(key, value, len(value))
+
+    def get_decoded(self, map_name: str, key: Hashable) -> Any:
+        """Get a decoded value, or _MISSING"""
+        return self._get_tiers(map_name)[1].get(key)
+
+    def put_decoded(self, map_name: str, key: Hashable, value: Any) -> None:
+        """Store a decoded value, its size is estimated by estimate_size"""
+        _tier = self._get_tiers(map_name)[1]
+        if _tier.max_bytes > 0:
+            _tier.put(key, value, estimate_size(value))
+
+    def clear(self) -> None:
+        """Drop all cached values"""
+        for _raw, _decoded in list(self._tiers.values()):
+            _raw.clear()
+            _decoded.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Statistics of every map that has been used.
+
+        >>> woc.cache.stats()
+        {'commit.tch': {'raw': {'hits': 0, 'misses': 2, ...}, 'decoded': {'hits': 5, 'misses': 2, ...}}}
+        """
+        return {
+            k: {"raw": _raw.stats(), "decoded": _decoded.stats()}
+            for k, (_raw, _decoded) in list(self._tiers.items())
+        }
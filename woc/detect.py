@@ -14,7 +14,7 @@ from typing import Iterable, Optional, Tuple
 
 from tqdm import tqdm
 
-from .utils import sample_md5
+from .utils import sample_md5, tch_stats
 
 _default_profile = os.path.join(os.path.dirname(__file__), "wocprofile.default.json")
 _logger = logging.getLogger(__name__)
@@ -301,6 +301,24 @@ def detect_profile(
             return _resolved
         return file_path
 
+    def _shard_entry(shard_path: str) -> dict:
+        _entry = {
+            "path": _resolve_path(shard_path),
+            "size": os.path.getsize(shard_path),
+            "digest": None,
+        }
+        # record counts let WocMapsLocal.count skip opening the shards
+        if shard_path.endswith(".tch"):
+            try:
+                _stats = tch_stats(shard_path)
+                _entry["records"], _entry["buckets"] = (
+                    _stats["records"],
+                    _stats["buckets"],
+                )
+            except ValueError as e:
+                _logger.warning(e)
+        return _entry
+
     # transform to v2
     _total_files = 0
     for l_maps in _ls_maps.values():
@@ -310,13 +328,7 @@ def detect_profile(
             for shard_path in _map["shards"]:
                 if shard_path is None:
                     continue
-                _new_shards.append(
-                    {
-                        "path": _resolve_path(shard_path),
-                        "size": os.path.getsize(shard_path),
-                        "digest": None,
-                    }
-                )
+                _new_shards.append(_shard_entry(shard_path))
             _map["shards"] = _new_shards
             _total_files += len(_new_shards)
 
@@ -336,13 +348,7 @@ def detect_profile(
         for shard_path in obj["shards"]:
             if shard_path is None:
                 continue
-            _new_shards.append(
-                {
-                    "path": _resolve_path(shard_path),
-                    "size": os.path.getsize(shard_path),
-                    "digest": None,
-                }
-            )
+            _new_shards.append(_shard_entry(shard_path))
         obj["shards"] = _new_shards
         _total_files += len(_new_shards)
 
@@ -410,12 +416,24 @@ if __name__ == "__main__":
         help="calculate digest for each file",
         default=False,
     )
+    parser.add_argument(
+        "--gzip-index-dir",
+        dest="gzip_index_dir",
+        type=str,
+        default=None,
+        help="prebuild seek indexes of gzipped large files into this (shared) directory",
+    )
 
     args = parser.parse_args()
 
     res = detect_profile(
         args.paths, args.version, args.preset, args.check_missing, args.with_digest
     )
+    if args.gzip_index_dir:
+        from .gzip_index import GzipIndexManager
+
+        GzipIndexManager(args.gzip_index_dir).prebuild(res, progress=True)
+        res["gzipIndexDirs"] = [args.gzip_index_dir]
     if args.output:
         with open(args.output, "w") as f:
             json.dump(res, f, indent=2)
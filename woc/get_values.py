@@ -6,7 +6,7 @@
 
 from typing import Generator, Iterable
 
-from .local import WocMapsLocal
+from .local import WocMapsLocal, parse_worker
 
 
 def _flatten_list(s: Generator[Iterable, None, None]):
@@ -31,13 +31,23 @@ if __name__ == "__main__":
     parser.add_argument(
         "-v", "--version", type=str, help="The version of the profile", default=None
     )
+    parser.add_argument(
+        "-w",
+        "--worker",
+        type=str,
+        help="k/n to only look up keys of worker k of n, merge outputs with `python3 -m woc.utils`",
+        default=None,
+    )
     args = parser.parse_args()
 
     woc = WocMapsLocal(args.profile, args.version)
+    worker = parse_worker(args.worker)
 
     for line in sys.stdin:
         try:
             key = line.strip()
+            if worker is not None and woc.partition_keys(args.type, [key], worker) == []:
+                continue
             _gen = woc.iter_values(args.type, key)
             if args.type == "b2tac":
                 _gen = _flatten_list(_gen)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+
+from .base import WocCachePath, WocFile
+
+if TYPE_CHECKING:
+    from rapidgzip import RapidgzipFile
+
+_logger = logging.getLogger(__name__)
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def is_gzip(path: str) -> bool:
+    """Check the magic bytes, large files of 'h' maps are not gzipped"""
+    with open(path, "rb") as f:
+        return f.read(2) == _GZIP_MAGIC
+
+
+class GzipIndexManager:
+    """
+    Seek indexes of gzipped large files, so rapidgzip can seek without decompressing.
+
+    Indexes are named after the path, size and digest (or mtime, if the profile has no digest)
+    of a file, so a replaced file never picks up a stale index. They are looked up in the
+    read-only shared directories first, e.g. one prebuilt for a whole cluster, then in the
+    writable cache directory. Indexes are written atomically under a lock, so concurrent
+    processes build each of them once.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = WocCachePath,
+        shared_dirs: Optional[Iterable[str]] = None,
+        build_on_open: bool = False,
+    ):
+        """
+        Create a manager of gzip indexes.
+
+        :param cache_dir: writable directory where indexes are built
+        :param shared_dirs: read-only directories with prebuilt indexes
+        :param build_on_open: build a missing index when a file is opened, which reads the
+                              whole file; otherwise use `python3 -m woc.gzip_index` to prebuild them
+        """
+        self.cache_dir = cache_dir
+        self.shared_dirs: List[str] = list(shared_dirs or [])
+        self.build_on_open = build_on_open
+
+    def index_name(self, woc_file: Union[WocFile, str]) -> str:
+        """Name of the index file of a large file, e.g. '8a6b9e2f1c0d3e4f.gzidx'"""
+        if isinstance(woc_file, str):
+            woc_file = WocFile(woc_file)
+        _stat = os.stat(woc_file.path)
+        _version = woc_file.digest or str(_stat.st_mtime_ns)
+        _key = f"{os.path.abspath(woc_file.path)}\0{_stat.st_size}\0{_version}"
+        return hashlib.sha1(_key.encode()).hexdigest()[:16] + ".gzidx"
+
+    def find(self, woc_file: Union[WocFile, str]) -> Optional[str]:
+        """Path of an existing index of a large file, None if there is none"""
+        _name = self.index_name(woc_file)
+        for _dir in (*self.shared_dirs, self.cache_dir):
+            _path = os.path.join(_dir, _name)
+            if os.path.exists(_path):
+                return _path
+        return None
+
+    def load(self, f: "RapidgzipFile", woc_file: Union[WocFile, str]) -> bool:
+        """
+        Import the index of a large file into an opened RapidgzipFile.
+
+        Builds it first if build_on_open is set.
+
+        :return: whether an index was imported
+        """
+        _path = self.find(woc_file)
+        if _path is None and self.build_on_open:
+            _path = self.build(woc_file)
+        if _path is None:
+            return False
+        try:
+            f.import_index(_path)
+            return True
+        except Exception as e:
+            _logger.warning(f"Ignoring unreadable gzip index {_path}: {e}")
+            return False
+
+    def build(
+        self, woc_file: Union[WocFile, str], threads: int = 0, force: bool = False
+    ) -> str:
+        """
+        Build the index of a large file in the cache directory, unless it exists.
+
+        :param threads: parallelization of rapidgzip, 0 uses all cores
+        :param force: rebuild the index in the cache directory even if it exists
+        :return: path to the index
+        """
+        _path = None if force else self.find(woc_file)
+        if _path is not None:
+            return _path
+        # deferred, importing woc.local shouldn't load it
+        from rapidgzip import RapidgzipFile
+
+        _name = self.index_name(woc_file)
+        _path = os.path.join(self.cache_dir, _name)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(_path + ".lock", "w") as _lock:
+            fcntl.flock(_lock, fcntl.LOCK_EX)
+            try:
+                # another process may have built it while we waited
+                if not force and os.path.exists(_path):
+                    return _path
+                _tmp = f"{_path}.{os.getpid()}.tmp"
+                try:
+                    with RapidgzipFile(
+                        woc_file if isinstance(woc_file, str) else woc_file.path,
+                        parallelization=threads,
+                    ) as f:
+                        f.export_index(_tmp)
+                    os.replace(_tmp, _path)
+                finally:
+                    if os.path.exists(_tmp):
+                        os.remove(_tmp)
+            finally:
+                fcntl.flock(_lock, fcntl.LOCK_UN)
+        return _path
+
+    def prebuild(
+        self,
+        profile: dict,
+        threads: int = 0,
+        force: bool = False,
+        progress: bool = False,
+    ) -> List[str]:
+        """
+        Build indexes of all gzipped large files of a profile.
+
+        :param profile: the profile, as loaded from wocprofile.json
+        :return: paths to the indexes
+        """
+        _files = [
+            WocFile(_large) if isinstance(_large, str) else WocFile(**_large)
+            for _maps in profile["maps"].values()
+            for _map in _maps
+            for _large in _map.get("larges", {}).values()
+        ]
+        _files = [f for f in _files if os.path.exists(f.path) and is_gzip(f.path)]
+        if progress:
+            from tqdm import tqdm  # deferred, only progress bars need it
+
+            _files = tqdm(_files, desc="Building gzip indexes")
+        return [self.build(f, threads, force) for f in _files]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prebuild seek indexes of gzipped large files in a woc profile"
+    )
+    parser.add_argument("profile", type=str, help="path to wocprofile.json")
+    parser.add_argument(
+        "--output", type=str, default=WocCachePath, help="directory to write indexes to"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=0, help="rapidgzip threads, 0 uses all cores"
+    )
+    parser.add_argument(
+        "--force", action="store_true", default=False, help="rebuild existing indexes"
+    )
+    args = parser.parse_args()
+
+    with open(args.profile) as f:
+        _profile = json.load(f)
+    _paths = GzipIndexManager(args.output).prebuild(
+        _profile, args.threads, args.force, progress=True
+    )
+    print(f"{len(_paths)} indexes in {args.output}")
@@ -5,23 +5,31 @@ This type stub file was generated by cyright.
 from typing import (
     TYPE_CHECKING,
     Any,
+    Callable,
+    Dict,
     Generator,
     Iterable,
     List,
     Literal,
     Optional,
     Tuple,
+    TypeVar,
     Union,
 )
 
-from .base import WocMapsBase
+from .base import WocFile, WocMap, WocMapsBase, WocObject
+from .cache import WocCache
+from .gzip_index import GzipIndexManager
 
 if TYPE_CHECKING:
     from .tch import TCHashDB
 
+T = TypeVar("T")
+
 def fnvhash(data: bytes) -> bytes:
     """
     Returns the 32 bit FNV-1a hash value for the given data.
+
     >>> hex(fnvhash('foo'))
     '0xa9f37ed7'
     """
@@ -30,6 +38,7 @@ def fnvhash(data: bytes) -> bytes:
 def unber(buf: bytes) -> List[int]:
     r"""
     Perl BER unpacking.
+
     BER is a way to pack several variable-length ints into one
     binary string. Here we do the reverse.
     Format definition: from http://perldoc.perl.org/functions/pack.html
@@ -73,25 +82,65 @@ def lzf_length(raw_data: bytes) -> Tuple[int, int]:
     """
     ...
 
-def decomp(raw_data: bytes) -> bytes:
+def decomp(
+    raw_data: Union[bytes, bytearray, memoryview],
+) -> Union[bytes, memoryview]:
     """
     lzf wrapper to handle perl tweaks in `Compress::LZF`
 
     This function extracts uncompressed size header
     and then does usual lzf decompression.
+    Any bytes-like object is accepted and only read once. Uncompressed data is
+    returned as a slice of raw_data, so a memoryview in gives a memoryview out.
 
     :param raw_data: data compressed with Perl `Compress::LZF`
     :return: unpacked data
     """
     ...
 
-def decomp_or_raw(raw_data: bytes) -> bytes:
+def decomp_or_raw(
+    raw_data: Union[bytes, bytearray, memoryview],
+) -> Union[bytes, memoryview]:
     """Try to decompress raw_data, return raw_data if it fails"""
     ...
 
+class DecompArena:
+    """
+    Reusable output buffer of decomp_many.
+
+    Buffers returned by decomp_many are views of the arena, valid until it is used again.
+    """
+
+    buf: bytearray
+    def __init__(self, size: int = 1 << 20) -> None: ...
+
+def decomp_many(
+    values: List[Union[bytes, bytearray, memoryview]],
+    arena: Optional[DecompArena] = None,
+    or_raw: bool = False,
+) -> List[Union[bytes, memoryview]]:
+    """
+    Decompress many values of Perl `Compress::LZF` at once, see decomp.
+
+    Headers are parsed first, then all values are decompressed into one arena
+    without the GIL. Decompressed values are memoryviews of the arena, which
+    decode_tree and decode_commit accept as is.
+
+    :param values: sequence of bytes-like objects
+    :param arena: output buffer to reuse, values of the previous call on it are overwritten
+    :param or_raw: return the value itself if it can't be decompressed, like decomp_or_raw,
+                   instead of raising ValueError
+    :return: list of decompressed values, memoryviews of the arena or slices of values
+
+    >>> arena = DecompArena()
+    >>> [decode_tree(v) for v in decomp_many(raw_trees, arena)]
+    """
+    ...
+
 def slice20(raw_data: bytes) -> Tuple[bytes, ...]:
     """
     Slice raw_data into 20-byte chunks and hex encode each of them
+
     It returns tuple in order to be cacheable
     """
     ...
@@ -100,26 +149,136 @@ def decode_str(raw_data: bytes, encoding: str = "utf-8") -> str:
     """Aggressively decode raw_data, return empty string if it fails"""
     ...
 
-def get_tch(path: str) -> TCHashDB:
-    """Cache TCHashDB objects"""
+def get_tch(path: str, xmsiz: int = -1, rcnum: int = 0) -> TCHashDB:
+    """
+    Cache TCHashDB objects.
+
+    Handles are shared by all threads, so they are opened thread-safe and
+    lookups run without the GIL. Tuning only applies when the handle is first opened.
+    """
     ...
 
 def get_shard(key: bytes, sharding_bits: int, use_fnv_keys: bool) -> int:
     """Get shard id"""
     ...
 
+def split_items(data: bytes) -> List[str]:
+    """
+    Split `;` separated fields of a 's' or 'cs' value, dropping empty and EMPTY fields.
+
+    Every field is decoded on its own, so one badly encoded field doesn't slow down the others.
+
+    >>> split_items(b'a;;EMPTY;b')
+    ['a', 'b']
+    """
+    ...
+
+def split_triples(data: bytes) -> List[Tuple[str, str, str]]:
+    """
+    Split `;` separated fields of a 'cs3' value into triples in one pass.
+
+    Trailing fields that don't make a triple are dropped,
+    as values of large files are not always aligned.
+
+    >>> split_triples(b'1410029988;Audris Mockus <audris@utk.edu>;e4af89166a17785c1d741b8b1d5775f3223f510f;1')
+    [('1410029988', 'Audris Mockus <audris@utk.edu>', 'e4af89166a17785c1d741b8b1d5775f3223f510f')]
+    """
+    ...
+
+class ShaList:
+    """
+    Read-only sequence of hex SHAs backed by the raw bytes of an 'h' value.
+
+    Items are hex encoded only when accessed, `in` compares binary SHAs,
+    and slices with step 1 share the underlying bytes. Any read-only buffer works as raw,
+    e.g. a memory-mapped large file. A ShaList takes 20 bytes per SHA,
+    about 4x less than a list of hex strings, and can be passed as keys to get_values_many.
+
+    >>> shas = woc.get_values('a2c', 'Audris Mockus <audris@utk.edu>', format='shalist')
+    >>> shas[0], len(shas), shas[0] in shas
+    ('001ec7302de3b07f32669a1f1faed74585c8a8dc', 1024, True)
+    """
+
+    raw: Union[bytes, memoryview]
+    def __init__(
+        self, raw: Union[bytes, memoryview] = ..., start: int = ..., length: int = ...
+    ) -> None:
+        """
+        Wrap raw SHAs without copying them.
+
+        :param raw: concatenated 20-byte SHAs (bytes-like), a trailing partial SHA is ignored
+        :param start: index of the first SHA in raw
+        :param length: number of SHAs, defaults to all SHAs after start
+        """
+        ...
+
+    def __len__(self) -> int: ...
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "ShaList"]: ...
+    def __contains__(self, sha: object) -> bool:
+        """Accepts hex strings and 20-byte binary SHAs"""
+        ...
+
+    def __iter__(self) -> Generator[str, None, None]: ...
+    def __reversed__(self) -> Generator[str, None, None]: ...
+    def get_bytes(self, i: int) -> bytes:
+        """Binary SHA at index i"""
+        ...
+
+    def index(self, sha: Union[str, bytes]) -> int: ...
+    def count(self, sha: Union[str, bytes]) -> int: ...
+    def iter_bytes(self) -> Generator[bytes, None, None]:
+        """Iterate over binary SHAs"""
+        ...
+
+    def tobytes(self) -> bytes:
+        """Concatenated binary SHAs of this (possibly sliced) list"""
+        ...
+
 def decode_value(
-    value: bytes, out_dtype: str
-) -> List[str] | Tuple[str, str, str] | List[Tuple[str, str, str]] | Tuple[str, Any]:
+    value: bytes, out_dtype: str, lazy: bool = False
+) -> (
+    List[str]
+    | ShaList
+    | Tuple[str, str, str]
+    | List[Tuple[str, str, str]]
+    | Tuple[str, Any]
+):
     """
     Decode values from tch maps.
+
+    If lazy, 'h' values are returned as a ShaList instead of a list of hex strings.
     """
     ...
 
-def decode_tree(value: bytes) -> List[Tuple[str, str, str]]:
+def decode_value_numpy(value: Union[bytes, memoryview], out_dtype: str) -> Any:
+    """
+    Decode values from tch maps into numpy arrays, without a Python object per item.
+
+    Requires numpy.
+
+    - 'h': array of 'S20' binary SHAs, a view of value.
+      Note that numpy drops trailing NUL bytes when an 'S20' item is converted to bytes;
+      use `arr.view('V20')` or `arr.tobytes()` to keep them.
+    - 'r': structured array of one (sha 'S20', length 'u8') record
+    - 'sh': structured array of one (time 'i8', author 'S', sha 'S20') record, author in utf-8
+    - 'cs3': tuple of three 'S' arrays, one per column
+
+    :raises ValueError: if out_dtype is not one of h, r, sh, cs3
+    :raises ImportError: if numpy is not installed
+
+    >>> decode_value_numpy(bytes.fromhex('e4af89166a17785c1d741b8b1d5775f3223f510f'), 'h')
+    array([b'\xe4\xaf\x89\x16j\x17x\\\x1dt\x1b\x8b\x1dWu\xf3"?Q\x0f'], dtype='|S20')
+    """
+    ...
+
+def decode_tree(
+    value: Union[bytes, bytearray, memoryview],
+) -> List[Tuple[str, str, str]]:
     """
     Decode a tree binary object into tuples.
 
+    Any bytes-like object is accepted, so values can be decoded in place.
+
     Python: 4.77 µs, Cython: 280 ns
     Reference: https://stackoverflow.com/questions/14790681/
 
@@ -129,11 +288,13 @@ def decode_tree(value: bytes) -> List[Tuple[str, str, str]]:
     ...
 
 def decode_commit(
-    commit_bin: bytes,
+    commit_bin: Union[bytes, bytearray, memoryview],
 ) -> Tuple[str, Tuple[str, str, str], Tuple[str, str, str], str]:
     """
     Decode git commit objects into tuples.
 
+    Any bytes-like object is accepted, so values can be decoded in place.
+
     Python: 2.35 µs, Cython: 855 ns
     Reference: https://git-scm.com/book/en/v2/Git-Internals-Git-Objects
 
@@ -151,6 +312,7 @@ def decode_tag(
 ):  # -> tuple[str, str, str, Literal[''], Literal[''], Literal['']] | tuple[str, str, str, str, str, str]:
     """
     Decode git tag objects into tuples.
+
     >>> decode_tag(b'object fcadcb9366d4a011039e384affa10961e99cf2c4\ntype commit\ntag eccube-2.11.1\ntagger nanasess <nanasess@42d9b83e-2207-4a45-8b47-68c1da84f352> 1303788649 +0000\n\nAdded tags/eccube-2.11.1\n')
     ('fcadcb9366d4a011039e384affa10961e99cf2c4', 'commit', 'eccube-2.11.1', 'nanasess <nanasess@42d9b83e-2207-4a45-8b47-68c1da84f352>'
     , '1303788649', '+0000')
@@ -158,7 +320,11 @@ def decode_tag(
     ...
 
 def read_large_random_access(
-    path: str, dtype: str, offset: int = ..., length: int = ...
+    path: Union[str, WocFile],
+    dtype: str,
+    offset: int = ...,
+    length: int = ...,
+    indexes: Optional[GzipIndexManager] = ...,
 ) -> Tuple[bytes, Optional[int]]:
     """
     Read a *.large.* and return its content.
@@ -167,11 +333,122 @@ def read_large_random_access(
     :param dtype: data type
     :param offset: offset to start reading. It is either 0 or after the last separator.
     :param length: length to read. It should be longer than the longest record.
+    :param indexes: where to find gzip seek indexes
 
     :return: a tuple of bytes and the next offset, None if EOF. Returned bytes must not begin or end with a separator.
     """
     ...
 
+def parse_worker(spec: Union[str, Tuple[int, int], None]) -> Optional[Tuple[int, int]]:
+    """
+    Parse a worker spec, 'k/n' or (k, n) for worker k of n.
+
+    all_keys, all_items, get_values_many and show_content_many accept either form.
+
+    :raises ValueError: if the spec is malformed or not 0 <= k < n
+
+    >>> parse_worker('3/8')
+    (3, 8)
+    """
+    ...
+
+def worker_shards(n_shards: int, worker: Union[str, Tuple[int, int]]) -> List[int]:
+    """
+    Shards of a map with n_shards shards assigned to a worker: shard j goes to worker j % n.
+
+    Keys and large files go to the worker of their shard, so a worker only opens its own shards.
+
+    >>> worker_shards(8, '1/3')
+    [1, 4, 7]
+    """
+    ...
+
+def scan_idx_bin(
+    idx_path: str, bin_path: str, block_size: int = ...
+) -> Generator[Tuple[bytes, memoryview], None, None]:
+    """
+    Iterate over (sha, compressed object) of an .idx/.bin pair in file order.
+
+    The .bin file is read block by block, the next block is read ahead by the kernel.
+    Lines of .idx files are `id;offset;length;sha` or, for blobs, `id;offset;length;full_length;sha;...`.
+
+    :param block_size: bytes read at once, records larger than it are read alone
+    :return: raw sha and a memoryview of the LZF-compressed object, valid until it is released
+    :raises ValueError: if an index line is malformed or an object is past the end of the .bin file
+    """
+    ...
+
+class LargeFileReader:
+    """
+    Stream the value of one key from its *.large.* file.
+
+    The file is read in blocks growing from block_size to max_block_size. A record cut
+    at the end of a block is kept and completed by the next block, so every block is read
+    once and tokenized once. Unlike read_large_random_access, no offsets are handed back.
+
+    With readahead, gzip files are read by a background thread with its own
+    RapidgzipFile, up to readahead blocks ahead of the tokenizer.
+
+    >>> reader = LargeFileReader(woc.config['maps']['b2c'][0]['larges'][key], 'h')
+    >>> for sha in reader:  # or `for chunk in reader.chunks()` for raw bytes
+    ...     print(sha)
+    """
+
+    path: str
+    dtype: str
+    def __init__(
+        self,
+        path: Union[str, WocFile],
+        dtype: str,
+        block_size: int = ...,
+        max_block_size: int = ...,
+        readahead: int = ...,
+        threads: int = ...,
+        indexes: Optional[GzipIndexManager] = ...,
+    ) -> None:
+        """
+        Open a large file for reading.
+
+        :param path: path to the file, or its WocFile so its digest keys the gzip index
+        :param dtype: data type of the map, compressed 'cs' is plain 's' in large files
+        :param block_size: size of the first read; with the default, the first chunk
+                           is what read_large_random_access returns
+        :param max_block_size: size blocks grow to
+        :param readahead: number of blocks decompressed ahead in a background thread,
+                          0 reads in the calling thread. Only used for gzip files.
+        :param threads: parallelization of the background RapidgzipFile, 0 uses all cores
+        :param indexes: where to find gzip seek indexes
+        """
+        ...
+
+    def close(self) -> None:
+        """Stop the background thread, if any"""
+        ...
+
+    def __enter__(self) -> "LargeFileReader": ...
+    def __exit__(self, *args) -> None: ...
+    def view(self) -> memoryview:
+        """
+        Zero-copy view of all SHAs of an 'h' large file, which is memory-mapped.
+
+        Independent of the position of read / chunks / iteration.
+        """
+        ...
+
+    def read(self) -> Optional[list]:
+        """Decode the next chunk of records, None at the end"""
+        ...
+
+    def read_raw(self) -> Optional[bytes]:
+        """Next chunk of complete records as stored, None at the end"""
+        ...
+
+    def chunks(self) -> Generator[bytes, None, None]:
+        """Iterate over raw chunks of complete records"""
+        ...
+
+    def __iter__(self) -> Generator[Any, None, None]: ...
+
 class WocMapsLocal(WocMapsBase):
     def __init__(
         self,
@@ -179,7 +456,53 @@ class WocMapsLocal(WocMapsBase):
         version: Union[str, Iterable[str], None] = ...,
         on_large: Literal["ignore", "head", "all"] = ...,
         on_bad: Literal["allow", "error"] = ...,
-    ) -> None: ...
+        tch_tuning: Optional[Dict[str, Dict[str, int]]] = ...,
+        cache: Union[WocCache, int, bool, None] = ...,
+        large_readahead: int = ...,
+        gzip_threads: int = ...,
+        gzip_index_dirs: Optional[Iterable[str]] = ...,
+        blob_fadvise: bool = ...,
+        profile_cache: bool = ...,
+    ) -> None:
+        """
+        Load a profile and prepare the maps it describes.
+
+        :param tch_tuning: per-map TokyoCabinet tuning, e.g. {'c2p': {'xmsiz': 1 << 32, 'rcnum': 100000}}.
+                           Overrides the `tuning` section of the profile.
+        :param cache: cache get_values / show_content results and raw tch values.
+                      True uses the default WocCache, an int is the budget of each map in bytes.
+        :param large_readahead: with on_large='all', gzip large files are decompressed by a
+                                background thread up to this many blocks ahead, 0 disables it.
+        :param gzip_threads: parallelization of rapidgzip in the background thread, 0 uses all cores.
+        :param gzip_index_dirs: read-only directories of prebuilt gzip indexes, searched before
+                                the `gzipIndexDirs` of the profile and WocCachePath.
+        :param blob_fadvise: let show_content_many('blob') issue posix_fadvise(WILLNEED) for the
+                             ranges of a .bin shard before reading them.
+        :param profile_cache: load the profile from its compiled form in WocCachePath, built on
+                              the first load and whenever the JSON changes; larges of a map are
+                              loaded on first use.
+        """
+        ...
+
+    cache: Optional[WocCache]
+    """Cache of raw and decoded values, None if disabled. Use cache.stats() for hit rates."""
+    gzip_indexes: GzipIndexManager
+    """Seek indexes of gzipped large files."""
+
+    def _get_tch(self, _map: Union[WocMap, WocObject], woc_file: WocFile) -> TCHashDB:
+        """
+        Open a shard of a map from the pool, applying the map's tuning.
+
+        Without explicit xmsiz, shards up to WocTchMmapLimit are memory-mapped entirely.
+        """
+        ...
+
+    def _check_bad(self, key: bytes, hex_str: str, in_dtype: str) -> None:
+        """
+        Raise KeyError if the key is marked as bad in the profile
+        """
+        ...
+
     def _get_tch_bytes(
         self, map_name, key, cursor=...
     ) -> Tuple[bytes, str, Optional[int]]:
@@ -188,56 +511,298 @@ class WocMapsLocal(WocMapsBase):
         """
         ...
 
+    def _get_tch_view(self, obj_name, key) -> Union[bytes, memoryview]:
+        """
+        Get value of a git object into a per-thread buffer, return a view of it.
+
+        Saves the bytes copy of _get_tch_bytes; the view is only valid until
+        the next call in the same thread. With the cache enabled, bytes are returned.
+        """
+        ...
+
+    def _group_by_shard(
+        self, _map: Union[WocMap, WocObject], keys: List[Union[bytes, str]]
+    ) -> Tuple[Dict[int, Tuple[List[int], List[bytes]]], List[int], Dict[int, str]]:
+        """
+        Encode keys and group them by shard, so each group is read with one batched TCHashDB call.
+
+        Returns shard id -> (positions, encoded keys), positions of large files
+        and position -> error for malformed keys and bad keys (if raise_on_bad).
+        Shared by get_values_many, show_content_many and exists_many.
+        """
+        ...
+
     def iter_values(
         self, map_name: str, key: Union[bytes, str]
     ):  # -> Generator[Tuple[str, Tuple[str, str, str], Tuple[str, str, str], str] | List[Tuple[str, str, str]] | str | tuple[str, str, str] | Unknown, None, None]:
         """
         Eqivalent to getValues in WoC Perl API.
+
         >>> self.get_values('P2c', 'user2589_minicms')
         ['05cf84081b63cda822ee407e688269b494a642de', ...]
         """
         ...
 
+    def _cache_key(
+        self, _map: Union[WocMap, WocObject, None], key: Union[bytes, str]
+    ) -> Optional[bytes]:
+        """
+        Key of the decoded cache tier: the bytes stored in tch, like the raw tier.
+
+        The hex and bytes forms of a key share one entry. None if the key is malformed.
+        """
+        ...
+
     def get_values(
-        self, map_name: str, key: Union[bytes, str]
+        self,
+        map_name: str,
+        key: Union[bytes, str],
+        format: Literal["list", "numpy", "shalist"] = "list",
     ):  # -> list[Tuple[str, Tuple[str, str, str], Tuple[str, str, str], str] | List[Tuple[str, str, str]] | str | tuple[str, str, str] | Unknown]:
         """
         Eqivalent to getValues in WoC Perl API.
+
+        :param format: 'list' returns Python objects; 'numpy' returns arrays built straight from
+                       the stored bytes (see decode_value_numpy), for h, r, sh and cs3 maps.
+                       Much faster and smaller for values with millions of items. Requires numpy.
+                       'shalist' returns a ShaList for h maps, decoding SHAs only when accessed.
+                       With on_large='all', both are zero-copy views of memory-mapped large files.
+
         >>> self.get_values('P2c', 'user2589_minicms')
         ['05cf84081b63cda822ee407e688269b494a642de', ...]
+        >>> self.get_values('b2c', '05fe634ca4c8386349ac519f899145c75fff4169', format='numpy')
+        array([b'\xe4\xaf\x89\x16j\x17x\\\x1dt\x1b\x8b\x1dWu\xf3"?Q\x0f'], dtype='|S20')
         """
         ...
 
     def _get_pos(self, obj: str, key: Union[bytes, str]) -> Tuple[int, int]:
         """
         Get offset and length of a stacked binary object, currently only support blob.
+
         Move out this part because it's much cheaper than decode the content.
         >>> self._get_pos('blob', bytes.fromhex('7a374e58c5b9dec5f7508391246c48b73c40d200'))
         (0, 123)
         """
         ...
 
+    def _blob_path(self, key: bytes) -> str:
+        """Path to the .bin shard of a blob"""
+        ...
+
     def show_content(
         self, obj_name: str, key: Union[bytes, str]
     ):  # -> List[Tuple[str, str, str]] | Tuple[str, Tuple[str, str, str], Tuple[str, str, str], str] | str | tuple[str, str, str, str, str, str]:
         """
         Eqivalent to showCnt in WoC perl API
+
         >>> self.show_content('tree', '7a374e58c5b9dec5f7508391246c48b73c40d200')
         [('100644', '.gitignore', '8e9e1...'), ...]
         """
         ...
 
+    def get_values_many(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+        progress: bool = False,
+        order: Literal["input", "shard"] = "input",
+        format: Literal["list", "numpy", "shalist"] = "list",
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Tuple[Dict[Union[bytes, str], Any], Dict[Union[bytes, str], str]]:
+        """
+        Eqivalent to getValues in WoC Perl API but fetch multiple keys at once.
+
+        Returns (results, errors) like WocMapsRemote.get_values_many: results maps keys to values,
+        errors maps keys that can't be read (missing, bad or malformed) to the error message.
+        Keys are grouped by shard and each group is fetched with one TCHashDB.get_many call.
+
+        :param progress: show a progress bar over shards
+        :param order: 'input' keeps the order of keys in both dicts;
+                      'shard' keeps the order keys are read in, which is cheaper to stream
+        :param format: 'list' returns what get_values returns, 'numpy' what decode_value_numpy returns,
+                       'shalist' a ShaList per key
+        :param worker: 'k/n' or (k, n) to look up only the keys of worker k, see partition_keys;
+                       keys of other workers are in neither dict
+        :raises KeyError: if the map does not exist
+        :raises ValueError: if format is 'numpy' and the map's values are not h, r, sh or cs3,
+                            or format is 'shalist' and they are not h
+
+        >>> self.get_values_many('c2p', ['e4af89166a17785c1d741b8b1d5775f3223f510f', '0' * 40])
+        ({'e4af89166a17785c1d741b8b1d5775f3223f510f': ['W4D3_news']}, {'000...': 'Key 000... not found in ...'})
+        """
+        ...
+
+    def show_content_many(
+        self,
+        obj_name: str,
+        keys: Iterable[Union[bytes, str]],
+        progress: bool = False,
+        order: Literal["input", "shard"] = "input",
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Tuple[Dict[Union[bytes, str], Any], Dict[Union[bytes, str], str]]:
+        """
+        Eqivalent to showCnt in WoC Perl API but fetch multiple keys at once.
+
+        Returns (results, errors) like WocMapsRemote.show_content_many, see get_values_many.
+        Blobs are read in offset order from pooled .bin descriptors, neighbouring blobs in one read.
+
+        :param worker: 'k/n' or (k, n) to look up only the keys of worker k, see get_values_many
+        :raises ValueError: if the object type is not supported
+
+        >>> self.show_content_many('tree', ['f1b66dcca490b5c4455af319bc961a34f69c72c2'])
+        ({'f1b66dcca490b5c4455af319bc961a34f69c72c2': [('100644', 'README.md', '05fe634ca4c8386349ac519f899145c75fff4169'), ...]}, {})
+        """
+        ...
+
+    def exists_many(self, map_name: str, keys: Iterable[Union[bytes, str]]) -> List[bool]:
+        """
+        Check which keys have values in a map, without reading the values.
+
+        A key exists if get_values / show_content would not raise KeyError for it:
+        large files count unless on_large is 'ignore', bad keys don't count if raise_on_bad is set,
+        and neither do malformed keys (e.g. invalid hex), which don't abort the batch.
+        Keys are grouped by shard and each group is checked with one TCHashDB.contains_many call.
+
+        >>> self.exists_many('b2c', ['05fe634ca4c8386349ac519f899145c75fff4169', '0' * 40])
+        [True, False]
+        """
+        ...
+
     def count(self, map_name) -> int:
         """
         Count the number of keys in a map (# of larges + # of tch keys)
+
+        Record counts stored in the profile by woc.detect are used while the size of a shard
+        is unchanged; other shards are counted from their headers in parallel, without opening them.
+        """
+        ...
+
+    def key_worker(self, map_name: str, key: Union[bytes, str], n: int) -> int:
+        """
+        Worker (of n) that a key of a map is assigned to: the worker of its shard.
+
+        :raises ValueError: if the key can't be encoded for the map
+
+        >>> self.key_worker('c2p', 'e4af89166a17785c1d741b8b1d5775f3223f510f', 8)
+        4
+        """
+        ...
+
+    def partition_keys(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+        worker: Union[str, Tuple[int, int]],
+    ) -> List[Union[bytes, str]]:
+        """
+        Keys of a list assigned to a worker, in their order.
+
+        Invalid keys go to worker 0, so every key of the list is handled by exactly one worker.
+
+        >>> self.partition_keys('c2p', keys, '0/4')  # on the first of 4 nodes
         """
         ...
 
-    def all_keys(self, map_name: str) -> Generator[bytes, None, None]:
+    def all_keys(
+        self,
+        map_name: str,
+        partition: Optional[Tuple[int, int]] = None,
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Generator[bytes, None, None]:
         """
         Iterate over all keys in a map.
 
+        :param partition: (i, n) to iterate only the i-th of n disjoint parts of the map,
+                          so n processes or threads can scan it in parallel.
+                          Every shard is split with TCHashDB.split, and large files are dealt round-robin.
+                          Parts are the same in every process reading the same files, but each
+                          process splits every shard itself, which reads keys up to the cuts
+                          (see TCHashDB.split); map_reduce splits once for all its workers.
+        :param worker: 'k/n' or (k, n) to iterate only the shards and large files of worker k,
+                       see worker_shards. Unlike partition, each worker opens only its own shards.
+        :raises ValueError: if partition is not 0 <= i < n, or worker is invalid
+
         >>> for key in self.iter_map('P2c'):
         ...     print(key)  # hash or encoded string
         """
         ...
+
+    def all_items(
+        self,
+        map_name: str,
+        partition: Optional[Tuple[int, int]] = None,
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Generator[Tuple[bytes, Any], None, None]:
+        """
+        Iterate over all (key, value) pairs in a map, in storage order.
+
+        Each record is read once, unlike all_keys followed by get_values.
+        Values of maps are decoded as get_values does; commits, trees and tags
+        as show_content does; blobs are (offset, length) in the blob .bin file.
+
+        :param partition: (i, n) to iterate only the i-th of n disjoint parts of the map,
+                          see all_keys.
+        :param worker: 'k/n' or (k, n) to iterate only the shards and large files of worker k,
+                       see all_keys.
+        :raises ValueError: if partition is not 0 <= i < n, or worker is invalid
+
+        >>> for key, value in self.all_items('c2p'):
+        ...     print(key.hex(), value)
+        """
+        ...
+
+    def scan_objects(
+        self,
+        obj_name: Literal["commit", "tree", "tag", "blob"],
+        worker: Union[str, Tuple[int, int], None] = None,
+        progress: bool = False,
+        block_size: int = ...,
+    ) -> Generator[Tuple[bytes, Any], None, None]:
+        """
+        Iterate over all (sha, content) of git objects in the order of the .idx/.bin files.
+
+        There is no TCH lookup or random read per object. Contents are decoded as show_content
+        does, decompressed in batches by decomp_many.
+
+        :param worker: 'k/n' or (k, n) to scan only the shards of worker k, see worker_shards;
+                       e.g. (j, len(shards)) scans shard j, one process per shard.
+        :param block_size: bytes of .bin files read at once
+        :raises KeyError: if the profile has no .idx/.bin files of the object, or misses a shard
+        :raises ValueError: if worker is invalid
+
+        >>> for sha, (tree, parents, author, committer, msg) in self.scan_objects('commit'):
+        ...     print(sha.hex(), msg)
+        """
+        ...
+
+    def map_reduce(
+        self,
+        map_name: str,
+        mapper: Callable[[bytes, Any], Optional[T]],
+        reducer: Callable[[T, T], T],
+        workers: Optional[int] = None,
+        progress: bool = False,
+    ) -> Optional[T]:
+        """
+        Aggregate a whole map with a pool of worker processes.
+
+        Shards are split into byte ranges once in this process (see TCHashDB.split),
+        and the ranges are handed out as tasks to forked workers. Each task streams the decoded (key, value) pairs through `mapper(key, value)` and
+        folds the results with `reducer(acc, result)`; the partial results of all tasks are
+        merged with `reducer` again, so it must be associative and accept its own output.
+        Mapper results of None are skipped.
+
+        Workers are forked, so mapper and reducer can be closures; only their results
+        are sent back to the parent, and must be picklable.
+
+        :param map_name: the name of the map / object, values are decoded as all_items does
+        :param mapper: function of (key, value), returning None to skip a record
+        :param reducer: associative function combining two mapped results
+        :param workers: number of processes, defaults to the number of CPUs; 1 runs in this process
+        :param progress: show a progress bar over tasks
+        :return: the merged result, None if nothing is mapped
+
+        >>> self.map_reduce('c2p', lambda k, v: len(v), operator.add, workers=8)
+        123456
+        """
+        ...
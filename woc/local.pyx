@@ -5,24 +5,31 @@
 
 import os
 import json
+import atexit
+import collections.abc
 import logging
 import time
-from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t
-from libc.string cimport memchr, strstr, strchr, strlen, strncmp
+import mmap
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, uint64_t, int32_t, int64_t
+from libc.string cimport memchr, memcmp, memcpy, memset, strncmp
+from cpython.mem cimport PyMem_Calloc, PyMem_Free
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE
+from cpython.unicode cimport PyUnicode_DecodeASCII, PyUnicode_DecodeUTF8
 from cython cimport Py_ssize_t
+import threading
 from threading import Lock
-from typing import Tuple, Dict, Iterable, List, Union, Literal, Optional, Generator
+from collections import OrderedDict
+from typing import Any, Tuple, Dict, Iterable, List, Union, Literal, Optional, Generator
 from io import FileIO
-from rapidgzip import RapidgzipFile
+from functools import partial
+from itertools import islice
 
-try:
-    import lzf
-    assert lzf.decompress
-except ImportError or AssertionError:
-    raise ImportError('python-lzf is required to decompress LZF-compressed data: `pip install python-lzf`')
-
-from .base import WocMapsBase,WocFile,WocMap, WocObject, WocSupportedProfileVersions, WocCachePath, WocGzipChunkSize
+from .base import WocMapsBase,WocFile,WocMap, WocObject, WocSupportedProfileVersions, WocCachePath, WocGzipChunkSize, WocLargeMaxBlockSize, WocTchMmapLimit, WocBinMaxOpen, WocBinMergeGap, WocBinMaxSpan, WocBinScanBlockSize
 from .tch cimport TCHashDB
+from .cache import WocCache, _MISSING
+from .gzip_index import GzipIndexManager
+from .profile_cache import load_profile
+from .utils import tch_stats
 
 cdef extern from 'Python.h':
     object PyBytes_FromStringAndSize(char *s, Py_ssize_t len)
@@ -79,6 +86,25 @@ cpdef unber(bytes buf):
             acc = 0
     return res
 
+cdef int _lzf_header(const uint8_t* data, Py_ssize_t csize, uint32_t* usize) except -1:
+    """Parse the Compress::LZF header, return its length and store the uncompressed size"""
+    cdef:
+        uint32_t start = 1
+        uint8_t lower = data[0], mask = 0x80
+        Py_ssize_t i
+
+    while mask and csize > start and (lower & mask):
+        mask >>= 1 + (mask == 0x80)
+        start += 1
+    if not mask or csize < start:
+        raise ValueError('LZF compressed data header is corrupted')
+    usize[0] = lower & (mask - 1)
+    for i in range(1, start):
+        usize[0] = (usize[0] << 6) + (data[i] & 0x3f)
+    if not usize[0]:
+        raise ValueError('LZF compressed data header is corrupted')
+    return start
+
 cpdef (int, int) lzf_length(bytes raw_data):
     r""" Get length of uncompressed data from a header of Compress::LZF output.
 
@@ -103,64 +129,228 @@ cpdef (int, int) lzf_length(bytes raw_data):
     (3, 2524)
     """
     # PY:725us, Cy:194usec
-    cdef:
-        # compressed size, header length, uncompressed size
-        uint32_t csize=len(raw_data), start=1, usize
-        # first byte, mask, buffer iterator placeholder
-        uint8_t lower=raw_data[0], mask=0x80, b
-        const uint8_t* data = <const uint8_t*>raw_data
-        Py_ssize_t i
-
-    while mask and csize > start and (lower & mask):
-        mask >>= 1 + (mask == 0x80)
-        start += 1
-    if not mask or csize < start:
-        raise ValueError('LZF compressed data header is corrupted')
-    usize = lower & (mask - 1)
-    for i in range(1, start):
-        b = data[i]
-        usize = (usize << 6) + (b & 0x3f)
-    if not usize:
-        raise ValueError('LZF compressed data header is corrupted')
+    cdef uint32_t usize
+    cdef int start = _lzf_header(<const uint8_t*>raw_data, len(raw_data), &usize)
     return start, usize
 
-def decomp(bytes raw_data):
-    # type: (bytes) -> bytes
+cdef Py_ssize_t _lzf_decompress(const uint8_t* ip, Py_ssize_t in_len,
+                                uint8_t* op, Py_ssize_t out_len) noexcept nogil:
+    """
+    Decompress a raw LZF stream, return the decompressed size or -1 if the
+    input is corrupted or does not fit into the output.
+    Same format as lzf_decompress in liblzf (lzf_d.c).
+    """
+    cdef:
+        const uint8_t* in_end = ip + in_len
+        uint8_t* out_start = op
+        uint8_t* out_end = op + out_len
+        uint8_t* ref
+        uint32_t ctrl, length
+    while ip < in_end:
+        ctrl = ip[0]
+        ip += 1
+        if ctrl < (1 << 5):  # literal run of ctrl + 1 bytes
+            ctrl += 1
+            if op + ctrl > out_end or ip + ctrl > in_end:
+                return -1
+            memcpy(op, ip, ctrl)
+            op += ctrl
+            ip += ctrl
+        else:  # back reference
+            length = ctrl >> 5
+            ref = op - ((ctrl & 0x1f) << 8) - 1
+            if ip >= in_end:
+                return -1
+            if length == 7:
+                length += ip[0]
+                ip += 1
+                if ip >= in_end:
+                    return -1
+            ref -= ip[0]
+            ip += 1
+            length += 2
+            if op + length > out_end or ref < out_start:
+                return -1
+            # regions may overlap, copy byte by byte
+            while length:
+                op[0] = ref[0]
+                op += 1
+                ref += 1
+                length -= 1
+    return op - out_start
+
+def decomp(raw_data):
+    # type: (Union[bytes, bytearray, memoryview]) -> Union[bytes, memoryview]
     """lzf wrapper to handle perl tweaks in `Compress::LZF`
 
     This function extracts uncompressed size header
     and then does usual lzf decompression.
+    Any bytes-like object is accepted and only read once. Uncompressed data is
+    returned as a slice of raw_data, so a memoryview in gives a memoryview out.
 
     :param raw_data: data compressed with Perl `Compress::LZF`
     :return: unpacked data
     """
+    cdef:
+        Py_buffer view
+        const uint8_t* data
+        uint8_t* out
+        uint32_t usize
+        int start
+        Py_ssize_t size
+        bytes _ret
     if not raw_data:
         return b''
-    if raw_data[0] == 0:
-        return raw_data[1:]
-    start, usize = lzf_length(raw_data)
-    # while it is tempting to include liblzf and link statically, there is
-    # zero advantage comparing to just using python-lzf
-    _ret = lzf.decompress(raw_data[start:], usize)
-    
-    # NOTE: lzf.decompress may return None if it fails
-    # e.g. blob b0c0dca2eca2160ec81ff10bec565c790e6b2e97, version R
-    if _ret is not None:
-        return _ret
-    # This case should be exetremely rare and indicates a corrupted file
-    logging.error(f"Failed to decompress: {len(raw_data) - start} bytes of compressed data "
-                    f"does not fit into {usize} bytes")
-    raise ValueError(f"Failed to decompress: {len(raw_data) - start} bytes of compressed data "
-                    f"does not fit into {usize} bytes")
-    
+    PyObject_GetBuffer(raw_data, &view, PyBUF_SIMPLE)
+    try:
+        data = <const uint8_t*>view.buf
+        if data[0] == 0:
+            return raw_data[1:]
+        start = _lzf_header(data, view.len, &usize)
+        _ret = PyBytes_FromStringAndSize(NULL, usize)
+        out = <uint8_t*><char*>_ret
+        with nogil:
+            size = _lzf_decompress(data + start, view.len - start, out, usize)
+        # NOTE: decompression may fail on corrupted data
+        # e.g. blob b0c0dca2eca2160ec81ff10bec565c790e6b2e97, version R
+        if size == usize:
+            return _ret
+        if size >= 0:
+            return _ret[:size]
+        # This case should be exetremely rare and indicates a corrupted file
+        logging.error(f"Failed to decompress: {view.len - start} bytes of compressed data "
+                        f"does not fit into {usize} bytes")
+        raise ValueError(f"Failed to decompress: {view.len - start} bytes of compressed data "
+                        f"does not fit into {usize} bytes")
+    finally:
+        PyBuffer_Release(&view)
 
-def decomp_or_raw(bytes raw_data):
+def decomp_or_raw(raw_data):
     """ Try to decompress raw_data, return raw_data if it fails"""
     try:
         return decomp(raw_data)
     except ValueError:
         return raw_data
 
+cdef class DecompArena:
+    """
+    Reusable output buffer of decomp_many.
+    Buffers returned by decomp_many are views of the arena, valid until it is used again.
+    """
+    cdef readonly bytearray buf
+
+    def __cinit__(self, Py_ssize_t size = 1 << 20):
+        self.buf = bytearray(size)
+
+    cdef uint8_t* reserve(self, Py_ssize_t size) except NULL:
+        """ Make room for size bytes, return the start of the buffer """
+        if size > len(self.buf):
+            size = max(size, 2 * len(self.buf))
+            try:
+                self.buf.extend(bytes(size - len(self.buf)))
+            except BufferError:
+                # views of the last batch are still alive, leave them their buffer
+                self.buf = bytearray(size)
+        return <uint8_t*><char*>self.buf
+
+_DECOMP_BATCH = 256  # values decompressed at once when scanning commits and trees
+
+cdef enum:  # kinds of values in decomp_many
+    _LZF_EMPTY = 0
+    _LZF_RAW = 1
+    _LZF_PACKED = 2
+    _LZF_BAD = 3
+
+def decomp_many(values, DecompArena arena = None, bint or_raw = False) -> list:
+    """
+    Decompress many values of Perl `Compress::LZF` at once, see decomp.
+    Headers are parsed first, then all values are decompressed into one arena
+    without the GIL. Decompressed values are memoryviews of the arena, which
+    decode_tree and decode_commit accept as is.
+
+    :param values: sequence of bytes-like objects
+    :param arena: output buffer to reuse, values of the previous call on it are overwritten
+    :param or_raw: return the value itself if it can't be decompressed, like decomp_or_raw,
+                   instead of raising ValueError
+    :return: list of decompressed values, memoryviews of the arena or slices of values
+    """
+    cdef:
+        Py_ssize_t n = len(values), i, total = 0, nbufs = 0
+        Py_buffer* views = NULL
+        Py_ssize_t* offsets = NULL
+        Py_ssize_t* sizes = NULL
+        uint32_t* usizes = NULL
+        int* starts = NULL
+        uint8_t* kinds = NULL
+        uint8_t* out
+        uint32_t usize
+        list _ret = [None] * n
+    if arena is None:
+        arena = DecompArena(0)
+    views = <Py_buffer*>PyMem_Calloc(n, sizeof(Py_buffer))
+    offsets = <Py_ssize_t*>PyMem_Calloc(n, sizeof(Py_ssize_t))
+    sizes = <Py_ssize_t*>PyMem_Calloc(n, sizeof(Py_ssize_t))
+    usizes = <uint32_t*>PyMem_Calloc(n, sizeof(uint32_t))
+    starts = <int*>PyMem_Calloc(n, sizeof(int))
+    kinds = <uint8_t*>PyMem_Calloc(n, sizeof(uint8_t))
+    try:
+        if n and (views is NULL or offsets is NULL or sizes is NULL
+                  or usizes is NULL or starts is NULL or kinds is NULL):
+            raise MemoryError()
+        # parse headers while holding the GIL
+        for i in range(n):
+            PyObject_GetBuffer(values[i], &views[i], PyBUF_SIMPLE)
+            nbufs += 1
+            if views[i].len == 0:
+                kinds[i] = _LZF_EMPTY
+            elif (<const uint8_t*>views[i].buf)[0] == 0:
+                kinds[i] = _LZF_RAW
+            else:
+                try:
+                    starts[i] = _lzf_header(<const uint8_t*>views[i].buf, views[i].len, &usize)
+                except ValueError:
+                    if not or_raw:
+                        raise
+                    kinds[i] = _LZF_BAD
+                    continue
+                kinds[i] = _LZF_PACKED
+                usizes[i] = usize
+                offsets[i] = total
+                total += usize
+        out = arena.reserve(total)
+        with nogil:
+            for i in range(n):
+                if kinds[i] == _LZF_PACKED:
+                    sizes[i] = _lzf_decompress(<const uint8_t*>views[i].buf + starts[i],
+                                               views[i].len - starts[i], out + offsets[i], usizes[i])
+        _arena = memoryview(arena.buf)
+        for i in range(n):
+            if kinds[i] == _LZF_EMPTY:
+                _ret[i] = b''
+            elif kinds[i] == _LZF_RAW:
+                _ret[i] = values[i][1:]
+            elif kinds[i] == _LZF_BAD:
+                _ret[i] = values[i]
+            elif sizes[i] >= 0:
+                _ret[i] = _arena[offsets[i]:offsets[i] + sizes[i]]
+            elif or_raw:
+                _ret[i] = values[i]
+            else:
+                logging.error(f"Failed to decompress: {views[i].len - starts[i]} bytes of compressed data "
+                              f"does not fit into {usizes[i]} bytes")
+                raise ValueError(f"Failed to decompress: {views[i].len - starts[i]} bytes of compressed data "
+                                 f"does not fit into {usizes[i]} bytes")
+        return _ret
+    finally:
+        for i in range(nbufs):
+            PyBuffer_Release(&views[i])
+        PyMem_Free(views)
+        PyMem_Free(offsets)
+        PyMem_Free(sizes)
+        PyMem_Free(usizes)
+        PyMem_Free(starts)
+        PyMem_Free(kinds)
+
 def slice20(bytes raw_data):
     """ Slice raw_data into 20-byte chunks and hex encode each of them
     It returns tuple in order to be cacheable
@@ -200,20 +390,24 @@ def _reset_tch_state():
 
 def _after_fork(_obj=None):
     _reset_tch_state()
+    _BIN_POOL.reset()
 
 # TCHashDB cursor is not fork-safe, so we need to reset the state after fork
 _reset_tch_state()
 os.register_at_fork(after_in_child=_after_fork)
 
-cpdef TCHashDB get_tch(str path):
-    """ Cache TCHashDB objects """
+cpdef TCHashDB get_tch(str path, int64_t xmsiz=-1, int32_t rcnum=0):
+    """ Cache TCHashDB objects.
+    Handles are shared by all threads, so they are opened thread-safe and
+    lookups run without the GIL. Tuning only applies when the handle is first opened.
+    """
     if os.getpid() != _TCH_OWNER_PID: 
         _reset_tch_state()
     if path in _TCH_POOL:
         return _TCH_POOL[path]
     with TCH_LOCK:
         if path not in _TCH_POOL:
-            _TCH_POOL[path] = TCHashDB(path, ro=True)
+            _TCH_POOL[path] = TCHashDB(path, ro=True, thread_safe=True, xmsiz=xmsiz, rcnum=rcnum)
         return _TCH_POOL[path]
 
 cpdef uint8_t get_shard(bytes key, uint8_t sharding_bits, bint use_fnv_keys):
@@ -238,15 +432,107 @@ cpdef uint8_t get_shard(bytes key, uint8_t sharding_bits, bint use_fnv_keys):
 
 ### deserializers ###
 
+cdef inline str _decode_item(const char* p, Py_ssize_t n):
+    """ Decode one field as utf-8, detect the encoding only if that fails """
+    try:
+        return PyUnicode_DecodeUTF8(p, n, NULL)
+    except UnicodeDecodeError:
+        return decode_str(PyBytes_FromStringAndSize(<char*>p, n))
+
+cdef Py_ssize_t _tokenize(const char* buf, Py_ssize_t n, int ncols, bint final, list out) except -1:
+    """
+    Split `;` separated fields into records of ncols (1 or 3) fields.
+    Records are appended to out if it is not None; with one field per record,
+    empty and EMPTY fields are dropped. Unless final, the last field of buf is
+    assumed to be cut and is left out.
+
+    :return: length of the complete records in buf, including their separators
+    """
+    cdef:
+        const char* p = buf
+        const char* q
+        const char* end = buf + n
+        const char* starts[3]
+        Py_ssize_t lens[3]
+        Py_ssize_t consumed = 0
+        int col = 0
+    while True:
+        q = <const char*>memchr(p, b';', end - p)
+        if q is NULL:
+            if not final:
+                break
+            q = end
+        if ncols == 1:
+            if out is not None and q > p and not (q - p == 5 and memcmp(p, b'EMPTY', 5) == 0):
+                out.append(_decode_item(p, q - p))
+        else:
+            starts[col] = p
+            lens[col] = q - p
+            col += 1
+            if col == ncols:
+                if out is not None:
+                    out.append((_decode_item(starts[0], lens[0]),
+                                _decode_item(starts[1], lens[1]),
+                                _decode_item(starts[2], lens[2])))
+                col = 0
+        if col == 0:
+            consumed = min(q + 1 - buf, n)
+        if q == end:
+            break
+        p = q + 1
+    return consumed
+
+def _tokenize_chunk(data, int ncols, bint final, bint decode=True) -> Tuple[Optional[list], int]:
+    """
+    Tokenize a chunk of a streamed value, see _tokenize.
+
+    :return: (decoded records or None if not decode, length of the complete records)
+    """
+    cdef:
+        Py_buffer view
+        list _ret = [] if decode else None
+        Py_ssize_t consumed
+    PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+    try:
+        consumed = _tokenize(<const char*>view.buf, view.len, ncols, final, _ret)
+        return _ret, consumed
+    finally:
+        PyBuffer_Release(&view)
+
+def split_items(data) -> List[str]:
+    """
+    Split `;` separated fields of a 's' or 'cs' value, dropping empty and EMPTY fields.
+    Every field is decoded on its own, so one badly encoded field doesn't slow down the others.
+
+    >>> split_items(b'a;;EMPTY;b')
+    ['a', 'b']
+    """
+    return _tokenize_chunk(data, 1, True)[0]
+
+def split_triples(data) -> List[Tuple[str, str, str]]:
+    """
+    Split `;` separated fields of a 'cs3' value into triples in one pass.
+    Trailing fields that don't make a triple are dropped,
+    as values of large files are not always aligned.
+
+    >>> split_triples(b'1410029988;Audris Mockus <audris@utk.edu>;e4af89166a17785c1d741b8b1d5775f3223f510f;1')
+    [('1410029988', 'Audris Mockus <audris@utk.edu>', 'e4af89166a17785c1d741b8b1d5775f3223f510f')]
+    """
+    return _tokenize_chunk(data, 3, True)[0]
+
 def decode_value(
     value: bytes,
-    out_dtype: str
+    out_dtype: str,
+    lazy: bool = False,
 ):
     """
     Decode values from tch maps.
+    If lazy, 'h' values are returned as a ShaList instead of a list of hex strings.
     """
     try:
         if out_dtype == 'h':  # type: list[str]
+            if lazy:
+                return ShaList(bytes(value))
             return [value[i:i + 20].hex() for i in range(0, len(value), 20)]
         elif out_dtype == 'sh':  # type: tuple[str, str, str]
             buf0 = value[0:len(value)-21]
@@ -254,32 +540,11 @@ def decode_value(
             (Time, Author) = decode_str(buf0).split(";")
             return (Time, Author, cmt_sha.hex())
         elif out_dtype == 'cs3':  # type: list[tuple[str, str, str]]
-            data = decomp_or_raw(value)
-            try:
-                _splited = data.decode('utf-8').split(';')
-            except UnicodeDecodeError:
-                _splited = [decode_str(v) for v in data.split(b';')]
-            return [
-                (_splited[i],_splited[i+1],_splited[i+2])
-                for i in range(0, len(_splited) - 2, 3)  # may not alway aligned reading large objects
-            ]
+            return split_triples(decomp_or_raw(value))
         elif out_dtype == 'cs':   # type: list[str]
-            data = decomp_or_raw(value)
-            try:
-                return [v for v in data.decode('utf-8').split(';') 
-                        if v and v != 'EMPTY']
-            except UnicodeDecodeError:
-                return [decode_str(v)
-                    for v in data.split(b';')
-                    if v and v != b'EMPTY']
+            return split_items(decomp_or_raw(value))
         elif out_dtype == 's':  # type: list[str]
-            try:
-                return [v for v in value.decode('utf-8').split(';') 
-                        if v and v != 'EMPTY']
-            except UnicodeDecodeError:
-                return [decode_str(v)
-                    for v in value.split(b';')
-                    if v and v != b'EMPTY']
+            return split_items(value)
         elif out_dtype == 'r':  # type: list[str, int]
             _hex = value[:20].hex()
             _len = unber(value[20:])[0]
@@ -291,11 +556,286 @@ def decode_value(
         logging.error(f"Failed to decode value: {value[:40]}... with dtype {out_dtype}")
         raise e
 
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("format='numpy' requires numpy, install it with `pip install numpy`") from None
+    return numpy
+
+def _split_columns(data, Py_ssize_t ncols) -> Tuple[List[bytes], List[int], int]:
+    """
+    Split `;` separated fields into ncols columns of fixed-width fields.
+    Every column is packed into one zero-padded buffer, ready for numpy.frombuffer.
+    Trailing fields that don't fill a row are dropped, like decode_value does.
+
+    :return: (column buffers, column widths, number of rows)
+    """
+    cdef:
+        Py_buffer view
+        const char* buf
+        const char* end
+        const char* p
+        const char* q
+        Py_ssize_t i, nfields = 0, nrows, col
+        Py_ssize_t* widths
+        list _cols = [], _widths = []
+        bytes _col
+        char** outs
+    PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+    widths = <Py_ssize_t*>PyMem_Calloc(ncols, sizeof(Py_ssize_t))
+    outs = <char**>PyMem_Calloc(ncols, sizeof(char*))
+    try:
+        if widths is NULL or outs is NULL:
+            raise MemoryError()
+        buf = <const char*>view.buf
+        end = buf + view.len
+        # first pass: count rows and find the widest field of every column
+        p = buf
+        while view.len:
+            q = <const char*>memchr(p, b';', end - p)
+            if q is NULL:
+                q = end
+            col = nfields % ncols
+            if q - p > widths[col]:
+                widths[col] = q - p
+            nfields += 1
+            if q == end:
+                break
+            p = q + 1
+        nrows = nfields // ncols
+        for col in range(ncols):
+            widths[col] = max(widths[col], 1)
+            _col = PyBytes_FromStringAndSize(NULL, nrows * widths[col])
+            outs[col] = <char*>_col
+            memset(outs[col], 0, nrows * widths[col])
+            _cols.append(_col)
+            _widths.append(widths[col])
+        # second pass: copy fields of complete rows
+        p = buf
+        for i in range(nrows * ncols):
+            q = <const char*>memchr(p, b';', end - p)
+            if q is NULL:
+                q = end
+            col = i % ncols
+            memcpy(outs[col] + (i // ncols) * widths[col], p, q - p)
+            p = q + 1
+        return _cols, _widths, nrows
+    finally:
+        PyMem_Free(widths)
+        PyMem_Free(outs)
+        PyBuffer_Release(&view)
+
+def decode_value_numpy(
+    value: Union[bytes, memoryview],
+    out_dtype: str
+):
+    """
+    Decode values from tch maps into numpy arrays, without a Python object per item.
+
+    - 'h': array of 'S20' binary SHAs, a view of value
+    - 'r': structured array of one (sha 'S20', length 'u8') record
+    - 'sh': structured array of one (time 'i8', author 'S', sha 'S20') record, author in utf-8
+    - 'cs3': tuple of three 'S' arrays, one per column
+    """
+    np = _import_numpy()
+    if out_dtype == 'h':
+        return np.frombuffer(value, dtype='S20', count=len(value) // 20)
+    elif out_dtype == 'r':
+        return np.array([(value[:20], unber(value[20:])[0])],
+                        dtype=[('sha', 'S20'), ('length', 'u8')])
+    elif out_dtype == 'sh':
+        _time, _author = value[:len(value) - 21].split(b';', 1)
+        return np.array([(int(_time), _author, value[len(value) - 20:])],
+                        dtype=[('time', 'i8'), ('author', f'S{max(len(_author), 1)}'), ('sha', 'S20')])
+    elif out_dtype == 'cs3':
+        _cols, _widths, _rows = _split_columns(decomp_or_raw(value), 3)
+        return tuple(np.frombuffer(c, dtype=f'S{w}', count=_rows) for c, w in zip(_cols, _widths))
+    raise ValueError(f"Unsupported dtype for format='numpy': {out_dtype}, expected one of h, r, sh, cs3")
+
+def _concat_numpy(parts: list):
+    """ Concatenate results of decode_value_numpy read in chunks """
+    if len(parts) == 1:
+        return parts[0]
+    np = _import_numpy()
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(c) for c in zip(*parts))
+    return np.concatenate(parts)
+
+cdef const char* _HEX_DIGITS = b'0123456789abcdef'
+
+cdef inline str _hex20(const uint8_t* data):
+    """Hex encode a 20-byte SHA without an intermediate bytes object"""
+    cdef:
+        char buf[40]
+        int i
+    for i in range(20):
+        buf[2 * i] = _HEX_DIGITS[data[i] >> 4]
+        buf[2 * i + 1] = _HEX_DIGITS[data[i] & 0x0f]
+    return PyUnicode_DecodeASCII(buf, 40, NULL)
+
+cdef class ShaList:
+    """
+    Read-only sequence of hex SHAs backed by the raw bytes of an 'h' value.
+    Items are hex encoded only when accessed, `in` compares binary SHAs,
+    and slices with step 1 share the underlying bytes.
+    Any read-only buffer works as raw, e.g. a memory-mapped large file.
+
+    >>> shas = woc.get_values('a2c', 'Audris Mockus <audris@utk.edu>', format='shalist')
+    >>> shas[0], len(shas), shas[0] in shas
+    ('001ec7302de3b07f32669a1f1faed74585c8a8dc', 1024, True)
+    """
+    cdef readonly object raw
+    cdef Py_buffer _view
+    cdef bint _has_view
+    cdef Py_ssize_t _start  # offset of the first SHA in raw, in items
+    cdef Py_ssize_t _len
+
+    def __cinit__(self, raw = b'', Py_ssize_t start = 0, Py_ssize_t length = -1):
+        """
+        :param raw: concatenated 20-byte SHAs (bytes-like), a trailing partial SHA is ignored
+        :param start: index of the first SHA in raw
+        :param length: number of SHAs, defaults to all SHAs after start
+        """
+        PyObject_GetBuffer(raw, &self._view, PyBUF_SIMPLE)
+        self._has_view = True
+        cdef Py_ssize_t _total = self._view.len // 20
+        if length < 0:
+            length = _total - start
+        if start < 0 or start + length > _total:
+            raise ValueError(f'Range [{start}, {start + length}) out of bounds for {_total} SHAs')
+        self.raw = raw
+        self._start = start
+        self._len = length
+
+    def __dealloc__(self):
+        if self._has_view:
+            PyBuffer_Release(&self._view)
+
+    cdef inline const uint8_t* _ptr(self, Py_ssize_t i):
+        return <const uint8_t*>self._view.buf + (self._start + i) * 20
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        cdef Py_ssize_t i, start, stop, step, n
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step == 1:
+                return ShaList(self.raw, self._start + start, max(stop - start, 0))
+            return ShaList(b''.join([self.get_bytes(i) for i in range(start, stop, step)]))
+        i = index
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('ShaList index out of range')
+        return _hex20(self._ptr(i))
+
+    def get_bytes(self, Py_ssize_t i) -> bytes:
+        """ Binary SHA at index i """
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('ShaList index out of range')
+        return PyBytes_FromStringAndSize(<char*>self._ptr(i), 20)
+
+    cdef Py_ssize_t _find(self, object sha) except -2:
+        """ Index of a SHA (hex str or 20 bytes) or -1, raises TypeError on other objects """
+        cdef:
+            bytes _sha
+            const char* p
+            Py_ssize_t i
+        if isinstance(sha, str):
+            if len(sha) != 40:
+                return -1
+            try:
+                _sha = bytes.fromhex(sha)
+            except ValueError:
+                return -1
+        elif isinstance(sha, (bytes, bytearray, memoryview)):
+            _sha = bytes(sha)
+            if len(_sha) != 20:
+                return -1
+        else:
+            return -1
+        p = <const char*>_sha
+        for i in range(self._len):
+            if memcmp(self._ptr(i), p, 20) == 0:
+                return i
+        return -1
+
+    def __contains__(self, sha) -> bool:
+        return self._find(sha) >= 0
+
+    def index(self, sha) -> int:
+        cdef Py_ssize_t i = self._find(sha)
+        if i < 0:
+            raise ValueError(f'{sha!r} is not in ShaList')
+        return i
+
+    def count(self, sha) -> int:
+        cdef Py_ssize_t i, n = 0
+        _idx = self._find(sha)
+        if _idx < 0:
+            return 0
+        _sha = self.get_bytes(_idx)
+        for i in range(_idx, self._len):
+            if memcmp(self._ptr(i), <const char*>_sha, 20) == 0:
+                n += 1
+        return n
+
+    def __iter__(self):
+        cdef Py_ssize_t i
+        for i in range(self._len):
+            yield _hex20(self._ptr(i))
+
+    def __reversed__(self):
+        cdef Py_ssize_t i
+        for i in range(self._len - 1, -1, -1):
+            yield _hex20(self._ptr(i))
+
+    def iter_bytes(self):
+        """ Iterate over binary SHAs """
+        cdef Py_ssize_t i
+        for i in range(self._len):
+            yield PyBytes_FromStringAndSize(<char*>self._ptr(i), 20)
+
+    def tobytes(self) -> bytes:
+        """ Concatenated binary SHAs of this (possibly sliced) list """
+        if type(self.raw) is bytes and self._start == 0 and self._len * 20 == self._view.len:
+            return self.raw
+        return PyBytes_FromStringAndSize(<char*>self._ptr(0), self._len * 20)
+
+    def __eq__(self, other):
+        if isinstance(other, ShaList):
+            return self.tobytes() == other.tobytes()
+        if isinstance(other, (list, tuple)):
+            return len(other) == self._len and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        _eq = self.__eq__(other)
+        return _eq if _eq is NotImplemented else not _eq
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (ShaList, (self.tobytes(),))
+
+    def __repr__(self):
+        if self._len > 4:
+            return f"ShaList(['{self[0]}', '{self[1]}', ..., '{self[self._len - 1]}'], len={self._len})"
+        return f'ShaList({list(self)!r})'
+
+collections.abc.Sequence.register(ShaList)
+
 def decode_tree(
-    value: bytes
+    value: Union[bytes, bytearray, memoryview]
 ) -> List[Tuple[str, str, str]]:
     """
     Decode a tree binary object into tuples.
+    Any bytes-like object is accepted, so values can be decoded in place.
 
     Python: 4.77 µs, Cython: 280 ns
     Reference: https://stackoverflow.com/questions/14790681/
@@ -306,43 +846,51 @@ def decode_tree(
     files = []
 
     cdef:
-        const char* tree_cstr = value
-        const char* end = tree_cstr + len(value)
-        const char* pos = tree_cstr
+        Py_buffer view
+        const char* tree_cstr
+        const char* end
+        const char* pos
         const char* mode_start
         const char* filename_start
         const char* hash_start
         uint8_t mode_len
         uint16_t filename_len  # git filenames can be 4096 chars long
 
-    while pos < end:
-        mode_start = pos
-        pos = <const char*>memchr(pos, b' ', end - pos)
-        if not pos:
-            raise ValueError('Invalid tree object: missing space after mode')
-
-        mode_len = pos - mode_start
-        pos += 1  # Skip the space
-
-        filename_start = pos
-        pos = <const char*>memchr(pos, b'\x00', end - pos)
-        if not pos:
-            raise ValueError('Invalid tree object: missing null byte after filename')
-
-        filename_len = pos - filename_start
-        pos += 1  # Skip the null byte
-
-        if pos + 20 > end:
-            raise ValueError('Invalid tree object: missing or truncated hash')
-
-        hash_start = pos
-        pos += 20  # Skip the 20-byte hash
-
-        files.append((
-            value[mode_start - tree_cstr:mode_start - tree_cstr + mode_len].decode('ascii'),
-            value[filename_start - tree_cstr:filename_start  - tree_cstr + filename_len].decode('utf-8'),
-            value[hash_start  - tree_cstr :hash_start  - tree_cstr + 20].hex()
-        ))
+    PyObject_GetBuffer(value, &view, PyBUF_SIMPLE)
+    try:
+        tree_cstr = <const char*>view.buf
+        end = tree_cstr + view.len
+        pos = tree_cstr
+        while pos < end:
+            mode_start = pos
+            pos = <const char*>memchr(pos, b' ', end - pos)
+            if not pos:
+                raise ValueError('Invalid tree object: missing space after mode')
+
+            mode_len = pos - mode_start
+            pos += 1  # Skip the space
+
+            filename_start = pos
+            pos = <const char*>memchr(pos, b'\x00', end - pos)
+            if not pos:
+                raise ValueError('Invalid tree object: missing null byte after filename')
+
+            filename_len = pos - filename_start
+            pos += 1  # Skip the null byte
+
+            if pos + 20 > end:
+                raise ValueError('Invalid tree object: missing or truncated hash')
+
+            hash_start = pos
+            pos += 20  # Skip the 20-byte hash
+
+            files.append((
+                PyUnicode_DecodeASCII(mode_start, mode_len, NULL),
+                PyUnicode_DecodeUTF8(filename_start, filename_len, NULL),
+                _hex20(<const uint8_t*>hash_start)
+            ))
+    finally:
+        PyBuffer_Release(&view)
 
     return files
 
@@ -393,11 +941,23 @@ cdef const char* strrchr2(const char* s, char c, const char* end):
         s += 1
     return p
 
+cdef const char* _find_blank_line(const char* s, const char* end):
+    """Like strstr(s, "\\n\\n") but with a limit"""
+    while s < end:
+        s = <const char*>memchr(s, b'\n', end - s)
+        if not s or s + 1 >= end:
+            return NULL
+        if s[1] == b'\n':
+            return s
+        s += 1
+    return NULL
+
 def decode_commit(
-    commit_bin: bytes
+    commit_bin: Union[bytes, bytearray, memoryview]
 ) -> Tuple[str, Tuple[str, str, str], Tuple[str, str, str], str]:
     """
     Decode git commit objects into tuples.
+    Any bytes-like object is accepted, so values can be decoded in place.
 
     Python: 2.35 µs, Cython: 855 ns
     Reference: https://git-scm.com/book/en/v2/Git-Internals-Git-Objects
@@ -410,7 +970,9 @@ def decode_commit(
      'News for Sep 5, 2014\\n')
     """
     cdef:
-        const char* cmt_cstr = commit_bin
+        Py_buffer view
+        const char* cmt_cstr
+        const char* end
         const char* header
         const char* full_msg
         const char* line
@@ -433,71 +995,80 @@ def decode_commit(
     _committer_timezone = ''
     _encoding = 'utf-8'
 
-    if not cmt_cstr or cmt_cstr[0] == b'\0':
-        raise ValueError('Empty commit object')
+    PyObject_GetBuffer(commit_bin, &view, PyBUF_SIMPLE)
+    try:
+        cmt_cstr = <const char*>view.buf
+        end = cmt_cstr + view.len
 
-    header = cmt_cstr
-    full_msg = strstr(cmt_cstr, b"\n\n")
-    if not full_msg:
-        raise ValueError('Invalid commit object: no \\n\\n')
+        if view.len == 0 or cmt_cstr[0] == b'\0':
+            raise ValueError('Empty commit object')
 
-    header_len = full_msg - header
-    full_msg += 2  # Skip the '\n\n'
+        header = cmt_cstr
+        full_msg = _find_blank_line(cmt_cstr, end)
+        if not full_msg:
+            raise ValueError('Invalid commit object: no \\n\\n')
 
-    line = header
-    while line < header + header_len:
-        next_line = strchr(line, b'\n')
-        if not next_line:
-            next_line = header + header_len
-        line_len = next_line - line
+        header_len = full_msg - header
+        full_msg += 2  # Skip the '\n\n'
 
-        if line_len == 0:
-            line = next_line + 1
-            continue
+        line = header
+        while line < header + header_len:
+            next_line = <const char*>memchr(line, b'\n', header + header_len - line)
+            if not next_line:
+                next_line = header + header_len
+            line_len = next_line - line
 
-        key = line
-        value = strchr(line, b' ')
-        if not value or value >= next_line:
-            line = next_line + 1
-            continue
-        value += 1
-
-        if strncmp(key, "tree ", 5) == 0:
-            _tree = (value[:line_len - 5]).decode('ascii')
-        elif strncmp(key, "parent ", 7) == 0:
-            _parent_shas.append(value[:line_len - 7].decode('ascii'))
-        elif strncmp(key, "author ", 7) == 0:
-            timezone = strrchr2(value, b' ', next_line)
-            if not timezone:
-                continue
-            timestamp = strrchr2(value, b' ', timezone - 1)
-            if not timestamp:
+            if line_len == 0:
+                line = next_line + 1
                 continue
-            _author_bytes = value[:timestamp - value]
-            _author_timestamp = (value[timestamp - value + 1: timezone - value]).decode('ascii')
-            _author_timezone = (value[timezone - value + 1: next_line - value]).decode('ascii')
-        elif strncmp(key, "committer ", 10) == 0:
-            timezone = strrchr2(value, b' ', next_line)
-            if not timezone:
-                continue
-            timestamp = strrchr2(value, b' ', timezone - 1)
-            if not timestamp:
+
+            key = line
+            value = <const char*>memchr(line, b' ', line_len)
+            if not value:
+                line = next_line + 1
                 continue
-            _committer_bytes = value[:timestamp - value]
-            _committer_timestamp = (value[timestamp - value + 1: timezone - value]).decode('ascii')
-            _committer_timezone = (value[timezone - value + 1: next_line - value]).decode('ascii')
-        elif strncmp(key, "gpgsig", 6) == 0:
-            is_reading_pgp = True
-        elif is_reading_pgp and strncmp(line, "-----END PGP SIGNATURE-----", 27) == 0:
-            is_reading_pgp = False
-        elif strncmp(key, "encoding", 8) == 0:
-            _encoding = value[:line_len - 8].decode('ascii')
-
-        line = next_line + 1
+            value += 1
+
+            if strncmp(key, "tree ", 5) == 0:
+                _tree = (value[:line_len - 5]).decode('ascii')
+            elif strncmp(key, "parent ", 7) == 0:
+                _parent_shas.append(value[:line_len - 7].decode('ascii'))
+            elif strncmp(key, "author ", 7) == 0:
+                timezone = strrchr2(value, b' ', next_line)
+                if not timezone:
+                    continue
+                timestamp = strrchr2(value, b' ', timezone - 1)
+                if not timestamp:
+                    continue
+                _author_bytes = value[:timestamp - value]
+                _author_timestamp = (value[timestamp - value + 1: timezone - value]).decode('ascii')
+                _author_timezone = (value[timezone - value + 1: next_line - value]).decode('ascii')
+            elif strncmp(key, "committer ", 10) == 0:
+                timezone = strrchr2(value, b' ', next_line)
+                if not timezone:
+                    continue
+                timestamp = strrchr2(value, b' ', timezone - 1)
+                if not timestamp:
+                    continue
+                _committer_bytes = value[:timestamp - value]
+                _committer_timestamp = (value[timestamp - value + 1: timezone - value]).decode('ascii')
+                _committer_timezone = (value[timezone - value + 1: next_line - value]).decode('ascii')
+            elif strncmp(key, "gpgsig", 6) == 0:
+                is_reading_pgp = True
+            elif is_reading_pgp and strncmp(line, "-----END PGP SIGNATURE-----", 27) == 0:
+                is_reading_pgp = False
+            elif strncmp(key, "encoding", 8) == 0:
+                _encoding = value[:line_len - 8].decode('ascii')
+
+            line = next_line + 1
+
+        _message_bytes = full_msg[:end - full_msg]
+    finally:
+        PyBuffer_Release(&view)
 
     _author = decode_str(_author_bytes, _encoding)
     _committer = decode_str(_committer_bytes, _encoding)
-    _message = decode_str(full_msg, _encoding)
+    _message = decode_str(_message_bytes, _encoding)
 
     return (
         _tree,
@@ -593,30 +1164,205 @@ def decode_tag(tag: bytes):
 _file_pool: Dict[str, FileIO] = {}
 _file_lock = Lock()
 
-def _cached_open(path: str, is_gzip: bool = False, *args, **kwargs) -> FileIO:
+@atexit.register
+def _close_file_pool():
+    """ Close pooled files, rapidgzip aborts if its threads are still running at exit """
+    with _file_lock:
+        for f in _file_pool.values():
+            f.close()
+        _file_pool.clear()
+
+_mmap_pool: Dict[str, Optional[mmap.mmap]] = {}
+
+def _cached_mmap(path: str) -> Optional[mmap.mmap]:
+    """ Map a file read-only, once per process. None for empty files, which can't be mapped """
+    with _file_lock:
+        if path not in _mmap_pool:
+            with open(path, 'rb') as f:
+                _mmap_pool[path] = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                                    if os.fstat(f.fileno()).st_size else None)
+        return _mmap_pool[path]
+
+class _BinPool:
+    """
+    Bounded LRU pool of read-only descriptors of blob .bin shards.
+    os.pread doesn't move a shared offset, so one descriptor serves all threads.
+    Descriptors evicted while being read are closed by their last reader.
+    """
+    def __init__(self, max_open: int = WocBinMaxOpen):
+        self.max_open = max_open
+        self._lock = Lock()
+        self._fds: OrderedDict = OrderedDict()  # path -> fd
+        self._users: Dict[int, int] = {}  # fd -> running preads
+        self._retired = set()  # evicted fds still being read
+
+    def reset(self):
+        """ Close all descriptors and renew the lock, e.g. in a forked child where no read is running """
+        self._lock = Lock()
+        for fd in (*self._fds.values(), *self._retired):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds.clear()
+        self._users.clear()
+        self._retired.clear()
+
+    def _acquire(self, path: str) -> int:
+        with self._lock:
+            fd = self._fds.get(path)
+            if fd is not None:
+                self._fds.move_to_end(path)
+                self._users[fd] = self._users.get(fd, 0) + 1
+                return fd
+        # don't hold the lock on a slow (network) open
+        fd = os.open(path, os.O_RDONLY)
+        with self._lock:
+            if path in self._fds:
+                os.close(fd)
+                fd = self._fds[path]
+                self._fds.move_to_end(path)
+            else:
+                self._fds[path] = fd
+                while len(self._fds) > self.max_open:
+                    _, _old = self._fds.popitem(last=False)
+                    if self._users.get(_old):
+                        self._retired.add(_old)
+                    else:
+                        os.close(_old)
+            self._users[fd] = self._users.get(fd, 0) + 1
+            return fd
+
+    def _release(self, fd: int):
+        with self._lock:
+            self._users[fd] -= 1
+            if self._users[fd] == 0:
+                del self._users[fd]
+                if fd in self._retired:
+                    self._retired.discard(fd)
+                    os.close(fd)
+
+    def pread(self, path: str, offset: int, length: int) -> bytes:
+        """ Read length bytes at offset of a file, without opening it again """
+        fd = self._acquire(path)
+        try:
+            _buf = os.pread(fd, length, offset)
+            # short reads happen on network filesystems
+            while len(_buf) < length:
+                _more = os.pread(fd, length - len(_buf), offset + len(_buf))
+                if not _more:
+                    break
+                _buf += _more
+            return _buf
+        finally:
+            self._release(fd)
+
+    def fadvise(self, path: str, spans: Iterable[Tuple[int, int]]):
+        """ Tell the kernel (offset, length) spans of a file are read soon, so it reads them ahead """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        fd = self._acquire(path)
+        try:
+            for offset, length in spans:
+                os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        finally:
+            self._release(fd)
+
+    def __len__(self) -> int:
+        return len(self._fds)
+
+_BIN_POOL = _BinPool()
+"""Descriptors of blob .bin shards shared by all WocMapsLocal instances"""
+
+def _coalesce_ranges(ranges: List[Tuple[int, int, int]], int gap = WocBinMergeGap,
+                     int max_span = WocBinMaxSpan) -> List[Tuple[int, int, List[Tuple[int, int, int]]]]:
+    """
+    Merge (offset, length, position) ranges sorted by offset into spans read at once.
+    Ranges at most gap bytes apart are merged unless the span grows past max_span.
+
+    >>> _coalesce_ranges([(0, 10, 0), (12, 5, 1), (1 << 20, 5, 2)])
+    [(0, 17, [(0, 10, 0), (12, 5, 1)]), (1048576, 5, [(1048576, 5, 2)])]
+    """
+    _spans = []
+    _items = None  # ranges of the open span [_start, _end)
+    for offset, length, i in ranges:
+        if _items is not None and offset - _end <= gap and max(_end, offset + length) - _start <= max_span:
+            _end = max(_end, offset + length)
+            _items.append((offset, length, i))
+            continue
+        if _items is not None:
+            _spans.append((_start, _end - _start, _items))
+        _start, _end, _items = offset, offset + length, [(offset, length, i)]
+    if _items is not None:
+        _spans.append((_start, _end - _start, _items))
+    return _spans
+
+@atexit.register
+def _close_bin_pool():
+    _BIN_POOL.reset()
+
+def scan_idx_bin(idx_path: str, bin_path: str, int block_size = WocBinScanBlockSize
+                 ) -> Generator[Tuple[bytes, memoryview], None, None]:
+    """
+    Iterate over (sha, compressed object) of an .idx/.bin pair in file order.
+    The .bin file is read block by block, the next block is read ahead by the kernel.
+    Lines of .idx files are `id;offset;length;sha` or, for blobs, `id;offset;length;full_length;sha;...`.
+
+    :param block_size: bytes read at once, records larger than it are read alone
+    :return: raw sha and a memoryview of the LZF-compressed object, valid until it is released
+    """
+    cdef Py_ssize_t _start = 0, offset, length
+    _block = memoryview(b'')
+    with open(idx_path, 'rb') as f:
+        for line in f:
+            _fields = line.rstrip(b'\r\n').split(b';')
+            if len(_fields) < 4:
+                if len(_fields) > 1:
+                    raise ValueError(f'Invalid index line in {idx_path}: {line!r}')
+                continue  # blank line
+            offset, length = int(_fields[1]), int(_fields[2])
+            _sha = _fields[3] if len(_fields) == 4 else _fields[4]
+            if offset < _start or offset + length > _start + len(_block):
+                _block = memoryview(_BIN_POOL.pread(bin_path, offset, max(block_size, length)))
+                _start = offset
+                if offset + length > _start + len(_block):
+                    raise ValueError(f'Truncated object {_sha.decode()} at {offset} in {bin_path}')
+                _BIN_POOL.fadvise(bin_path, ((_start + len(_block), block_size), ))
+            yield bytes.fromhex(_sha.decode()), _block[offset - _start:offset - _start + length]
+
+_GZIP_INDEXES = GzipIndexManager()
+"""Index manager of files opened without one, indexes are only looked up in WocCachePath"""
+
+def _cached_open(path: Union[str, WocFile], is_gzip: bool = False, *args,
+                 indexes: Optional[GzipIndexManager] = None, **kwargs) -> FileIO:
+    _woc_file = path
+    path = path if isinstance(path, str) else path.path
     try:
         _file_lock.acquire()
         if path in _file_pool:
             return _file_pool[path]
         if is_gzip is True:
+            from rapidgzip import RapidgzipFile  # deferred, it's only needed by large maps
             _file_pool[path] = RapidgzipFile(path, *args, **kwargs)
-            # build gzip index cache if not exists
-            _index_path = os.path.join(WocCachePath, hex(fnvhash(path.encode()))[2:] + '.gzidx')
-            if os.path.exists(_index_path):
-                _file_pool[path].import_index(_index_path)
-            else:
-                _file_pool[path].export_index(_index_path)
+            (indexes or _GZIP_INDEXES).load(_file_pool[path], _woc_file)
         else:
             _file_pool[path] = open(path, *args, **kwargs)
         return _file_pool[path]
     finally:
         _file_lock.release()
 
+def _skip_large_header(f) -> int:
+    """ Offset of the values in a gzip large file, after the header line if any """
+    # find first 256 bytes for b'\n', don't scan the whole document
+    _idx = f.read(256).find(b'\n')
+    return _idx + 1 if _idx > 0 else 0
+
 def read_large_random_access(
-    path: str,
+    path: Union[str, WocFile],
     dtype: str,
     offset: int = 0,
-    length: int = 131072
+    length: int = 131072,
+    indexes: Optional[GzipIndexManager] = None,
 ) -> Tuple[bytes, Optional[int]]:
     """
     Read a *.large.* and return its content.
@@ -625,6 +1371,7 @@ def read_large_random_access(
     :param dtype: data type
     :param offset: offset to start reading. It is either 0 or after the last separator.
     :param length: length to read. It should be longer than the longest record.
+    :param indexes: where to find gzip seek indexes
 
     :return: a tuple of bytes and the next offset, None if EOF. Returned bytes must not begin or end with a separator.
     """
@@ -639,7 +1386,7 @@ def read_large_random_access(
             return r, None
         return r, offset + _new_len 
     else:
-        f = _cached_open(path, is_gzip=True)
+        f = _cached_open(path, is_gzip=True, indexes=indexes)
         if offset == 0:
             # find first 256 bytes for b'\n', don't scan the whole document
             _idx = f.read(256).find(b'\n')
@@ -667,12 +1414,309 @@ def read_large_random_access(
             _last_sep_idx -= 1
         return _uncompressed[:_last_sep_idx], offset + _last_sep_idx + 1
 
+def _queue_put(q: "queue.Queue", stop: threading.Event, item) -> bool:
+    """ Put an item to a bounded queue, give up once stop is set """
+    import queue
+
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _readahead_worker(woc_file: Union[str, WocFile], indexes: Optional[GzipIndexManager], threads: int,
+                      Py_ssize_t block_size, Py_ssize_t max_block_size,
+                      q: "queue.Queue", stop: threading.Event):
+    """ Decompress blocks of a gzip large file into q until EOF or stop, see LargeFileReader """
+    from rapidgzip import RapidgzipFile
+    try:
+        with RapidgzipFile(woc_file if isinstance(woc_file, str) else woc_file.path,
+                           parallelization=threads) as f:
+            (indexes or _GZIP_INDEXES).load(f, woc_file)
+            f.seek(_skip_large_header(f))
+            while not stop.is_set():
+                _block = f.read(block_size)
+                _last = len(_block) < block_size
+                if not _queue_put(q, stop, (_block, _last)) or _last:
+                    return
+                block_size = min(block_size * 2, max_block_size)
+    except BaseException as e:
+        _queue_put(q, stop, e)
+
+class LargeFileReader:
+    """
+    Stream the value of one key from its *.large.* file.
+
+    The file is read in blocks growing from block_size to max_block_size. A record cut
+    at the end of a block is kept and completed by the next block, so every block is read
+    once and tokenized once. Unlike read_large_random_access, no offsets are handed back.
+
+    With readahead, gzip files are read by a background thread with its own
+    RapidgzipFile, up to readahead blocks ahead of the tokenizer.
+
+    >>> reader = LargeFileReader(woc.config['maps']['b2c'][0]['larges'][key], 'h')
+    >>> for sha in reader:  # or `for chunk in reader.chunks()` for raw bytes
+    ...     print(sha)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, WocFile],
+        dtype: str,
+        block_size: int = WocGzipChunkSize,
+        max_block_size: int = WocLargeMaxBlockSize,
+        readahead: int = 0,
+        threads: int = 0,
+        indexes: Optional[GzipIndexManager] = None,
+    ):
+        """
+        :param path: path to the file, or its WocFile so its digest keys the gzip index
+        :param dtype: data type of the map, compressed 'cs' is plain 's' in large files
+        :param block_size: size of the first read; with the default, the first chunk
+                           is what read_large_random_access returns
+        :param max_block_size: size blocks grow to
+        :param readahead: number of blocks decompressed ahead in a background thread,
+                          0 reads in the calling thread. Only used for gzip files.
+        :param threads: parallelization of the background RapidgzipFile, 0 uses all cores
+        :param indexes: where to find gzip seek indexes
+        """
+        self._woc_file = path
+        self.path = path if isinstance(path, str) else path.path
+        self._indexes = indexes
+        self.dtype = 's' if dtype == 'cs' else dtype
+        self._block_size = block_size
+        self._max_block_size = max(block_size, max_block_size)
+        self._ncols = 3 if self.dtype == 'cs3' else 1
+        self._offset: Optional[int] = None
+        self._tail = b''
+        self._done = False
+        self._readahead = readahead if self.dtype != 'h' else 0
+        self._threads = threads
+        self._queue: Optional["queue.Queue"] = None
+        self._stop = threading.Event()
+        self._producer: Optional[threading.Thread] = None
+
+    def _read_block(self) -> Tuple[bytes, bool]:
+        """ Read the next block, return it and whether it is the last """
+        if self._readahead:
+            return self._get_block()
+        if self.dtype == 'h':
+            if self._offset is None:
+                self._offset = 20
+            _mm = _cached_mmap(self.path)
+            _block = _mm[self._offset:self._offset + self._block_size] if _mm is not None else b''
+        else:
+            f = _cached_open(self._woc_file, is_gzip=True, indexes=self._indexes)
+            if self._offset is None:
+                f.seek(0)
+                self._offset = _skip_large_header(f)
+            # file objects are shared, seek every time
+            f.seek(self._offset)
+            _block = f.read(self._block_size)
+        self._offset += len(_block)
+        _last = len(_block) < self._block_size
+        self._block_size = min(self._block_size * 2, self._max_block_size)
+        return _block, _last
+
+    def _get_block(self) -> Tuple[bytes, bool]:
+        """ Take the next block from the background thread, start it if needed """
+        if self._queue is None:
+            import queue  # deferred, only readahead needs it
+
+            self._queue = queue.Queue(maxsize=self._readahead)
+            # the thread must not reference self, so an abandoned reader is collected and stops it
+            self._producer = threading.Thread(
+                target=_readahead_worker, daemon=True,
+                args=(self._woc_file, self._indexes, self._threads, self._block_size, self._max_block_size,
+                      self._queue, self._stop),
+                name=f'woc-readahead-{os.path.basename(self.path)}')
+            self._producer.start()
+        _item = self._queue.get()
+        if isinstance(_item, BaseException):
+            self._done = True
+            raise _item
+        return _item
+
+    def close(self) -> None:
+        """ Stop the background thread, if any """
+        self._stop.set()
+        self._done = True
+        if self._producer is not None:
+            self._producer.join()
+            self._producer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self._stop.set()
+
+    def _next(self, bint decode):
+        """ Next chunk of complete records (decoded or raw), None at the end """
+        cdef Py_ssize_t consumed
+        while not self._done:
+            _block, self._done = self._read_block()
+            _data = self._tail + _block if self._tail else _block
+            if self.dtype == 'h':
+                consumed = len(_data) // 20 * 20
+                _items = None
+            elif self.dtype in ('s', 'cs3'):
+                _items, consumed = _tokenize_chunk(_data, self._ncols, self._done, decode)
+            else:
+                raise ValueError(f'Unsupported dtype of large files: {self.dtype}')
+            self._tail = _data[consumed:]
+            if consumed:
+                _chunk = _data[:consumed] if consumed < len(_data) else _data
+                if not decode:
+                    return _chunk
+                return _items if _items is not None else decode_value(_chunk, self.dtype)
+        return None
+
+    def view(self) -> memoryview:
+        """
+        Zero-copy view of all SHAs of an 'h' large file, which is memory-mapped.
+        Independent of the position of read / chunks / iteration.
+        """
+        if self.dtype != 'h':
+            raise ValueError(f"Only large files of 'h' maps can be viewed, got {self.dtype}")
+        _mm = _cached_mmap(self.path)
+        if _mm is None or len(_mm) <= 20:
+            return memoryview(b'')
+        return memoryview(_mm)[20:20 + (len(_mm) - 20) // 20 * 20]
+
+    def read(self) -> Optional[list]:
+        """ Decode the next chunk of records, None at the end """
+        return self._next(True)
+
+    def read_raw(self) -> Optional[bytes]:
+        """ Next chunk of complete records as stored, None at the end """
+        return self._next(False)
+
+    def chunks(self) -> Generator[bytes, None, None]:
+        """ Iterate over raw chunks of complete records, stops the background thread when done """
+        try:
+            while True:
+                _chunk = self._next(False)
+                if _chunk is None:
+                    return
+                yield _chunk
+        finally:
+            self.close()
+
+    def __iter__(self):
+        try:
+            while True:
+                _items = self._next(True)
+                if _items is None:
+                    return
+                yield from _items
+        finally:
+            self.close()
+
+def _encode_key(key: Union[bytes, str], in_dtype: str) -> Tuple[bytes, str]:
+    """
+    Convert a user-supplied key to the bytes stored in tch and its hex representation.
+    Keys of 'h' maps are git SHAs, others are hashed with fnvhash.
+    """
+    if in_dtype == 'h':
+        if isinstance(key, str):
+            return bytes.fromhex(key), key
+        key = bytes(key)
+        return key, key.hex()
+    if isinstance(key, str): # key is string
+        key = key.encode('utf-8')
+    return key, hex(fnvhash(key))[2:]
+
+def _as_list(value) -> list:
+    """ decode_value returns a tuple for 'sh' and 'r', get_values always returns a list """
+    return value if isinstance(value, list) else list(value)
+
+def _check_partition(partition: Optional[Tuple[int, int]]) -> None:
+    if partition is None:
+        return
+    i, n = partition
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f'Invalid partition: {partition}, expected (i, n) with 0 <= i < n')
+
+def parse_worker(spec: Union[str, Tuple[int, int], None]) -> Optional[Tuple[int, int]]:
+    """
+    Parse a worker spec, 'k/n' or (k, n) for worker k of n, as all_keys, all_items,
+    get_values_many and show_content_many accept it.
+
+    >>> parse_worker('3/8')
+    (3, 8)
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        try:
+            k, n = (int(v) for v in spec.split('/'))
+        except ValueError:
+            raise ValueError(f'Invalid worker: {spec}, expected k/n')
+    else:
+        k, n = spec
+    if n < 1 or not 0 <= k < n:
+        raise ValueError(f'Invalid worker: {spec}, expected k/n with 0 <= k < n')
+    return k, n
+
+def worker_shards(n_shards: int, worker: Union[str, Tuple[int, int]]) -> List[int]:
+    """
+    Shards of a map with n_shards shards assigned to a worker: shard j goes to worker j % n.
+    Keys and large files go to the worker of their shard, so a worker only opens its own shards.
+
+    >>> worker_shards(8, '1/3')
+    [1, 4, 7]
+    """
+    k, n = parse_worker(worker)
+    return [j for j in range(n_shards) if j % n == k]
+
+def _get_fobj(_in: Union[str, Dict[str, str], None]) -> Optional[WocFile]:
+    if _in is None:
+        return None
+    if isinstance(_in, str):
+        return WocFile(path=_in)
+    return WocFile(**_in)
+
+class _WocFiles(collections.abc.Mapping):
+    """ Read-only view of `larges` in a profile, WocFiles are built on first access """
+    def __init__(self, raw: collections.abc.Mapping):
+        self._raw = raw
+        self._files: Dict[str, WocFile] = {}
+
+    def __getitem__(self, key: str) -> WocFile:
+        try:
+            return self._files[key]
+        except KeyError:
+            _file = self._files[key] = _get_fobj(self._raw[key])
+            return _file
+
+    def __contains__(self, key) -> bool:
+        return key in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
 class WocMapsLocal(WocMapsBase):
     def __init__(self,
             profile_path: Union[str, Iterable[str], None] = None,
             version: Union[str, Iterable[str], None] = None,
             on_large: Literal['ignore', 'head', 'all'] = 'all',
             on_bad: Literal['allow', 'error'] = 'allow',
+            tch_tuning: Optional[Dict[str, Dict[str, int]]] = None,
+            cache: Union[WocCache, int, bool, None] = None,
+            large_readahead: int = 0,
+            gzip_threads: int = 0,
+            gzip_index_dirs: Optional[Iterable[str]] = None,
+            blob_fadvise: bool = True,
+            profile_cache: bool = True,
         ) -> None:
         # init logger
         self._logger = logging.getLogger(__name__)
@@ -693,8 +1737,7 @@ class WocMapsLocal(WocMapsBase):
         for p in profile_path:
             _full_path = os.path.expanduser(p)
             if os.path.exists(_full_path):
-                with open(_full_path) as f:
-                    self.config = json.load(f)
+                self.config = load_profile(_full_path, WocCachePath if profile_cache else None)
                 break
         else:
             raise FileNotFoundError("No wocprofile.json found in the following paths: {}, "
@@ -709,13 +1752,6 @@ class WocMapsLocal(WocMapsBase):
         self.maps = []
         self.objects = []
 
-        def _get_fobj(_in: Union[str, Dict[str, str]]) -> Optional[WocFile]:
-            if _in is None:
-                return None
-            if isinstance(_in, str):
-                return WocFile(path=_in)
-            return WocFile(**_in)
-        
         for _k, _lm in self.config["maps"].items():
             for _m in _lm:
                 self.maps.append(WocMap(
@@ -723,7 +1759,7 @@ class WocMapsLocal(WocMapsBase):
                     version=_m["version"],
                     sharding_bits=_m["sharding_bits"],
                     shards=list(map(_get_fobj, _m["shards"])),
-                    larges={k: _get_fobj(v) for k, v in _m.get("larges", {}).items()},
+                    larges=_WocFiles(_m.get("larges", {})),
                     dtypes=_m["dtypes"],
                 ))
 
@@ -750,6 +1786,27 @@ class WocMapsLocal(WocMapsBase):
             for v in self.config["bads"].values():
                 self._bad_keys.update(v)
 
+        # per-thread buffers for zero-copy reads
+        self._buffers = threading.local()
+
+        # opt-in cache of raw and decoded values
+        if cache is True:
+            cache = WocCache()
+        elif cache is False:
+            cache = None
+        elif isinstance(cache, int):
+            cache = WocCache(max_bytes=cache)
+        self.cache: Optional[WocCache] = cache
+
+        # background decompression of gzip large files, see LargeFileReader
+        self._large_readahead = large_readahead
+        self._gzip_threads = gzip_threads
+        # prebuilt gzip indexes shared by a cluster, kwargs go first
+        self.gzip_indexes = GzipIndexManager(
+            shared_dirs=[*(gzip_index_dirs or []), *self.config.get("gzipIndexDirs", [])])
+        # hint the kernel to read ahead blobs fetched by show_content_many
+        self._blob_fadvise = blob_fadvise
+
         # build lookup map
         self._lookup: Dict[str, Union[WocObject, WocMap]] = {}
         for _m in self.maps:
@@ -770,6 +1827,34 @@ class WocMapsLocal(WocMapsBase):
             elif _o.name == 'tag.tch':
                 self._lookup['tag'] = _o
 
+        # per-map tch tuning (xmsiz, rcnum), kwargs override the profile
+        self._tch_tuning: Dict[str, Dict[str, int]] = {}
+        for _tuning in (self.config.get("tuning", {}), tch_tuning or {}):
+            for _k, _v in _tuning.items():
+                if _k not in self._lookup:
+                    self._logger.warning(f"Ignoring tuning for unknown map: {_k}")
+                    continue
+                self._tch_tuning.setdefault(self._lookup[_k].name, {}).update(_v)
+
+    def _get_tch(self, _map: Union[WocMap, WocObject], woc_file: WocFile) -> TCHashDB:
+        """
+        Open a shard of a map from the pool, applying the map's tuning.
+        Without explicit xmsiz, shards up to WocTchMmapLimit are memory-mapped entirely.
+        """
+        _tuning = self._tch_tuning.get(_map.name, {})
+        xmsiz = _tuning.get('xmsiz')
+        if xmsiz is None:
+            xmsiz = woc_file.size if woc_file.size and woc_file.size <= WocTchMmapLimit else -1
+        return get_tch(woc_file.path, xmsiz, _tuning.get('rcnum', 0))
+
+    def _check_bad(self, key: bytes, hex_str: str, in_dtype: str) -> None:
+        """
+        Raise KeyError if the key is marked as bad in the profile
+        """
+        reason = self._bad_keys.get(hex_str) if in_dtype == "h" else self._bad_keys.get(key.decode("utf-8"))
+        if reason is not None:
+            raise KeyError(f"Key {hex_str if in_dtype == 'h' else key.decode('utf-8')} is marked as bad: {reason}")
+
     def _get_tch_bytes(
         self, map_name, key, cursor=0
     ) -> Tuple[bytes, str, Optional[int]]:
@@ -793,31 +1878,21 @@ class WocMapsLocal(WocMapsBase):
             start_time = time.time_ns()
             self._logger.debug(f"get from tch: {map_name} {key}")
 
-        if in_dtype == 'h':
-            if isinstance(key, str):
-                hex_str = key
-                key = bytes.fromhex(key)
-            else:
-                hex_str = bytes(key).hex()
-        else:
-            if isinstance(key, str): # key is string
-                key = key.encode('utf-8')
-            hex_str = hex(fnvhash(key))[2:]
+        key, hex_str = _encode_key(key, in_dtype)
 
         if self._is_debug_enabled:
             self._logger.debug(f"hash: hex={hex_str} in {(time.time_ns() - start_time) / 1e6:.2f}ms")
             start_time = time.time_ns()
 
         if self._raise_on_bad:
-            reason = self._bad_keys.get(hex_str) if in_dtype == "h" else self._bad_keys.get(key.decode("utf-8"))
-            if reason is not None:
-                raise KeyError(f"Key {hex_str if in_dtype == 'h' else key.decode('utf-8')} is marked as bad: {reason}")
+            self._check_bad(key, hex_str, in_dtype)
 
         if hasattr(_map, "larges") and hex_str in _map.larges:
             if self._on_large == 'ignore':
                 raise KeyError(f"Large object {_map.larges[hex_str].path} is ignored")
 
-            _bytes, next_cursor = read_large_random_access(_map.larges[hex_str].path, out_dtype, cursor, WocGzipChunkSize)
+            _bytes, next_cursor = read_large_random_access(_map.larges[hex_str], out_dtype, cursor, WocGzipChunkSize,
+                                                           self.gzip_indexes)
 
             if self._is_debug_enabled:
                 self._logger.debug(f"read large: file={_map['larges'][hex_str]} "
@@ -833,8 +1908,12 @@ class WocMapsLocal(WocMapsBase):
             _woc_file = _map.shards[_shard]
             assert _woc_file, f"shard {_shard} not found at {_woc_file}"
 
-            _tch = get_tch(_woc_file.path)
-            _bytes = _tch[key]
+            _bytes = _MISSING if self.cache is None else self.cache.get_raw(_map.name, key)
+            if _bytes is _MISSING:
+                _tch = self._get_tch(_map, _woc_file)
+                _bytes = _tch[key]
+                if self.cache is not None:
+                    self.cache.put_raw(_map.name, key, _bytes)
 
             if self._is_debug_enabled:
                 self._logger.debug(f"get from tch: shard={_shard} db={_woc_file} "
@@ -842,6 +1921,116 @@ class WocMapsLocal(WocMapsBase):
 
         return _bytes, out_dtype, next_cursor
 
+    def _get_tch_view(
+        self, obj_name, key
+    ) -> Union[bytes, memoryview]:
+        """
+        Get value of a git object into a per-thread buffer, return a view of it.
+        Saves the bytes copy of _get_tch_bytes; the view is only valid until
+        the next call in the same thread. With the cache enabled, bytes are returned.
+        """
+        try:
+            _map: WocObject = self._lookup[obj_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {obj_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+
+        key, hex_str = _encode_key(key, 'h')
+        if self._raise_on_bad:
+            self._check_bad(key, hex_str, 'h')
+
+        _shard = get_shard(key, _map.sharding_bits, False)
+        _woc_file = _map.shards[_shard]
+        assert _woc_file, f"shard {_shard} not found at {_woc_file}"
+        _tch = self._get_tch(_map, _woc_file)
+
+        if self.cache is not None:
+            # cached values must outlive the buffer, so read them as bytes
+            _bytes = self.cache.get_raw(_map.name, key)
+            if _bytes is _MISSING:
+                _bytes = _tch[key]
+                self.cache.put_raw(_map.name, key, _bytes)
+            return _bytes
+
+        _buf = getattr(self._buffers, 'value', None)
+        if _buf is None:
+            _buf = self._buffers.value = bytearray(65536)
+        try:
+            return _tch.get_into(key, _buf)
+        except BufferError:
+            # a previous view is still alive and the buffer needs to grow,
+            # leave the old buffer to its holder
+            _buf = self._buffers.value = bytearray(len(_buf))
+            return _tch.get_into(key, _buf)
+
+    def _open_large(self, map_name, key) -> Optional[LargeFileReader]:
+        """
+        Get a reader of the large file of a key, None if the key is not large.
+        Raises KeyError like _get_tch_bytes for bad keys and ignored large files.
+        """
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+        if not getattr(_map, "larges", None):
+            return None
+        in_dtype, out_dtype = _map.dtypes
+        key, hex_str = _encode_key(key, in_dtype)
+        if hex_str not in _map.larges:
+            return None
+        if self._raise_on_bad:
+            self._check_bad(key, hex_str, in_dtype)
+        if self._on_large == 'ignore':
+            raise KeyError(f"Large object {_map.larges[hex_str].path} is ignored")
+        return self._large_reader(_map.larges[hex_str], out_dtype)
+
+    def _large_reader(self, woc_file: WocFile, dtype: str) -> LargeFileReader:
+        """ Reader of a large file, reading ahead only if the whole file is read """
+        return LargeFileReader(woc_file, dtype,
+                               readahead=self._large_readahead if self._on_large == 'all' else 0,
+                               threads=self._gzip_threads, indexes=self.gzip_indexes)
+
+    def _large_chunks(self, reader: LargeFileReader) -> Generator[bytes, None, None]:
+        """ Raw chunks of a large file, only the first one unless on_large is 'all' """
+        if self._on_large == 'all':
+            yield from reader.chunks()
+            return
+        _chunk = reader.read_raw()
+        if _chunk is not None:
+            yield _chunk
+
+    def _group_by_shard(
+        self, _map: Union[WocMap, WocObject], keys: List[Union[bytes, str]]
+    ) -> Tuple[Dict[int, Tuple[List[int], List[bytes]]], List[int], Dict[int, str]]:
+        """
+        Encode keys and group them by shard, so each group is read with one batched TCHashDB call.
+        Returns shard id -> (positions, encoded keys), positions of large files
+        and position -> error for malformed keys and bad keys (if raise_on_bad).
+        """
+        in_dtype = _map.dtypes[0] if hasattr(_map, "dtypes") else 'h'
+        _larges = _map.larges if hasattr(_map, "larges") else {}
+
+        _groups: Dict[int, Tuple[List[int], List[bytes]]] = {}
+        _large_pos: List[int] = []
+        _errors: Dict[int, str] = {}
+        for i, key in enumerate(keys):
+            try:
+                _key, hex_str = _encode_key(key, in_dtype)
+                if self._raise_on_bad:
+                    self._check_bad(_key, hex_str, in_dtype)
+            except (KeyError, ValueError) as e:
+                _errors[i] = str(e)
+                continue
+            if hex_str in _larges:
+                _large_pos.append(i)
+                continue
+            _pos, _keys = _groups.setdefault(
+                get_shard(_key, _map.sharding_bits, in_dtype != 'h'), ([], []))
+            _pos.append(i)
+            _keys.append(_key)
+        return _groups, _large_pos, _errors
+
     def iter_values(
         self,
         map_name: str,
@@ -851,35 +2040,93 @@ class WocMapsLocal(WocMapsBase):
         >>> self.get_values('P2c', 'user2589_minicms')
         ['05cf84081b63cda822ee407e688269b494a642de', ...]
         """
-        _bytes, decode_dtype, next_cursor = self._get_tch_bytes(map_name, key)
         if map_name == 'commit.tch':
-            _decoded = [decode_commit(decomp_or_raw(_bytes))]
+            yield decode_commit(decomp_or_raw(self._get_tch_view(map_name, key)))
+            return
         elif map_name == 'tree.tch':
-            _decoded = [decode_tree(decomp_or_raw(_bytes))]
+            yield decode_tree(decomp_or_raw(self._get_tch_view(map_name, key)))
+            return
+
+        _reader = self._open_large(map_name, key)
+        if _reader is None:
+            _bytes, decode_dtype, _ = self._get_tch_bytes(map_name, key)
+            yield from decode_value(_bytes, decode_dtype)
+        elif self._on_large == 'all':
+            yield from _reader
         else:
-            _decoded = decode_value(_bytes, decode_dtype)
+            yield from _reader.read() or ()
 
-        for v in _decoded:
-            yield v
-
-        if next_cursor is None or self._on_large != 'all':
-            return 
-
-        while next_cursor is not None:
-            _bytes, _, next_cursor = self._get_tch_bytes(map_name, key, cursor=next_cursor)
-            for v in decode_value(_bytes, decode_dtype):
-                yield v
+    def _get_values_numpy(
+        self,
+        map_name: str,
+        key: Union[bytes, str],
+    ):
+        """ get_values with format='numpy' """
+        _reader = self._open_large(map_name, key)
+        if _reader is None:
+            _bytes, decode_dtype, _ = self._get_tch_bytes(map_name, key)
+            return decode_value_numpy(_bytes, decode_dtype)
+        if _reader.dtype == 'h' and self._on_large == 'all':
+            # zero-copy, a view of the memory-mapped file
+            return decode_value_numpy(_reader.view(), 'h')
+        _parts = [decode_value_numpy(c, _reader.dtype) for c in self._large_chunks(_reader)]
+        return _concat_numpy(_parts or [decode_value_numpy(b'', _reader.dtype)])
+
+    def _get_values_shalist(
+        self,
+        map_name: str,
+        key: Union[bytes, str],
+    ) -> ShaList:
+        """ get_values with format='shalist' """
+        _map = self._lookup.get(map_name)
+        # objects (commit, tree, blob...) have no dtypes, their values are compressed content
+        out_dtype = _map.dtypes[1] if hasattr(_map, "dtypes") else 'c?'
+        if _map is not None and out_dtype != 'h':
+            raise ValueError(f"Unsupported dtype for format='shalist': {out_dtype}, expected h")
+        _reader = self._open_large(map_name, key)
+        if _reader is None:
+            return ShaList(bytes(self._get_tch_bytes(map_name, key)[0]))
+        if self._on_large == 'all':
+            # zero-copy, a view of the memory-mapped file
+            return ShaList(_reader.view())
+        return ShaList(b''.join(self._large_chunks(_reader)))
+
+    def _cache_key(self, _map: Union[WocMap, WocObject, None], key: Union[bytes, str]) -> Optional[bytes]:
+        """
+        Key of the decoded cache tier: the bytes stored in tch, like the raw tier,
+        so the hex and bytes forms of a key share one entry. None if the key is malformed.
+        """
+        try:
+            return _encode_key(key, _map.dtypes[0] if hasattr(_map, "dtypes") else 'h')[0]
+        except (TypeError, ValueError):
+            return None
 
     def get_values(
         self,
         map_name: str,
         key: Union[bytes, str],
+        format: Literal['list', 'numpy', 'shalist'] = 'list',
     ):
         """Eqivalent to getValues in WoC Perl API.
         >>> self.get_values('P2c', 'user2589_minicms')
         ['05cf84081b63cda822ee407e688269b494a642de', ...]
         """
-        return list(self.iter_values(map_name, key))
+        if format == 'numpy':
+            return self._get_values_numpy(map_name, key)
+        elif format == 'shalist':
+            return self._get_values_shalist(map_name, key)
+        elif format != 'list':
+            raise ValueError(f'Invalid format: {format}, expected one of list, numpy, shalist')
+        _map = self._lookup.get(map_name)
+        _key = self._cache_key(_map, key) if self.cache is not None and hasattr(_map, "dtypes") else None
+        if _key is None:
+            return list(self.iter_values(map_name, key))
+        _ret = self.cache.get_decoded(_map.name, _key)
+        if _ret is _MISSING:
+            _ret = list(self.iter_values(map_name, key))
+            self.cache.put_decoded(_map.name, _key, _ret)
+        # don't let callers modify the cached list
+        return list(_ret)
 
     def _get_pos(
         self,
@@ -899,6 +2146,11 @@ class WocMapsLocal(WocMapsBase):
         else:
             raise ValueError(f'Unsupported object type: {obj}, expected blob')
 
+    def _blob_path(self, key: bytes) -> str:
+        """ Path to the .bin shard of a blob """
+        _map_obj: WocObject = self._lookup['blob.bin']
+        return _map_obj.shards[get_shard(key, _map_obj.sharding_bits, use_fnv_keys=False)].path
+
     # def _show_content_bytes(
     #     self,
     #     obj_name: str,
@@ -962,17 +2214,35 @@ class WocMapsLocal(WocMapsBase):
         >>> self.show_content('tree', '7a374e58c5b9dec5f7508391246c48b73c40d200')
         [('100644', '.gitignore', '8e9e1...'), ...]
         """
+        _map = self._lookup.get(obj_name)
+        _key = None if self.cache is None else self._cache_key(_map, key)
+        if _key is None:
+            return self._show_content(obj_name, key)
+        # git objects are immutable, so their contents never go stale
+        _name = getattr(_map, "name", obj_name)
+        _ret = self.cache.get_decoded(_name, _key)
+        if _ret is _MISSING:
+            _ret = self._show_content(obj_name, key)
+            self.cache.put_decoded(_name, _key, _ret)
+        # don't let callers modify the cached list
+        return list(_ret) if isinstance(_ret, list) else _ret
+
+    def _show_content(
+        self,
+        obj_name: str,
+        key: Union[bytes, str],
+    ):
         if self._is_debug_enabled:
             start_time = time.time_ns()
 
         if obj_name == 'tree':
-            _ret = decode_tree(decomp_or_raw(self._get_tch_bytes(obj_name, key)[0]))
+            _ret = decode_tree(decomp_or_raw(self._get_tch_view(obj_name, key)))
             if self._is_debug_enabled:
                 self._logger.debug(f"decode tree: len={len(_ret)} in {(time.time_ns() - start_time) / 1e6:.2f}ms")
             return _ret
 
         elif obj_name == 'commit':
-            _ret = decode_commit(decomp_or_raw(self._get_tch_bytes(obj_name, key)[0]))
+            _ret = decode_commit(decomp_or_raw(self._get_tch_view(obj_name, key)))
             if self._is_debug_enabled:
                 self._logger.debug(f"decode commit: len={len(_ret)}items in {(time.time_ns() - start_time) / 1e6:.2f}ms")
             return _ret
@@ -984,13 +2254,7 @@ class WocMapsLocal(WocMapsBase):
                 self._logger.debug(f"decode pos: offset={offset} len={length} in {(time.time_ns() - start_time) / 1e6:.2f}ms")
                 start_time = time.time_ns()
 
-            _map_obj = self.config['objects']['blob.bin']
-            shard = get_shard(key, _map_obj['sharding_bits'], use_fnv_keys=False)
-            _path = _map_obj['shards'][shard] if isinstance(_map_obj['shards'][shard], str) else _map_obj['shards'][shard]["path"]
-
-            with open(_path, "rb") as f:
-                f.seek(offset)
-                _out_bin = f.read(length)
+            _out_bin = _BIN_POOL.pread(self._blob_path(key), offset, length)
             if self._is_debug_enabled:
                 self._logger.debug(f"read blob: in {(time.time_ns() - start_time) / 1e6:.2f}ms")
 
@@ -1008,11 +2272,225 @@ class WocMapsLocal(WocMapsBase):
         else:
             raise ValueError(f'Unsupported object type: {obj_name}, expected one of tree, blob, commit, tkns, tag, bdiff')
 
+    def _get_many(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+        decode,
+        fallback,
+        progress: bool,
+        order: Literal['input', 'shard'],
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Tuple[Dict[Union[bytes, str], Any], Dict[Union[bytes, str], str]]:
+        """
+        Fetch values of many keys, grouped by shard with one TCHashDB.get_many call per group.
+        `decode(positions, found_keys, values, errors)` decodes the found values of one group in place,
+        found_keys are the encoded keys at those positions;
+        `fallback(key)` handles large files one by one.
+        With a worker, keys of other workers are left out, see partition_keys.
+        """
+        if order not in ('input', 'shard'):
+            raise ValueError(f'Invalid order: {order}, expected one of input, shard')
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+
+        keys = keys if isinstance(keys, list) else list(keys)
+        if worker is not None:
+            keys = self.partition_keys(map_name, keys, worker)
+        _values: List[Any] = [None] * len(keys)
+        _groups, _fallbacks, _errors = self._group_by_shard(_map, keys)
+        _done: List[int] = list(_errors)  # positions in the order they are resolved
+
+        _shards = _groups.items()
+        if progress:
+            from tqdm import tqdm
+
+            _shards = tqdm(_shards, total=len(_groups), desc=map_name)
+        for _shard, (_pos, _keys) in _shards:
+            _woc_file = _map.shards[_shard]
+            assert _woc_file, f"shard {_shard} not found at {_woc_file}"
+            _tch = self._get_tch(_map, _woc_file)
+            _found, _found_keys = [], []
+            for i, _key, v in zip(_pos, _keys, _tch.get_many(_keys)):
+                if v is None:
+                    _errors[i] = f'Key {_key.hex()} not found in {_woc_file.path}'
+                else:
+                    _values[i] = v
+                    _found.append(i)
+                    _found_keys.append(_key)
+            decode(_found, _found_keys, _values, _errors)
+            _done.extend(_pos)
+
+        for i in _fallbacks:
+            try:
+                _values[i] = fallback(keys[i])
+            except (KeyError, ValueError) as e:
+                _errors[i] = str(e)
+            _done.append(i)
+
+        results, errors = {}, {}
+        for i in (range(len(keys)) if order == 'input' else _done):
+            if i in _errors:
+                errors[keys[i]] = _errors[i]
+            else:
+                results[keys[i]] = _values[i]
+        return results, errors
+
+    def get_values_many(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+        progress: bool = False,
+        order: Literal['input', 'shard'] = 'input',
+        format: Literal['list', 'numpy', 'shalist'] = 'list',
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Tuple[Dict[Union[bytes, str], Any], Dict[Union[bytes, str], str]]:
+        """
+        Eqivalent to getValues in WoC Perl API but fetch multiple keys at once.
+        Returns (results, errors) like WocMapsRemote.get_values_many.
+        With worker='k/n', only keys of worker k are looked up, see partition_keys.
+
+        >>> self.get_values_many('c2p', ['e4af89166a17785c1d741b8b1d5775f3223f510f', '0' * 40])
+        ({'e4af89166a17785c1d741b8b1d5775f3223f510f': ['W4D3_news']}, {'000...': 'Key 000... not found in ...'})
+        """
+        if format == 'numpy':
+            _decode_one = decode_value_numpy
+            _import_numpy()  # fail early
+        elif format == 'shalist':
+            _decode_one = lambda v, dtype: decode_value(v, dtype, lazy=True)
+        elif format == 'list':
+            _decode_one = lambda v, dtype: _as_list(decode_value(v, dtype))
+        else:
+            raise ValueError(f'Invalid format: {format}, expected one of list, numpy, shalist')
+        _map = self._lookup.get(map_name)
+        out_dtype = _map.dtypes[1] if hasattr(_map, "dtypes") else 'c?'
+        if format == 'numpy' and _map is not None and out_dtype not in ('h', 'r', 'sh', 'cs3'):
+            raise ValueError(f"Unsupported dtype for format='numpy': {out_dtype}, expected one of h, r, sh, cs3")
+        if format == 'shalist' and _map is not None and out_dtype != 'h':
+            raise ValueError(f"Unsupported dtype for format='shalist': {out_dtype}, expected h")
+
+        def _decode(positions, found_keys, values, errors):
+            for i in positions:
+                try:
+                    values[i] = _decode_one(values[i], out_dtype)
+                except ValueError as e:
+                    errors[i] = str(e)
+
+        return self._get_many(map_name, keys, _decode, lambda k: self.get_values(map_name, k, format),
+                              progress, order, worker)
+
+    def show_content_many(
+        self,
+        obj_name: str,
+        keys: Iterable[Union[bytes, str]],
+        progress: bool = False,
+        order: Literal['input', 'shard'] = 'input',
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Tuple[Dict[Union[bytes, str], Any], Dict[Union[bytes, str], str]]:
+        """
+        Eqivalent to showCnt in WoC Perl API but fetch multiple keys at once.
+        Returns (results, errors) like WocMapsRemote.show_content_many.
+        With worker='k/n', only keys of worker k are looked up, see partition_keys.
+        Blobs are read in offset order from pooled .bin descriptors, neighbouring blobs in one read.
+
+        >>> self.show_content_many('tree', ['f1b66dcca490b5c4455af319bc961a34f69c72c2'])
+        ({'f1b66dcca490b5c4455af319bc961a34f69c72c2': [('100644', 'README.md', '05fe634ca4c8386349ac519f899145c75fff4169'), ...]}, {})
+        """
+        if obj_name == 'tree':
+            _decode_one = lambda v: decode_tree(decomp_or_raw(v))
+        elif obj_name == 'commit':
+            _decode_one = lambda v: decode_commit(decomp_or_raw(v))
+        elif obj_name == 'tag':
+            _decode_one = lambda v: decode_tag(decomp_or_raw(v))
+        elif obj_name != 'blob':
+            raise ValueError(f'Unsupported object type: {obj_name}, expected one of tree, blob, commit, tag')
+        _arena = DecompArena()
+
+        def _decode(positions, found_keys, values, errors):
+            if obj_name in ('tree', 'commit'):
+                _parse = decode_tree if obj_name == 'tree' else decode_commit
+                for i, v in zip(positions, decomp_many([values[i] for i in positions], _arena, True)):
+                    try:
+                        values[i] = _parse(v)
+                    except ValueError as e:
+                        errors[i] = str(e)
+                return
+            for i in positions:
+                try:
+                    values[i] = _decode_one(values[i])
+                except ValueError as e:
+                    errors[i] = str(e)
+
+        def _decode_blobs(positions, found_keys, values, errors):
+            # .bin path -> [(offset, length, position)]
+            _reads: Dict[str, List[Tuple[int, int, int]]] = {}
+            for i, _key in zip(positions, found_keys):
+                _pos = unber(values[i])
+                if len(_pos) != 2:
+                    errors[i] = f"Invalid (offset, length) pair: {_pos}"
+                    continue
+                _path = self._blob_path(_key)
+                _reads.setdefault(_path, []).append((_pos[0], _pos[1], i))
+            for _path, _items in _reads.items():
+                _items.sort()
+                _spans = _coalesce_ranges(_items)
+                if self._blob_fadvise and len(_spans) > 1:
+                    _BIN_POOL.fadvise(_path, ((_start, _len) for _start, _len, _ in _spans))
+                for _start, _len, _span_items in _spans:
+                    _buf = memoryview(_BIN_POOL.pread(_path, _start, _len))
+                    # the same blob asked for twice is decompressed once
+                    _ranges = list(dict.fromkeys((offset, length) for offset, length, _ in _span_items))
+                    _blobs = decomp_many([_buf[offset - _start:offset - _start + length]
+                                          for offset, length in _ranges], _arena, True)
+                    _decoded = {r: decode_str(bytes(v)) for r, v in zip(_ranges, _blobs)}
+                    for offset, length, i in _span_items:
+                        values[i] = _decoded[offset, length]
+
+        return self._get_many(obj_name, keys, _decode_blobs if obj_name == 'blob' else _decode,
+                              lambda k: self.show_content(obj_name, k), progress, order, worker)
+
+    def exists_many(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+    ) -> List[bool]:
+        """
+        Check which keys have values in a map, without reading the values.
+        A key exists if get_values / show_content would not raise KeyError for it.
+
+        >>> self.exists_many('b2c', ['05fe634ca4c8386349ac519f899145c75fff4169', '0' * 40])
+        [True, False]
+        """
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+
+        keys = keys if isinstance(keys, list) else list(keys)
+        # malformed and bad keys have no value
+        _groups, _large_pos, _ = self._group_by_shard(_map, keys)
+        _res: List[bool] = [False] * len(keys)
+        for i in _large_pos:
+            _res[i] = self._on_large != 'ignore'
+
+        for _shard, (_pos, _keys) in _groups.items():
+            _woc_file = _map.shards[_shard]
+            assert _woc_file, f"shard {_shard} not found at {_woc_file}"
+            for i, v in zip(_pos, self._get_tch(_map, _woc_file).contains_many(_keys)):
+                _res[i] = v
+        return _res
+
     def count(
         self, map_name
     ) -> int:
         """
         Count the number of keys in a map (# of larges + # of tch keys)
+        Record counts stored in the profile by woc.detect are used while the size of a shard
+        is unchanged; other shards are counted from their headers in parallel, without opening them.
         """
         if self._is_debug_enabled:
             start_time = time.time_ns()
@@ -1024,22 +2502,181 @@ class WocMapsLocal(WocMapsBase):
                 f'expect one of {", ".join(self._lookup.keys())}')
 
         _count = len(_map.larges) if hasattr(_map, "larges") else 0
+        _stale = []
         for _shard in _map.shards:
-            _tch = get_tch(_shard.path)
-            _count += len(_tch)
+            if _shard.records is not None and _shard.size == os.path.getsize(_shard.path):
+                _count += _shard.records
+            else:
+                _stale.append(_shard.path)
+        if _stale:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(min(len(_stale), 32)) as _pool:
+                _count += sum(s["records"] for s in _pool.map(tch_stats, _stale))
 
         if self._is_debug_enabled:
-            self._logger.debug(f'count: len={_count} shards={len(_map["shards"])} '
-                         f'larges={len(_map["larges"])} in {(time.time_ns() - start_time) / 1e6:.2f}ms')
+            self._logger.debug(f'count: len={_count} shards={len(_map.shards)} stale={len(_stale)} '
+                         f'larges={len(getattr(_map, "larges", ()))} in {(time.time_ns() - start_time) / 1e6:.2f}ms')
         return _count
 
+    def _iter_shard(
+        self,
+        _map: Union[WocMap, WocObject],
+        woc_file: WocFile,
+        partition: Optional[Tuple[int, int]],
+        values: bool,
+    ):
+        """
+        Iterate over keys or (key, value) pairs of one shard of a map.
+        With partition=(i, n), the shard is split into n ranges and only the i-th is read.
+        """
+        _tch = self._get_tch(_map, woc_file)
+        if partition is None:
+            return _tch.items() if values else iter(_tch)
+        i, n = partition
+        _bounds = _tch.split(n)
+        if values:
+            return _tch.items_range(_bounds[i], _bounds[i + 1])
+        return _tch.keys_range(_bounds[i], _bounds[i + 1])
+
+    def _iter_shards(
+        self,
+        _map: Union[WocMap, WocObject],
+        partition: Optional[Tuple[int, int]],
+        values: bool,
+        worker: Optional[Tuple[int, int]] = None,
+    ):
+        """
+        Iterate over keys or (key, value) pairs of all shards of a map.
+        With partition=(i, n), every shard is split into n ranges and only the i-th is read.
+        With worker=(k, n), only the shards of worker k are read, see worker_shards.
+        """
+        for j, _woc_file in enumerate(_map.shards):
+            if worker is None or j % worker[1] == worker[0]:
+                yield from self._iter_shard(_map, _woc_file, partition, values)
+
+    def _large_shard(self, _map: WocMap, hex_str: str) -> int:
+        """ Shard of the key of a large file, the hex of a SHA or of the fnvhash of the key """
+        p = int(hex_str[:2], 16) if _map.dtypes[0] == 'h' else int(hex_str, 16)
+        return p & ((1 << _map.sharding_bits) - 1)
+
+    def key_worker(self, map_name: str, key: Union[bytes, str], n: int) -> int:
+        """
+        Worker (of n) that a key of a map is assigned to: the worker of its shard.
+
+        >>> self.key_worker('c2p', 'e4af89166a17785c1d741b8b1d5775f3223f510f', 8)
+        4
+        """
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+        in_dtype = _map.dtypes[0] if hasattr(_map, "dtypes") else 'h'
+        _key, _ = _encode_key(key, in_dtype)
+        return get_shard(_key, _map.sharding_bits, in_dtype != 'h') % n
+
+    def partition_keys(
+        self,
+        map_name: str,
+        keys: Iterable[Union[bytes, str]],
+        worker: Union[str, Tuple[int, int]],
+    ) -> List[Union[bytes, str]]:
+        """
+        Keys of a list assigned to a worker, in their order. Invalid keys go to worker 0,
+        so every key of the list is handled by exactly one worker.
+
+        >>> self.partition_keys('c2p', keys, '0/4')  # on the first of 4 nodes
+        """
+        k, n = parse_worker(worker)
+        _ret = []
+        for key in keys:
+            try:
+                _worker = self.key_worker(map_name, key, n)
+            except ValueError:
+                _worker = 0
+            if _worker == k:
+                _ret.append(key)
+        return _ret
+
+    def _item_decoder(self, _map: Union[WocMap, WocObject]):
+        """
+        Get the function decoding values of a map, as all_items returns them
+        """
+        if hasattr(_map, "dtypes"):
+            out_dtype = _map.dtypes[1]
+            return lambda v: _as_list(decode_value(v, out_dtype))
+        elif _map.name == 'commit.tch':
+            return lambda v: decode_commit(decomp_or_raw(v))
+        elif _map.name == 'tree.tch':
+            return lambda v: decode_tree(decomp_or_raw(v))
+        elif _map.name == 'tag.tch':
+            return lambda v: decode_tag(decomp_or_raw(v))
+        elif _map.name == 'sha1.blob.tch':
+            return lambda v: tuple(unber(v))
+        raise ValueError(f'Unsupported object type: {_map.name}, expected one of '
+                         'commit.tch, tree.tch, tag.tch, sha1.blob.tch')
+
+    def _iter_decoded(self, _map: Union[WocMap, WocObject], items):
+        """
+        Decode (key, value) pairs as all_items returns them.
+        Commits and trees are decompressed in batches by decomp_many.
+        """
+        if _map.name not in ('commit.tch', 'tree.tch'):
+            _decode = self._item_decoder(_map)
+            for key, value in items:
+                yield key, _decode(value)
+            return
+        _parse = decode_commit if _map.name == 'commit.tch' else decode_tree
+        _arena = DecompArena()
+        items = iter(items)
+        while True:
+            _batch = list(islice(items, _DECOMP_BATCH))
+            if not _batch:
+                return
+            for (key, _), value in zip(_batch, decomp_many([v for _, v in _batch], _arena, True)):
+                yield key, _parse(value)
+
+    def _iter_large_items(
+        self,
+        _map: Union[WocMap, WocObject],
+        partition: Optional[Tuple[int, int]],
+        worker: Optional[Tuple[int, int]] = None,
+    ):
+        """
+        Iterate over decoded (key, value) pairs of large files of a map, respecting on_large.
+        With partition=(i, n), large files are dealt round-robin and only the i-th share is read.
+        With worker=(k, n), only large files of the shards of worker k are read.
+        """
+        if self._on_large == 'ignore' or not hasattr(_map, "larges"):
+            return
+        out_dtype = _map.dtypes[1]
+        for j, (key, _woc_file) in enumerate(_map.larges.items()):
+            if partition is not None and j % partition[1] != partition[0]:
+                continue
+            if worker is not None and self._large_shard(_map, key) % worker[1] != worker[0]:
+                continue
+            _reader = self._large_reader(_woc_file, out_dtype)
+            if self._on_large == 'all':
+                _values = list(_reader)
+            else:
+                _values = _reader.read() or []
+            yield bytes.fromhex(key), _values
+
     def all_keys(
         self,
         map_name: str,
+        partition: Optional[Tuple[int, int]] = None,
+        worker: Union[str, Tuple[int, int], None] = None,
     ) -> Generator[bytes, None, None]:
         """
         Iterate over all keys in a map.
 
+        :param partition: (i, n) to iterate only the i-th of n disjoint parts of the map,
+                          so n processes or threads can scan it in parallel.
+        :param worker: 'k/n' or (k, n) to iterate only the shards and large files of worker k,
+                       see worker_shards. Unlike partition, each worker opens only its own shards.
+
         >>> for key in self.iter_map('P2c'):
         ...     print(key)  # hash or encoded string
         """
@@ -1048,11 +2685,197 @@ class WocMapsLocal(WocMapsBase):
         except KeyError:
             raise KeyError(f'Invalid map name: {map_name}, '
                 f'expected one of {", ".join(self._lookup.keys())}')
+        _check_partition(partition)
+        worker = parse_worker(worker)
 
-        for _tch in _map.shards:
-            _tch = get_tch(_tch.path)
-            for key in _tch:
-                yield key
+        yield from self._iter_shards(_map, partition, False, worker)
         if self._on_large != 'ignore' and hasattr(_map, "larges"):
-            for key in _map.larges: # convert to bytes
-                yield bytes.fromhex(key)
+            for j, key in enumerate(_map.larges): # convert to bytes
+                if partition is not None and j % partition[1] != partition[0]:
+                    continue
+                if worker is None or self._large_shard(_map, key) % worker[1] == worker[0]:
+                    yield bytes.fromhex(key)
+
+    def all_items(
+        self,
+        map_name: str,
+        partition: Optional[Tuple[int, int]] = None,
+        worker: Union[str, Tuple[int, int], None] = None,
+    ) -> Generator[Tuple[bytes, Any], None, None]:
+        """
+        Iterate over all (key, value) pairs in a map, in storage order.
+        Each record is read once, unlike all_keys followed by get_values.
+        Values of maps are decoded as get_values does; commits, trees and tags
+        as show_content does; blobs are (offset, length) in the blob .bin file.
+
+        :param partition: (i, n) to iterate only the i-th of n disjoint parts of the map,
+                          so n processes or threads can scan it in parallel.
+        :param worker: 'k/n' or (k, n) to iterate only the shards and large files of worker k,
+                       see all_keys.
+
+        >>> for key, value in self.all_items('c2p'):
+        ...     print(key.hex(), value)
+        """
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+
+        self._item_decoder(_map)  # fail early on unsupported maps
+        _check_partition(partition)
+        worker = parse_worker(worker)
+
+        yield from self._iter_decoded(_map, self._iter_shards(_map, partition, True, worker))
+        yield from self._iter_large_items(_map, partition, worker)
+
+    def scan_objects(
+        self,
+        obj_name: Literal['commit', 'tree', 'tag', 'blob'],
+        worker: Union[str, Tuple[int, int], None] = None,
+        progress: bool = False,
+        block_size: int = WocBinScanBlockSize,
+    ) -> Generator[Tuple[bytes, Any], None, None]:
+        """
+        Iterate over all (sha, content) of git objects in the order of the .idx/.bin files,
+        without a TCH lookup or a random read per object. Contents are decoded as show_content
+        does, decompressed in batches by decomp_many.
+
+        :param worker: 'k/n' or (k, n) to scan only the shards of worker k, see worker_shards;
+                       e.g. (j, len(shards)) scans shard j, one process per shard.
+        :param block_size: bytes of .bin files read at once
+
+        >>> for sha, (tree, parents, author, committer, msg) in self.scan_objects('commit'):
+        ...     print(sha.hex(), msg)
+        """
+        if obj_name == 'commit':
+            _parse = decode_commit
+        elif obj_name == 'tree':
+            _parse = decode_tree
+        elif obj_name == 'tag':
+            _parse = lambda v: decode_tag(bytes(v))
+        elif obj_name == 'blob':
+            _parse = lambda v: decode_str(bytes(v))
+        else:
+            raise ValueError(f'Unsupported object type: {obj_name}, expected one of commit, tree, tag, blob')
+        try:
+            _idx: WocObject = self._lookup[f'{obj_name}.idx']
+            _bin: WocObject = self._lookup[f'{obj_name}.bin']
+        except KeyError as e:
+            raise KeyError(f'No .idx/.bin files of {obj_name} in the profile: {e}')
+        _shards = range(len(_idx.shards)) if worker is None else worker_shards(len(_idx.shards), worker)
+        _arena = DecompArena()
+        if progress:
+            from tqdm import tqdm
+
+            _shards = tqdm(_shards, desc=obj_name)
+        for j in _shards:
+            _idx_file, _bin_file = _idx.shards[j], _bin.shards[j] if j < len(_bin.shards) else None
+            if not _idx_file or not _bin_file:
+                raise KeyError(f'Shard {j} of {obj_name}.idx/.bin not found in the profile')
+            items = scan_idx_bin(_idx_file.path, _bin_file.path, block_size)
+            while True:
+                _batch = list(islice(items, _DECOMP_BATCH))
+                if not _batch:
+                    break
+                for (sha, _), value in zip(_batch, decomp_many([v for _, v in _batch], _arena, True)):
+                    yield sha, _parse(value)
+
+    def map_reduce(
+        self,
+        map_name: str,
+        mapper,
+        reducer,
+        workers: Optional[int] = None,
+        progress: bool = False,
+    ):
+        """
+        Aggregate a whole map with a pool of worker processes.
+
+        Shards are split into byte ranges once in this process (see TCHashDB.split),
+        and the ranges are handed out as tasks to forked workers. Each task streams the decoded (key, value) pairs through `mapper(key, value)` and
+        folds the results with `reducer(acc, result)`; the partial results of all tasks are
+        merged with `reducer` again, so it must be associative and accept its own output.
+        Mapper results of None are skipped.
+
+        >>> self.map_reduce('c2p', lambda k, v: len(v), operator.add, workers=8)
+        123456
+        """
+        global _MAP_REDUCE_JOB
+        import multiprocessing
+        from concurrent.futures import ThreadPoolExecutor
+        from tqdm import tqdm
+
+        try:
+            _map: WocMap | WocObject  = self._lookup[map_name]
+        except KeyError:
+            raise KeyError(f'Invalid map name: {map_name}, '
+                f'expected one of {", ".join(self._lookup.keys())}')
+        self._item_decoder(_map)  # fail early on unsupported maps
+        workers = workers or os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f'Number of workers must be positive, got {workers}')
+
+        # aim at a few tasks per worker so that big shards don't leave workers idle;
+        # splitting walks keys up to every cut, so it is done here once and not in each task
+        _tasks = []
+        _parts = -(-workers * 4 // len(_map.shards)) if workers > 1 else 1
+        if _parts == 1:
+            _tasks.extend(('shard', j, None, None) for j in range(len(_map.shards)))
+        else:
+            with ThreadPoolExecutor(min(workers, len(_map.shards))) as _executor:
+                _splits = _executor.map(
+                    lambda _file: self._get_tch(_map, _file).split(_parts), _map.shards)
+                for j, _bounds in enumerate(_splits):
+                    _tasks.extend(('shard', j, _bounds[i], _bounds[i + 1]) for i in range(_parts))
+        if self._on_large != 'ignore' and getattr(_map, "larges", None):
+            _parts = min(len(_map.larges), workers * 4)
+            _tasks.extend(('large', None, i, _parts) for i in range(_parts))
+
+        _pool = None
+        _job = (self, _map, mapper, reducer)
+        # a mapper may run map_reduce itself, leave the outer job in place afterwards
+        _outer_job, _MAP_REDUCE_JOB = _MAP_REDUCE_JOB, _job
+        try:
+            if workers == 1:
+                _results = map(partial(_map_reduce_task, job=_job), _tasks)
+            else:
+                # workers inherit the job by fork, so mapper and reducer need not be picklable;
+                # TCH handles are reopened in the workers by _after_fork
+                _pool = multiprocessing.get_context('fork').Pool(min(workers, len(_tasks)) or 1)
+                _results = _pool.imap_unordered(_map_reduce_task, _tasks)
+            acc = None
+            for _partial in tqdm(_results, total=len(_tasks), desc=map_name, disable=not progress):
+                if _partial is not None:
+                    acc = _partial if acc is None else reducer(acc, _partial)
+            return acc
+        finally:
+            _MAP_REDUCE_JOB = _outer_job
+            if _pool is not None:
+                _pool.terminate()
+                _pool.join()
+
+_MAP_REDUCE_JOB = None  # (WocMapsLocal, WocMap | WocObject, mapper, reducer) of the running map_reduce
+
+def _map_reduce_task(task, job=None):
+    """
+    Fold one task of WocMapsLocal.map_reduce, return None if nothing is mapped.
+    Forked workers take the job from _MAP_REDUCE_JOB, as mappers needn't be picklable.
+    """
+    woc, _map, mapper, reducer = job or _MAP_REDUCE_JOB
+    kind, j, a, b = task
+    if kind == 'shard':
+        # (start, end) of a range returned by TCHashDB.split, or the whole shard
+        if a is None:
+            _raw = woc._iter_shard(_map, _map.shards[j], None, True)
+        else:
+            _raw = woc._get_tch(_map, _map.shards[j]).items_range(a, b)
+        _items = woc._iter_decoded(_map, _raw)
+    else:
+        _items = woc._iter_large_items(_map, (a, b))
+    acc = None
+    for key, value in _items:
+        _result = mapper(key, value)
+        if _result is not None:
+            acc = _result if acc is None else reducer(acc, _result)
+    return acc
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import collections.abc
+import hashlib
+import json
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+from typing import Iterator, Optional, Tuple
+
+from .base import WocCachePath
+
+_logger = logging.getLogger(__name__)
+
+_MAGIC = b"WOCPROF1"
+_HEADER = struct.Struct("<8sQ")  # magic, length of the marshalled (stamp, skeleton)
+
+
+class LazyLarges(collections.abc.Mapping):
+    """
+    `larges` of a map in a compiled profile, unmarshalled from the mapped file on first use.
+
+    Looking up one key still loads all larges of the map, but maps never used cost nothing.
+    """
+
+    __slots__ = ("_buf", "_offset", "_length", "_data")
+
+    def __init__(self, buf: mmap.mmap, offset: int, length: int):
+        self._buf = buf
+        self._offset = offset
+        self._length = length
+        self._data = None
+
+    def _load(self) -> dict:
+        if self._data is None:
+            self._data = marshal.loads(
+                self._buf[self._offset : self._offset + self._length]
+            )
+            self._buf = None
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._load()
+
+    def __iter__(self) -> Iterator:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __repr__(self) -> str:
+        if self._data is None:
+            return f"LazyLarges(<{self._length} bytes not loaded>)"
+        return f"LazyLarges({self._data!r})"
+
+
+def compile_profile(config: dict, stamp: Tuple = ()) -> bytes:
+    """
+    Serialize a profile so that it loads without parsing JSON.
+
+    The larges of every map are stored apart, (offset, length) take their place in the skeleton;
+    JSON has no tuples, so they can't be mistaken for values.
+
+    :param stamp: identifies the source of the profile, returned by load_compiled
+    """
+    _blobs, _pos = [], 0
+    skeleton = dict(config)
+    skeleton["maps"] = {}
+    for _name, _entries in config.get("maps", {}).items():
+        skeleton["maps"][_name] = []
+        for _m in _entries:
+            if _m.get("larges"):
+                _blob = marshal.dumps(dict(_m["larges"]))
+                _m = {**_m, "larges": (_pos, len(_blob))}
+                _blobs.append(_blob)
+                _pos += len(_blob)
+            skeleton["maps"][_name].append(_m)
+    _head = marshal.dumps((tuple(stamp), skeleton))
+    return _HEADER.pack(_MAGIC, len(_head)) + _head + b"".join(_blobs)
+
+
+def load_compiled(path: str) -> Tuple[Tuple, dict]:
+    """
+    Map a compiled profile, larges are loaded lazily from the mapping.
+
+    :return: the stamp and the profile
+    :raises ValueError: if the file is not a compiled profile
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"Not a compiled profile: {path}")
+        _buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _magic, _len = _HEADER.unpack_from(_buf)
+    if _magic != _MAGIC:
+        raise ValueError(f"Not a compiled profile: {path}")
+    _base = _HEADER.size + _len
+    stamp, config = marshal.loads(_buf[_HEADER.size : _base])
+    for _entries in config.get("maps", {}).values():
+        for _m in _entries:
+            if isinstance(_m.get("larges"), tuple):
+                _m["larges"] = LazyLarges(_buf, _base + _m["larges"][0], _m["larges"][1])
+    return stamp, config
+
+
+def _cache_name(path: str) -> str:
+    """Name of the compiled profile of a wocprofile.json, marshal formats differ across Pythons"""
+    _digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+    return f"{_digest}.py{sys.version_info[0]}{sys.version_info[1]}.wocprof"
+
+
+def load_profile(path: str, cache_dir: Optional[str] = WocCachePath) -> dict:
+    """
+    Load a wocprofile.json, from its compiled form in cache_dir if the JSON is unchanged.
+
+    The JSON is unchanged if its path, size and mtime are the same;
+    otherwise it is parsed and compiled for the next time.
+
+    :param cache_dir: directory of compiled profiles, None to always parse the JSON
+    """
+    if cache_dir is None:
+        with open(path) as f:
+            return json.load(f)
+    _path = os.path.abspath(path)
+    _stat = os.stat(_path)
+    _stamp = (_path, _stat.st_mtime_ns, _stat.st_size)
+    _cache = os.path.join(cache_dir, _cache_name(_path))
+    try:
+        stamp, config = load_compiled(_cache)
+        if stamp == _stamp:
+            return config
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        _logger.warning(f"Ignoring unreadable compiled profile {_cache}: {e}")
+
+    with open(_path) as f:
+        config = json.load(f)
+    _tmp = f"{_cache}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(_tmp, "wb") as f:
+            f.write(compile_profile(config, _stamp))
+        os.replace(_tmp, _cache)
+    except OSError as e:
+        _logger.debug(f"Failed to write compiled profile {_cache}: {e}")
+    finally:
+        if os.path.exists(_tmp):
+            os.remove(_tmp)
+    return config
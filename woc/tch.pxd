@@ -1,16 +1,49 @@
 # cython: language_level=3str, wraparound=False, boundscheck=False, nonecheck=False, profile=True, linetrace=True
 
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from cpython.pythread cimport PyThread_type_lock
+
+cdef extern from 'tcutil.h':
+    ctypedef struct TCXSTR:  # type of structure for an extensible string object
+        pass
+
 cdef extern from 'tchdb.h':
     ctypedef struct TCHDB:  # type of structure for a hash database
-        pass
+        uint64_t bnum  # number of the bucket array
+        uint8_t apow  # power of record alignment
+        uint64_t fsiz  # size of the database file
+        uint64_t frec  # offset of the first record
+        uint64_t iter  # offset of the iterator
+        uint32_t *ba32  # 32-bit bucket array
+        uint64_t *ba64  # 64-bit bucket array
 
 cdef class TCHashDB:
     cdef TCHDB* _db
+    cdef PyThread_type_lock _iter_lock
+    cdef dict _splits
     cdef str filename
+    cdef readonly bint thread_safe
+    cdef readonly uint64_t hits
+    cdef readonly uint64_t misses
 
     """Object representing a Tokyocabinet Hash table"""
+    cpdef list split(self, int n)
+    cdef bint _iternext(self, uint64_t *cursor, TCXSTR *kxstr, TCXSTR *vxstr)
+    cdef void _iterinit(self) except *
     cpdef bytes get(self, bytes key)
+    cpdef object get_into(self, bytes key, bytearray buf)
+    cdef list _get_batch(self, list keys, object default)
+    cpdef list get_many(self, keys, object default=*)
+    cpdef int get_many_into(self, keys, dict out) except -1
+    cpdef int value_size(self, bytes key) except -1
+    cpdef bint contains(self, bytes key)
+    cpdef list value_size_many(self, keys)
+    cpdef list contains_many(self, keys)
     cpdef void put(self, bytes key, bytes value) except *
+    cpdef Py_ssize_t put_many(self, items, bint append=*, bint asynchronous=*) except -1
+    cpdef void begin(self) except *
+    cpdef void commit(self) except *
+    cpdef void abort(self) except *
     cpdef void delete(self, bytes key) except *
     cpdef void drop(self) except *
     cpdef void close(self) except *
@@ -1,19 +1,99 @@
-from typing import Iterator
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")
 
 class TCHashDB:
     """Object representing a TokyoCabinet Hash table"""
 
-    def __init__(self, path: str, ro: bool = False) -> None:
+    thread_safe: bool
+    """Whether the handle is guarded by TokyoCabinet's mutex and releases the GIL on reads."""
+
+    def __init__(
+        self,
+        path: str,
+        ro: bool = False,
+        thread_safe: bool = False,
+        xmsiz: int = -1,
+        rcnum: int = 0,
+        dfunit: int = 0,
+        bnum: int = -1,
+        apow: int = -1,
+        fpow: int = -1,
+        opts: int = 0,
+        truncate: bool = False,
+    ) -> None:
         """
         Create a new TokyoCabinet hash table object.
 
         :param path: path to the database file
         :param ro: if True, open in lock-free read-only mode; if False, lock and open in write mode (create if not exists)
+        :param thread_safe: if True, enable TokyoCabinet's mutex so the handle can be shared by threads,
+                            and release the GIL in get, get_many, get_many_into and iteration
+        :param xmsiz: size of the extra mapped memory in bytes; negative keeps the default (64MiB),
+                      0 maps the bucket array only. Readers never map more than the file size.
+        :param rcnum: maximum number of records kept in the record cache, 0 disables it
+        :param dfunit: unit step of auto defragmentation, 0 disables it
+        :param bnum: number of buckets of the hash table, only applied when the file is created
+        :param apow: record alignment as a power of 2, only applied when the file is created
+        :param fpow: maximum number of free block pool elements as a power of 2, only applied when the file is created
+        :param opts: tuning options (HDBTLARGE, HDBTDEFLATE, ...), only applied when the file is created
+        :param truncate: if True and not ro, truncate the file on open
         :raises OSError: if the database cannot be opened
         """
         ...
 
     def __iter__(self) -> "Iterator[bytes]": ...
+    def items(self) -> "Iterator[Tuple[bytes, bytes]]":
+        """
+        Iterate over all (key, value) pairs in storage order.
+
+        Cheaper than iterating keys and calling get, as each record is read once.
+        Shares the iterator with __iter__, so don't interleave the two on one handle.
+
+        :raises OSError: if the iterator cannot be initialized
+        """
+        ...
+
+    def split(self, n: int) -> "List[int]":
+        """
+        Split the records into n ranges of similar sizes that can be scanned in parallel.
+
+        Ranges can be scanned by separate processes or by threads sharing this handle.
+        Ranges hold similar numbers of bytes, each bound is the first record at or after
+        an equal cut of the file, so they are the same for every handle of an unchanged file.
+        Finding them reads the bucket array, then walks record by record from the last
+        bucket head before each cut. Heads cluster at the start of the file once records
+        outnumber buckets, so on such files the walk reads the keys of most of the file,
+        which may take longer than scanning one range. Handles opened read-only remember
+        the bounds; split once and hand the bounds to parallel readers rather than
+        splitting in each of them.
+
+        :param n: number of ranges
+        :return: n + 1 file offsets, range i is [bounds[i], bounds[i + 1])
+        :raises ValueError: if n is not positive
+        """
+        ...
+
+    def keys_range(self, start: int, end: int) -> "Iterator[bytes]":
+        """
+        Iterate over the keys of records stored in [start, end) of the file.
+
+        Has its own cursor, so it doesn't interfere with __iter__, items or other ranges.
+
+        :param start: a bound returned by split
+        :param end: a later bound returned by split
+        :raises ValueError: if the range is outside of the records
+        """
+        ...
+
+    def items_range(self, start: int, end: int) -> "Iterator[Tuple[bytes, bytes]]":
+        """
+        Iterate over the (key, value) pairs of records stored in [start, end) of the file.
+
+        See keys_range.
+        """
+        ...
+
     def get(self, key: bytes) -> bytes:
         """
         Get a record.
@@ -23,6 +103,83 @@ class TCHashDB:
         """
         ...
 
+    def get_into(self, key: bytes, buf: bytearray) -> memoryview:
+        """
+        Get a record into a reusable buffer, without allocating a new bytes object.
+
+        The buffer is grown to fit the value, which fails with BufferError if a view
+        of it is still alive, so release previously returned views before reusing it.
+
+        :param key: key to look up
+        :param buf: buffer to write the value into
+        :return: a view of buf holding the value
+        :raises KeyError: if the key is not found
+        """
+        ...
+
+    hits: int
+    """Number of keys found by get / get_many / get_many_into since the database was opened."""
+    misses: int
+    """Number of keys not found by get / get_many / get_many_into since the database was opened."""
+
+    def get_many(
+        self, keys: "Iterable[bytes]", default: Optional[T] = None
+    ) -> "List[Union[bytes, T]]":
+        """
+        Get multiple records in one call, without raising on missing keys.
+
+        :param keys: keys to look up
+        :param default: value placed in the result for keys not found
+        :return: values in the same order as keys, `default` for misses
+        """
+        ...
+
+    def get_many_into(self, keys: "Iterable[bytes]", out: "Dict[bytes, bytes]") -> int:
+        """
+        Get multiple records and store the found ones into `out`.
+
+        Missing keys are skipped.
+
+        :param keys: keys to look up
+        :param out: dictionary to store key -> value pairs into
+        :return: number of keys found
+        """
+        ...
+
+    def value_size(self, key: bytes) -> int:
+        """
+        Get the size of a record's value without reading it.
+
+        :raises KeyError: if the key is not found
+        """
+        ...
+
+    def contains(self, key: bytes) -> bool:
+        """
+        Check whether a key exists without reading its value.
+
+        Unlike get, it does not update hits / misses.
+        """
+        ...
+
+    def value_size_many(self, keys: "Iterable[bytes]") -> "List[int]":
+        """
+        Get the value sizes of multiple records in one call.
+
+        :param keys: keys to look up
+        :return: sizes in the same order as keys, -1 for missing keys
+        """
+        ...
+
+    def contains_many(self, keys: "Iterable[bytes]") -> "List[bool]":
+        """
+        Check whether multiple keys exist in one call.
+
+        :param keys: keys to look up
+        :return: booleans in the same order as keys
+        """
+        ...
+
     def put(self, key: bytes, value: bytes) -> None:
         """
         Upsert a record.
@@ -31,6 +188,49 @@ class TCHashDB:
         """
         ...
 
+    def put_many(
+        self,
+        items: "Iterable[Tuple[bytes, bytes]]",
+        append: bool = False,
+        asynchronous: bool = False,
+    ) -> int:
+        """
+        Store multiple records in one call.
+
+        :param items: (key, value) pairs to store
+        :param append: if True, concatenate values to existing records instead of overwriting them
+        :param asynchronous: if True, buffer records in memory and write them in bulk;
+                             they are flushed on close. Can not be combined with append.
+        :return: number of records stored
+        :raises ValueError: if both append and asynchronous are set
+        :raises OSError: if a record can not be stored, records before it are kept
+        """
+        ...
+
+    def begin(self) -> None:
+        """
+        Begin a transaction. Writes are held until commit, and other writers are blocked.
+
+        :raises OSError: if the operation fails
+        """
+        ...
+
+    def commit(self) -> None:
+        """
+        Commit the current transaction.
+
+        :raises OSError: if the operation fails
+        """
+        ...
+
+    def abort(self) -> None:
+        """
+        Abort the current transaction and discard its writes.
+
+        :raises OSError: if the operation fails
+        """
+        ...
+
     def delete(self, key: bytes) -> None:
         """
         Delete a record from the database.
@@ -54,7 +254,7 @@ class TCHashDB:
         :raises OSError: if the operation fails
         """
         ...
-        
+
     def optimize(self) -> None:
         """
         Optimize the database.
@@ -64,7 +264,78 @@ class TCHashDB:
         ...
 
     def __getitem__(self, key: bytes) -> bytes: ...
+    def __contains__(self, key: bytes) -> bool: ...
     def __setitem__(self, key: bytes, value: bytes) -> None: ...
     def __delitem__(self, key: bytes) -> None: ...
     def __len__(self) -> int: ...
     def __del__(self) -> None: ...
+
+class TCHashDBLoader:
+    """Bulk loader for building Tokyocabinet Hash tables"""
+
+    db: TCHashDB
+    """The underlying hash table, opened in write mode."""
+
+    def __init__(
+        self,
+        path: str,
+        expected_records: int = 0,
+        apow: int = -1,
+        fpow: int = -1,
+        large: bool = True,
+        compression: Optional[str] = None,
+        truncate: bool = False,
+        transactional: bool = False,
+        xmsiz: int = -1,
+    ) -> None:
+        """
+        Create a bulk loader.
+
+        Tuning parameters only take effect when the file is created or truncated.
+
+        :param path: path to the database file
+        :param expected_records: expected number of records, used to size the bucket array (2x)
+        :param apow: record alignment as a power of 2, negative keeps the default
+        :param fpow: maximum number of free block pool elements as a power of 2, negative keeps the default
+        :param large: if True, use a 64-bit bucket array so the file can exceed 2GiB
+        :param compression: compress each record with 'deflate', 'bzip' or 'tcbs', None disables it
+        :param truncate: if True, truncate an existing file
+        :param transactional: if True, wrap every batch in a transaction so a failed batch is rolled back;
+                              otherwise records are written asynchronously, which is faster
+        :param xmsiz: size of the extra mapped memory in bytes, negative keeps the default
+        :raises ValueError: if compression is not supported
+        :raises OSError: if the database cannot be opened
+        """
+        ...
+
+    def put_many(
+        self, items: "Iterable[Tuple[bytes, bytes]]", append: bool = False
+    ) -> int:
+        """
+        Store a batch of records.
+
+        :param items: (key, value) pairs to store
+        :param append: if True, concatenate values to existing records instead of overwriting them
+        :return: number of records stored
+        :raises OSError: if a record can not be stored
+        """
+        ...
+
+    def stats(self) -> "Dict[str, Union[int, float]]":
+        """
+        Load statistics so far.
+
+        :return: a dict with records, bytes, seconds, records_per_sec and mb_per_sec
+        """
+        ...
+
+    def close(self) -> None:
+        """
+        Flush buffered records and close the database.
+
+        :raises OSError: if the operation fails
+        """
+        ...
+
+    def __enter__(self) -> "TCHashDBLoader": ...
+    def __exit__(self, *exc) -> None: ...
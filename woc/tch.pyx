@@ -4,16 +4,44 @@
 # @authors: Runzhi He <rzhe@pku.edu.cn>
 # @date: 2024-01-17
 
-from libc.stdint cimport uint8_t, uint32_t, uint64_t, int8_t, int64_t
-from libc.stdlib cimport free
+from libc.stdint cimport uint8_t, uint32_t, uint64_t, int8_t, int32_t, int64_t
+from libc.stdlib cimport malloc, free
+
+import time
+
+from cpython.bytearray cimport PyByteArray_AS_STRING, PyByteArray_Resize
+from cpython.pythread cimport (
+    PyThread_acquire_lock, PyThread_allocate_lock, PyThread_free_lock, PyThread_release_lock, WAIT_LOCK
+)
 
 cdef extern from 'Python.h':
     object PyBytes_FromStringAndSize(char *s, Py_ssize_t len)
 
-cdef extern from 'tchdb.h':
-    ctypedef struct TCHDB:  # type of structure for a hash database
+cdef extern from 'tcutil.h' nogil:
+    ctypedef struct TCXSTR:  # type of structure for an extensible string object
         pass
 
+    TCXSTR *tcxstrnew()  # Create an extensible string object
+    void tcxstrdel(TCXSTR *xstr)  # Delete an extensible string object
+    const void *tcxstrptr(const TCXSTR *xstr)  # Get the pointer of the region of an extensible string object
+    int tcxstrsize(const TCXSTR *xstr)  # Get the size of the region of an extensible string object
+    void tcxstrcat(TCXSTR *xstr, const void *ptr, int size)  # Concatenate a region to the end of an extensible string object
+    void tcxstrclear(TCXSTR *xstr)  # Clear an extensible string object
+
+cdef extern from '<endian.h>' nogil:
+    uint32_t le32toh(uint32_t x)
+    uint64_t le64toh(uint64_t x)
+
+cdef extern from 'tchdb.h' nogil:
+    ctypedef struct TCHDB:  # type of structure for a hash database
+        uint64_t bnum  # number of the bucket array
+        uint8_t apow  # power of record alignment
+        uint64_t fsiz  # size of the database file
+        uint64_t frec  # offset of the first record
+        uint64_t iter  # offset of the iterator
+        uint32_t *ba32  # 32-bit bucket array
+        uint64_t *ba64  # 64-bit bucket array
+
     cdef enum:  # enumeration for open modes
         HDBOREADER = 1 << 0,                   # open as a reader
         HDBOWRITER = 1 << 1,                   # open as a writer
@@ -21,26 +49,125 @@ cdef extern from 'tchdb.h':
         HDBOTRUNC = 1 << 3,                    # writer truncating
         HDBONOLCK = 1 << 4,                    # open without locking
 
+    cdef enum:  # enumeration for tuning options
+        HDBTLARGE = 1 << 0,                    # use 64-bit bucket array
+        HDBTDEFLATE = 1 << 1,                  # compress each record with Deflate
+        HDBTBZIP = 1 << 2,                     # compress each record with BZIP2
+        HDBTTCBS = 1 << 3,                     # compress each record with TCBS
+
     const char *tchdberrmsg(int ecode)  #  Get the message string corresponding to an error code
     TCHDB *tchdbnew()  # Create a hash database object
+    bint tchdbsetmutex(TCHDB *hdb)  # Set mutual exclusion control of a hash database object for threading
+    bint tchdbsetcache(TCHDB *hdb, int32_t rcnum)  # Set the caching parameters of a hash database object
+    bint tchdbsetxmsiz(TCHDB *hdb, int64_t xmsiz)  # Set the size of the extra mapped memory of a hash database object
+    bint tchdbsetdfunit(TCHDB *hdb, int32_t dfunit)  # Set the unit step number of auto defragmentation
+    bint tchdbtune(TCHDB *hdb, int64_t bnum, int8_t apow, int8_t fpow, uint8_t opts)  # Set the tuning parameters of a hash database object
     int tchdbecode(TCHDB *hdb)  # Set the error code of a hash database object
     bint tchdbopen(TCHDB *hdb, const char *path, int omode)
     bint tchdbclose(TCHDB *hdb)  # Close a hash database object
     void tchdbdel(TCHDB *hdb)  # Delete a hash database object
     void *tchdbget(TCHDB *hdb, const void *kbuf, int ksiz, int *sp)
+    int tchdbget3(TCHDB *hdb, const void *kbuf, int ksiz, void *vbuf, int max)  # Retrieve a record into a buffer
+    int tchdbvsiz(TCHDB *hdb, const void *kbuf, int ksiz)  # Get the size of the value of a record
     bint tchdbiterinit(TCHDB *hdb)  # Initialize the iterator of a hash database object
     void *tchdbiternext(TCHDB *hdb, int *sp)  # Get the next key of the iterator of a hash database object
+    bint tchdbiternext3(TCHDB *hdb, TCXSTR *kxstr, TCXSTR *vxstr)  # Get the next record of the iterator
     bint tchdbput(TCHDB *hdb, const void *kbuf, int ksiz, const void *vbuf, int vsiz)  # Store a new record into a hash database object
+    bint tchdbputcat(TCHDB *hdb, const void *kbuf, int ksiz, const void *vbuf, int vsiz)  # Concatenate a value at the end of the existing record
+    bint tchdbputasync(TCHDB *hdb, const void *kbuf, int ksiz, const void *vbuf, int vsiz)  # Store a record in asynchronous fashion
+    bint tchdbtranbegin(TCHDB *hdb)  # Begin the transaction of a hash database object
+    bint tchdbtrancommit(TCHDB *hdb)  # Commit the transaction of a hash database object
+    bint tchdbtranabort(TCHDB *hdb)  # Abort the transaction of a hash database object
     bint tchdbout(TCHDB *hdb, const void *kbuf, int ksiz)  # Remove a record of a hash database object
     uint64_t tchdbrnum(TCHDB *hdb)  # Get the number of records of a hash database object
     bint tchdbvanish(TCHDB *hdb)  # Remove all records of a hash database object
     bint tchdboptimize(TCHDB *hdb, int64_t bnum, int8_t apow, int8_t fpow, uint8_t opts); # Optimize the database to reduce space
 
+cdef void _tch_get_batch(TCHDB *db, const char **kbufs, int *ksizs,
+                         char **vbufs, int *vsizs, Py_ssize_t n) noexcept nogil:
+    """Look up n keys, store malloc'ed values (NULL if missing) into vbufs"""
+    cdef Py_ssize_t i
+    for i in range(n):
+        vbufs[i] = <char *>tchdbget(db, kbufs[i], ksizs[i], &vsizs[i])
+
+cdef void _tch_vsiz_batch(TCHDB *db, const char **kbufs, int *ksizs,
+                          int *vsizs, Py_ssize_t n) noexcept nogil:
+    """Get the value sizes of n records, -1 for missing keys"""
+    cdef Py_ssize_t i
+    for i in range(n):
+        vsizs[i] = tchdbvsiz(db, kbufs[i], ksizs[i])
+
+cdef Py_ssize_t _tch_put_batch(TCHDB *db, const char **kbufs, int *ksizs,
+                               const char **vbufs, int *vsizs, Py_ssize_t n,
+                               bint append, bint asynchronous) noexcept nogil:
+    """Store n records, return the index of the first failure or n"""
+    cdef Py_ssize_t i
+    cdef bint result
+    for i in range(n):
+        if append:
+            result = tchdbputcat(db, kbufs[i], ksizs[i], vbufs[i], vsizs[i])
+        elif asynchronous:
+            result = tchdbputasync(db, kbufs[i], ksizs[i], vbufs[i], vsizs[i])
+        else:
+            result = tchdbput(db, kbufs[i], ksizs[i], vbufs[i], vsizs[i])
+        if not result:
+            return i
+    return n
+
+cdef bint _tch_iternext(TCHDB *db, uint64_t *cursor, TCXSTR *kxstr, TCXSTR *vxstr) noexcept nogil:
+    """
+    Read the next record from cursor (the iterator of db if NULL) and move cursor past it.
+    Only the key is read if vxstr is NULL.
+    """
+    cdef:
+        uint64_t saved = db.iter
+        bint result
+        char *buf
+        int sp
+    if cursor is not NULL:
+        db.iter = cursor[0]
+    if vxstr is NULL:
+        buf = <char *>tchdbiternext(db, &sp)
+        result = buf is not NULL
+        if result:
+            tcxstrclear(kxstr)
+            tcxstrcat(kxstr, buf, sp)
+            free(buf)
+    else:
+        result = tchdbiternext3(db, kxstr, vxstr)
+    if cursor is not NULL:
+        cursor[0] = db.iter
+        db.iter = saved
+    return result
+
+cdef void _tch_walk_bounds(TCHDB *db, const uint64_t *targets, uint64_t *heads, int n,
+                           TCXSTR *kxstr) noexcept nogil:
+    """Walk keys from heads[k] to the first block at or after targets[k], store it into heads[k]"""
+    cdef:
+        uint64_t cursor = db.frec
+        int k
+    for k in range(1, n):
+        if cursor < heads[k]:
+            cursor = heads[k]
+        while cursor < targets[k]:
+            if not _tch_iternext(db, &cursor, kxstr, NULL):
+                cursor = db.fsiz
+        heads[k] = cursor if cursor < db.fsiz else db.fsiz
+
 cdef class TCHashDB:
     """Object representing a Tokyocabinet Hash table"""
 
-    def __cinit__(self, str path, bint ro=False):
+    def __cinit__(self, str path, bint ro=False, bint thread_safe=False,
+                  int64_t xmsiz=-1, int32_t rcnum=0, int32_t dfunit=0,
+                  int64_t bnum=-1, int8_t apow=-1, int8_t fpow=-1, uint8_t opts=0,
+                  bint truncate=False):
         self.filename = path
+        self.thread_safe = thread_safe
+        self._iter_lock = PyThread_allocate_lock()
+        if self._iter_lock is NULL:
+            raise MemoryError()
+        # records of read-only files stay in place, so their bounds can be reused
+        self._splits = {} if ro else None
         _encoded = path.encode()
         cdef char* dbpath = _encoded
 
@@ -48,6 +175,8 @@ cdef class TCHashDB:
         if not ro:  # write mode: create if not exists
             mode |= HDBOWRITER
             mode |= HDBOCREAT
+            if truncate:
+                mode |= HDBOTRUNC
         else:  # read mode: disable locks
             mode |= HDBOREADER
             mode |= HDBONOLCK
@@ -55,7 +184,24 @@ cdef class TCHashDB:
         self._db = tchdbnew()
         if self._db is NULL:
             raise MemoryError()
-        cdef bint result = tchdbopen(self._db, dbpath, mode)
+        # with mutex enabled, TC guards the handle with rwlocks
+        # so reads may run concurrently without the GIL
+        if thread_safe and not tchdbsetmutex(self._db):
+            raise IOError(f'Failed to enable mutex on {self.filename}: ' + self._error())
+        # tuning parameters must be set before opening
+        # negative xmsiz keeps the default (64MiB), 0 maps the bucket array only
+        if xmsiz >= 0 and not tchdbsetxmsiz(self._db, xmsiz):
+            raise IOError(f'Failed to set xmsiz on {self.filename}: ' + self._error())
+        if rcnum > 0 and not tchdbsetcache(self._db, rcnum):
+            raise IOError(f'Failed to set rcnum on {self.filename}: ' + self._error())
+        if dfunit > 0 and not tchdbsetdfunit(self._db, dfunit):
+            raise IOError(f'Failed to set dfunit on {self.filename}: ' + self._error())
+        # only takes effect when the file is created (or truncated)
+        if (bnum > 0 or apow >= 0 or fpow >= 0 or opts) and not tchdbtune(self._db, bnum, apow, fpow, opts):
+            raise IOError(f'Failed to tune {self.filename}: ' + self._error())
+        cdef bint result
+        with nogil:
+            result = tchdbopen(self._db, dbpath, mode)
         if not result:
             raise IOError(f'Failed to open {self.filename}: ' + self._error())
 
@@ -64,21 +210,163 @@ cdef class TCHashDB:
         cdef bytes msg = tchdberrmsg(code)
         return msg.decode('ascii')
 
+    cdef bint _iternext(self, uint64_t *cursor, TCXSTR *kxstr, TCXSTR *vxstr):
+        # hdb->iter is shared by __iter__, items and the cursors of range scans, which
+        # swap it in and out; TC only locks it within a call, so _iter_lock keeps a swap
+        # in one piece while thread_safe handles run without the GIL
+        cdef bint result
+        if not self.thread_safe:
+            return _tch_iternext(self._db, cursor, kxstr, vxstr)
+        with nogil:
+            PyThread_acquire_lock(self._iter_lock, WAIT_LOCK)
+            result = _tch_iternext(self._db, cursor, kxstr, vxstr)
+            PyThread_release_lock(self._iter_lock)
+        return result
+
+    cdef void _iterinit(self) except *:
+        cdef bint result
+        if not self.thread_safe:
+            result = tchdbiterinit(self._db)
+        else:
+            with nogil:
+                PyThread_acquire_lock(self._iter_lock, WAIT_LOCK)
+                result = tchdbiterinit(self._db)
+                PyThread_release_lock(self._iter_lock)
+        if not result:
+            raise IOError(f'Failed to iterate {self.filename}: ' + self._error())
+
     def __iter__(self):
+        cdef TCXSTR *kxstr
+        self._iterinit()
+        kxstr = tcxstrnew()
+        try:
+            while self._iternext(NULL, kxstr, NULL):
+                yield PyBytes_FromStringAndSize(<char *>tcxstrptr(kxstr), tcxstrsize(kxstr))
+        finally:
+            tcxstrdel(kxstr)
+
+    def items(self):
         cdef:
-            bint result = tchdbiterinit(self._db)
-            char *buf
-            int sp
+            TCXSTR *kxstr
+            TCXSTR *vxstr
+        self._iterinit()
+        kxstr = tcxstrnew()
+        vxstr = tcxstrnew()
+        try:
+            while self._iternext(NULL, kxstr, vxstr):
+                yield (
+                    PyBytes_FromStringAndSize(<char *>tcxstrptr(kxstr), tcxstrsize(kxstr)),
+                    PyBytes_FromStringAndSize(<char *>tcxstrptr(vxstr), tcxstrsize(vxstr)),
+                )
+        finally:
+            tcxstrdel(kxstr)
+            tcxstrdel(vxstr)
+
+    cpdef list split(self, int n):
+        cdef:
+            uint64_t i, offset, frec, fsiz
+            uint64_t *targets
+            uint64_t *heads
+            int k, lo, hi
+            list bounds
+            TCXSTR *kxstr
+        if n < 1:
+            raise ValueError(f'Number of partitions must be positive, got {n}')
+        if self._db is NULL:
+            raise IOError(f'Failed to split {self.filename}: database is closed')
+        frec, fsiz = self._db.frec, self._db.fsiz
+        if self._splits is not None and (n, fsiz) in self._splits:
+            return list(self._splits[n, fsiz])
+        targets = <uint64_t *>malloc(n * sizeof(uint64_t))
+        heads = <uint64_t *>malloc(n * sizeof(uint64_t))
+        kxstr = tcxstrnew()
+        try:
+            if targets is NULL or heads is NULL:
+                raise MemoryError()
+            # records are cut into ranges of similar bytes, each bound moved forward
+            # to a record start; bucket heads are record starts, but they cluster at
+            # the beginning of the file once records outnumber buckets, so walking
+            # from the last head before each target finds the first record after it
+            for k in range(n):
+                targets[k] = frec + (fsiz - frec) // n * k
+                heads[k] = frec
+            with nogil:
+                for i in range(self._db.bnum):
+                    if self._db.ba64 is not NULL:
+                        offset = le64toh(self._db.ba64[i]) << self._db.apow
+                    else:
+                        offset = <uint64_t>le32toh(self._db.ba32[i]) << self._db.apow
+                    if offset == 0:
+                        continue
+                    # the first target at or after the head, which it may start walking to
+                    lo, hi = 0, n
+                    while hi - lo > 1:
+                        if targets[(lo + hi) // 2] < offset:
+                            lo = (lo + hi) // 2
+                        else:
+                            hi = (lo + hi) // 2
+                    if hi < n and heads[hi] < offset:
+                        heads[hi] = offset
+            # the walk reads one key after another, so it is done in one go,
+            # holding _iter_lock but not the GIL on thread_safe handles
+            if not self.thread_safe:
+                _tch_walk_bounds(self._db, targets, heads, n, kxstr)
+            else:
+                with nogil:
+                    PyThread_acquire_lock(self._iter_lock, WAIT_LOCK)
+                    _tch_walk_bounds(self._db, targets, heads, n, kxstr)
+                    PyThread_release_lock(self._iter_lock)
+            bounds = [frec] + [heads[k] for k in range(1, n)] + [fsiz]
+        finally:
+            free(targets)
+            free(heads)
+            tcxstrdel(kxstr)
+        if self._splits is not None:
+            self._splits[n, fsiz] = bounds
+        return list(bounds)
+
+    def _iter_range(self, uint64_t start, uint64_t end, bint values):
+        cdef:
+            uint64_t cursor
+            TCXSTR *kxstr
+            TCXSTR *vxstr = NULL
             bytes key
-        if not result:
-            raise IOError(f'Failed to iterate {self.filename}: ' + self._error())
-        while True:
-            buf = <char *>tchdbiternext(self._db, &sp)
-            if buf is NULL:
-                break
-            key = PyBytes_FromStringAndSize(buf, sp)
-            free(buf)
-            yield key
+            bytes end_key = None
+        if self._db is NULL:
+            raise IOError(f'Failed to iterate {self.filename}: database is closed')
+        if start < self._db.frec or end > self._db.fsiz:
+            raise ValueError(f'Range {start}-{end} is out of records of {self.filename}, '
+                             'use bounds returned by split')
+        kxstr = tcxstrnew()
+        if values:  # without it only keys are read, not the value of every record
+            vxstr = tcxstrnew()
+        try:
+            # free blocks before `end` are skipped onto the record at `end`,
+            # recognize it by key as it belongs to the next range
+            cursor = end
+            if end < self._db.fsiz and self._iternext(&cursor, kxstr, NULL):
+                end_key = PyBytes_FromStringAndSize(<char *>tcxstrptr(kxstr), tcxstrsize(kxstr))
+            cursor = start
+            while cursor < end:
+                if not self._iternext(&cursor, kxstr, vxstr):
+                    break
+                key = PyBytes_FromStringAndSize(<char *>tcxstrptr(kxstr), tcxstrsize(kxstr))
+                if end_key is not None and key == end_key:
+                    break
+                if values:
+                    yield key, PyBytes_FromStringAndSize(<char *>tcxstrptr(vxstr), tcxstrsize(vxstr))
+                else:
+                    yield key
+        finally:
+            tcxstrdel(kxstr)
+            if vxstr is not NULL:
+                tcxstrdel(vxstr)
+
+    def keys_range(self, uint64_t start, uint64_t end):
+        return self._iter_range(start, end, False)
+
+    def items_range(self, uint64_t start, uint64_t end):
+        return self._iter_range(start, end, True)
 
     cpdef bytes get(self, bytes key):
         cdef:
@@ -86,13 +374,170 @@ cdef class TCHashDB:
             char *buf
             int sp
             int ksize=len(key)
-        buf = <char *>tchdbget(self._db, k, ksize, &sp)
+        if self.thread_safe:
+            with nogil:
+                buf = <char *>tchdbget(self._db, k, ksize, &sp)
+        else:
+            buf = <char *>tchdbget(self._db, k, ksize, &sp)
         if buf is NULL:
+            self.misses += 1
             raise KeyError(f'Key {key.hex()} not found in {self.filename}')
+        self.hits += 1
         cdef bytes value = PyBytes_FromStringAndSize(buf, sp)
         free(buf)
         return value
 
+    cpdef object get_into(self, bytes key, bytearray buf):
+        cdef:
+            char *k = key
+            int ksize = len(key)
+            char *vbuf
+            int cap = len(buf)
+            int sp
+        while True:
+            vbuf = PyByteArray_AS_STRING(buf)
+            if self.thread_safe:
+                with nogil:
+                    sp = tchdbget3(self._db, k, ksize, vbuf, cap)
+            else:
+                sp = tchdbget3(self._db, k, ksize, vbuf, cap)
+            if sp >= 0 and sp == cap:
+                # a full buffer may hold a truncated value
+                sp = tchdbvsiz(self._db, k, ksize)
+                if sp > cap:
+                    # raises BufferError if the caller still holds a view of buf
+                    PyByteArray_Resize(buf, sp)
+                    cap = sp
+                    continue
+            break
+        if sp < 0:
+            self.misses += 1
+            raise KeyError(f'Key {key.hex()} not found in {self.filename}')
+        self.hits += 1
+        return memoryview(buf)[:sp]
+
+    cdef list _get_batch(self, list keys, object default):
+        cdef:
+            Py_ssize_t i, n = len(keys)
+            const char **kbufs
+            int *ksizs
+            int *vsizs
+            char **vbufs
+            list res = [default] * n
+            uint64_t found = 0
+            bytes key
+        if n == 0:
+            return res
+        kbufs = <const char **>malloc(n * sizeof(char *))
+        vbufs = <char **>malloc(n * sizeof(char *))
+        ksizs = <int *>malloc(n * sizeof(int))
+        vsizs = <int *>malloc(n * sizeof(int))
+        try:
+            if kbufs is NULL or vbufs is NULL or ksizs is NULL or vsizs is NULL:
+                raise MemoryError()
+            # pointers stay valid as `keys` holds references to the bytes
+            for i in range(n):
+                key = keys[i]
+                kbufs[i] = key
+                ksizs[i] = len(key)
+            if self.thread_safe:
+                with nogil:
+                    _tch_get_batch(self._db, kbufs, ksizs, vbufs, vsizs, n)
+            else:
+                _tch_get_batch(self._db, kbufs, ksizs, vbufs, vsizs, n)
+            for i in range(n):
+                if vbufs[i] is not NULL:
+                    found += 1
+                    res[i] = PyBytes_FromStringAndSize(vbufs[i], vsizs[i])
+                    free(vbufs[i])
+                    vbufs[i] = NULL
+        finally:
+            free(kbufs)
+            free(vbufs)
+            free(ksizs)
+            free(vsizs)
+        self.hits += found
+        self.misses += n - found
+        return res
+
+    cpdef list get_many(self, keys, object default=None):
+        return self._get_batch(keys if type(keys) is list else list(keys), default)
+
+    cpdef int get_many_into(self, keys, dict out) except -1:
+        cdef:
+            list _keys = keys if type(keys) is list else list(keys)
+            list values = self._get_batch(_keys, None)
+            Py_ssize_t i
+            int found = 0
+        for i in range(len(_keys)):
+            if values[i] is not None:
+                out[_keys[i]] = values[i]
+                found += 1
+        return found
+
+    cpdef int value_size(self, bytes key) except -1:
+        cdef:
+            char *k = key
+            int ksize = len(key)
+            int sp
+        if self.thread_safe:
+            with nogil:
+                sp = tchdbvsiz(self._db, k, ksize)
+        else:
+            sp = tchdbvsiz(self._db, k, ksize)
+        if sp < 0:
+            raise KeyError(f'Key {key.hex()} not found in {self.filename}')
+        return sp
+
+    cpdef bint contains(self, bytes key):
+        cdef:
+            char *k = key
+            int ksize = len(key)
+            int sp
+        if self.thread_safe:
+            with nogil:
+                sp = tchdbvsiz(self._db, k, ksize)
+        else:
+            sp = tchdbvsiz(self._db, k, ksize)
+        return sp >= 0
+
+    cpdef list value_size_many(self, keys):
+        cdef:
+            list _keys = keys if type(keys) is list else list(keys)
+            Py_ssize_t i, n = len(_keys)
+            const char **kbufs
+            int *ksizs
+            int *vsizs
+            list res
+            bytes key
+        if n == 0:
+            return []
+        kbufs = <const char **>malloc(n * sizeof(char *))
+        ksizs = <int *>malloc(n * sizeof(int))
+        vsizs = <int *>malloc(n * sizeof(int))
+        try:
+            if kbufs is NULL or ksizs is NULL or vsizs is NULL:
+                raise MemoryError()
+            # pointers stay valid as `_keys` holds references to the bytes
+            for i in range(n):
+                key = _keys[i]
+                kbufs[i] = key
+                ksizs[i] = len(key)
+            if self.thread_safe:
+                with nogil:
+                    _tch_vsiz_batch(self._db, kbufs, ksizs, vsizs, n)
+            else:
+                _tch_vsiz_batch(self._db, kbufs, ksizs, vsizs, n)
+            res = [vsizs[i] for i in range(n)]
+        finally:
+            free(kbufs)
+            free(ksizs)
+            free(vsizs)
+        return res
+
+    cpdef list contains_many(self, keys):
+        return [sp >= 0 for sp in self.value_size_many(keys)]
+
     cpdef void put(self, bytes key, bytes value) except *:
         cdef:
             char *k = key
@@ -104,6 +549,59 @@ cdef class TCHashDB:
         if not result:
             raise IOError(f'Failed to put {key.hex()} in {self.filename}: ' + self._error())
 
+    cpdef Py_ssize_t put_many(self, items, bint append=False, bint asynchronous=False) except -1:
+        cdef:
+            list _items = items if type(items) is list else list(items)
+            Py_ssize_t i, n = len(_items), failed
+            const char **kbufs
+            const char **vbufs
+            int *ksizs
+            int *vsizs
+            bytes key, value
+        if append and asynchronous:
+            raise ValueError('Asynchronous puts can not append to existing records')
+        if n == 0:
+            return 0
+        kbufs = <const char **>malloc(n * sizeof(char *))
+        vbufs = <const char **>malloc(n * sizeof(char *))
+        ksizs = <int *>malloc(n * sizeof(int))
+        vsizs = <int *>malloc(n * sizeof(int))
+        try:
+            if kbufs is NULL or vbufs is NULL or ksizs is NULL or vsizs is NULL:
+                raise MemoryError()
+            # pointers stay valid as `_items` holds references to the bytes
+            for i in range(n):
+                key, value = _items[i]
+                kbufs[i] = key
+                ksizs[i] = len(key)
+                vbufs[i] = value
+                vsizs[i] = len(value)
+            if self.thread_safe:
+                with nogil:
+                    failed = _tch_put_batch(self._db, kbufs, ksizs, vbufs, vsizs, n, append, asynchronous)
+            else:
+                failed = _tch_put_batch(self._db, kbufs, ksizs, vbufs, vsizs, n, append, asynchronous)
+        finally:
+            free(kbufs)
+            free(vbufs)
+            free(ksizs)
+            free(vsizs)
+        if failed < n:
+            raise IOError(f'Failed to put {_items[failed][0].hex()} in {self.filename}: ' + self._error())
+        return n
+
+    cpdef void begin(self) except *:
+        if not tchdbtranbegin(self._db):
+            raise IOError(f'Failed to begin transaction on {self.filename}: ' + self._error())
+
+    cpdef void commit(self) except *:
+        if not tchdbtrancommit(self._db):
+            raise IOError(f'Failed to commit transaction on {self.filename}: ' + self._error())
+
+    cpdef void abort(self) except *:
+        if not tchdbtranabort(self._db):
+            raise IOError(f'Failed to abort transaction on {self.filename}: ' + self._error())
+
     cpdef void delete(self, bytes key) except *:
         cdef:
             char *k = key
@@ -125,7 +623,9 @@ cdef class TCHashDB:
         if db is NULL:
             return
         self._db = NULL
-        cdef bint result = tchdbclose(db)
+        cdef bint result
+        with nogil:
+            result = tchdbclose(db)
         if not result:
             self._db = db
             raise IOError(f'Failed to close {self.filename}: ' + self._error())
@@ -139,6 +639,9 @@ cdef class TCHashDB:
     def __getitem__(self, bytes key):
         return self.get(key)
 
+    def __contains__(self, bytes key):
+        return self.contains(key)
+
     def __setitem__(self, bytes key, bytes value):
         self.put(key, value)
 
@@ -162,3 +665,73 @@ cdef class TCHashDB:
             tchdbclose(db)
             tchdbdel(db)
             self._db = NULL
+        if self._iter_lock is not NULL:
+            PyThread_free_lock(self._iter_lock)
+            self._iter_lock = NULL
+
+
+class TCHashDBLoader:
+    """Bulk loader for building Tokyocabinet Hash tables"""
+
+    def __init__(self, str path, uint64_t expected_records=0, int8_t apow=-1, int8_t fpow=-1,
+                 bint large=True, str compression=None, bint truncate=False,
+                 bint transactional=False, int64_t xmsiz=-1):
+        cdef uint8_t opts = HDBTLARGE if large else 0
+        if compression == 'deflate':
+            opts |= HDBTDEFLATE
+        elif compression == 'bzip':
+            opts |= HDBTBZIP
+        elif compression == 'tcbs':
+            opts |= HDBTTCBS
+        elif compression is not None:
+            raise ValueError(f'Unsupported compression: {compression}, expected one of deflate, bzip, tcbs')
+        # TC suggests 0.5~4 times the number of records as the bucket number
+        cdef int64_t bnum = expected_records * 2 if expected_records else -1
+        self.db = TCHashDB(path, ro=False, xmsiz=xmsiz, bnum=bnum, apow=apow, fpow=fpow,
+                           opts=opts, truncate=truncate)
+        self.transactional = transactional
+        self.records = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def put_many(self, items, bint append=False):
+        """Store a batch of (key, value) pairs, return the number of records written"""
+        items = items if type(items) is list else list(items)
+        start = time.perf_counter()
+        if self.transactional:
+            self.db.begin()
+            try:
+                self.db.put_many(items, append)
+            except BaseException:
+                self.db.abort()
+                raise
+            self.db.commit()
+        else:
+            # asynchronous puts buffer records in memory and write them in bulk
+            self.db.put_many(items, append, asynchronous=not append)
+        self.seconds += time.perf_counter() - start
+        self.records += len(items)
+        self.bytes += sum(len(k) + len(v) for k, v in items)
+        return len(items)
+
+    def stats(self):
+        """Records and bytes written so far, and the load throughput"""
+        _seconds = self.seconds or float('inf')
+        return {
+            'records': self.records,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'records_per_sec': self.records / _seconds,
+            'mb_per_sec': self.bytes / _seconds / 1e6,
+        }
+
+    def close(self):
+        start = time.perf_counter()
+        self.db.close()  # flushes asynchronous records
+        self.seconds += time.perf_counter() - start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
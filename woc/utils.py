@@ -1,5 +1,9 @@
 import hashlib
+import heapq
 import os
+import shutil
+import struct
+from typing import Dict, Iterable
 
 
 def sample_md5(file_path: str, skip=0, size=None) -> str:
@@ -44,3 +48,63 @@ def sample_md5(file_path: str, skip=0, size=None) -> str:
         dig.update(f.read(128))
 
     return dig.hexdigest()[:16]
+
+
+_TCH_MAGIC = b"ToKyO CaBiNeT"
+_TCH_META = struct.Struct("<QQQ")  # bnum, rnum, fsiz at offset 40 of the header
+
+
+def tch_stats(file_path: str) -> Dict[str, int]:
+    """
+    Read the record count, bucket count and file size of a TokyoCabinet hash database.
+
+    Only the header is read, the database is not opened.
+
+    :param file_path: The path to the .tch file.
+    :return: A dict with records (tchdbrnum), buckets (tchdbbnum) and size (tchdbfsiz).
+    """
+    with open(file_path, "rb") as f:
+        header = f.read(256)
+    if not header.startswith(_TCH_MAGIC) or len(header) < 256:
+        raise ValueError(f"Not a TokyoCabinet hash database: {file_path}")
+    bnum, rnum, fsiz = _TCH_META.unpack_from(header, 40)
+    return {"records": rnum, "buckets": bnum, "size": fsiz}
+
+
+def merge_outputs(paths: Iterable[str], output: str, sort: bool = False) -> int:
+    """
+    Merge the output files of workers (see woc.local.parse_worker) into one file.
+
+    :param paths: output files of the workers, in worker order.
+    :param output: The path to the merged file.
+    :param sort: Merge sorted files line by line into a sorted file, otherwise concatenate them.
+    :return: The number of merged files.
+    """
+    paths = list(paths)
+    with open(output, "wb") as out:
+        if not sort:
+            for path in paths:
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, out)
+            return len(paths)
+        files = [open(path, "rb") for path in paths]
+        try:
+            for line in heapq.merge(*files):
+                out.write(line if line.endswith(b"\n") else line + b"\n")
+        finally:
+            for f in files:
+                f.close()
+    return len(paths)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge output files of workers")
+    parser.add_argument("output", type=str, help="path to the merged file")
+    parser.add_argument("paths", type=str, nargs="+", help="output files of the workers")
+    parser.add_argument(
+        "--sort", action="store_true", default=False, help="merge sorted files"
+    )
+    args = parser.parse_args()
+    merge_outputs(args.paths, args.output, args.sort)